@@ -0,0 +1,60 @@
+"""
+Peak memory and time per site of the prepare -> metrics -> LCOF stages.
+
+Run from the folder holding the `results` directory (merged data must exist, see
+`merge_sim_with_measured`):
+
+    python benchmark_pipeline_memory.py Turin 2019
+    python benchmark_pipeline_memory.py Turin 2019 --lcof PULP_CBC_CMD
+
+Peak memory is the largest amount of memory allocated by Python objects and NumPy
+arrays (tracemalloc) during each stage, time is the wall-clock time.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from simeasren import ProfileMatrix, prepare_pv_data_for_plots, calculate_error_metrics, calculate_all_LCOF_diff
+from simeasren.plotting import plot_style_config
+
+
+overall_peak = 0
+
+
+def measure(stage, func, *args, **kwargs):
+    global overall_peak
+    tracemalloc.reset_peak()
+    start_current, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    overall_peak = max(overall_peak, peak)
+    print(f"{stage:<28} {elapsed:8.3f} s {(peak - start_current) / 1024**2:10.2f} MB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("location")
+    parser.add_argument("year")
+    parser.add_argument("--lcof", metavar="SOLVER", help="Also run calculate_all_LCOF_diff with this solver")
+    parser.add_argument("--min-load", type=float, default=0.3, help="H2 end-user minimal load (default 0.3)")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    print(f"{'Stage':<28} {'Time':>10} {'Peak memory':>13}")
+
+    data_sim_meas, _, _ = measure("prepare_pv_data_for_plots", prepare_pv_data_for_plots, args.location, args.year)
+    profiles = measure("ProfileMatrix.from_frame", ProfileMatrix.from_frame, data_sim_meas)
+    measure("calculate_error_metrics", calculate_error_metrics, profiles, args.location, plot_style_config.PLOT_PALETTE)
+    if args.lcof:
+        measure("calculate_all_LCOF_diff", calculate_all_LCOF_diff, profiles, args.location, args.min_load, args.lcof)
+
+    print(f"{'Whole pipeline':<28} {'':>10} {overall_peak / 1024**2:10.2f} MB")
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
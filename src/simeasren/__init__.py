@@ -1,11 +1,23 @@
+from .pv_measured import read_measured_sheet, clear_sheet_cache
 from .pv_simulation import load_pv_setup_from_meas_file, download_pvgis_data, download_rn_data
-from .pv_analysis.metrics import calculate_error_metrics
+from .pv_analysis.metrics import calculate_error_metrics, calculate_error_metrics_table
 from .utils import merge_sim_with_measured
+from .series_catalog import build_series_catalog, select_series
+from .profiles import ProfileMatrix
+from .storage import LocalStorage, MemoryStorage, WriteBehindStorage, get_storage, set_storage
+from .results_db import ResultsDatabase, get_results_database, set_results_database
+from .metric_cache import MetricCache, get_metric_cache, set_metric_cache
+from .archive import write_profile_archive, read_profile_archive, read_profiles, archive_csv_profiles
 from .plotting.plot_all import generate_LCOF_diff_plot, generate_PV_timeseries_plots, generate_high_res_PV_plots, generate_PV_plots
 from .plotting.prepare_pv_data import prepare_pv_data_for_plots
-from .h2_techno_eco.LCOF_diff_all import calculate_all_LCOF_diff
+from .h2_techno_eco.LCOF_diff_all import calculate_all_LCOF_diff, bootstrap_LCOF_diff
 from .h2_techno_eco.OptiPlant import solve_optiplant
 
-__all__ = ["generate_LCOF_diff_plot", "generate_PV_timeseries_plots", "generate_high_res_PV_plots","prepare_pv_data_for_plots",
-           "calculate_all_LCOF_diff","load_pv_setup_from_meas_file","download_pvgis_data","download_rn_data","merge_sim_with_measured",
-           "solve_optiplant", "calculate_error_metrics", "generate_PV_plots"]
+__all__ = ["generate_LCOF_diff_plot", "generate_PV_timeseries_plots", "generate_high_res_PV_plots",
+           "prepare_pv_data_for_plots", "calculate_all_LCOF_diff", "load_pv_setup_from_meas_file",
+           "download_pvgis_data", "download_rn_data", "merge_sim_with_measured", "solve_optiplant",
+           "calculate_error_metrics", "calculate_error_metrics_table", "generate_PV_plots", "build_series_catalog",
+           "select_series", "read_measured_sheet", "clear_sheet_cache", "write_profile_archive", "read_profile_archive",
+           "read_profiles", "archive_csv_profiles", "ProfileMatrix", "LocalStorage", "MemoryStorage", "WriteBehindStorage",
+           "get_storage", "set_storage", "ResultsDatabase", "get_results_database", "set_results_database",
+           "bootstrap_LCOF_diff", "MetricCache", "get_metric_cache", "set_metric_cache"]
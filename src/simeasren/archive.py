@@ -0,0 +1,316 @@
+import os
+import json
+import zlib
+import struct
+import numpy as np
+import pandas as pd
+
+# ---------------------------- Quantized compressed archive for hourly profiles -----------------------------
+#
+# File layout (".pvz"):
+#   8 bytes   magic b"SMRPVZ01"
+#   4 bytes   little-endian uint32, length of the JSON header
+#   header    JSON: columns, rows, chunk rows, per-column offset/scale/error bound,
+#             and the byte offset and length of every (column, chunk) block
+#   blocks    zlib-compressed, byte-shuffled deltas of the uint16 codes
+#
+# Each value x of a column is stored as the code round((x - offset) / scale) with
+# scale = (max - min) / 65534, code 65535 marking NaN. The absolute error is at most
+# scale / 2 = (max - min) / 131068, i.e. 7.6e-6 for profiles normalized to [0, 1].
+
+ARCHIVE_EXTENSION = ".pvz"
+_MAGIC = b"SMRPVZ01"
+_NAN_CODE = 65535
+_MAX_CODE = 65534
+
+
+def quantize_profiles(values):
+    """
+    Quantize a 2-D float array (rows, columns) to uint16 codes, column by column.
+
+    Returns
+    -------
+    tuple
+        `(codes, offsets, scales)`; values are recovered as ``offsets + codes * scales``.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    has_values = finite.any(axis=0)
+    offsets = np.where(has_values, np.where(finite, values, np.inf).min(axis=0, initial=np.inf), 0.0)
+    spans = np.where(has_values, np.where(finite, values, -np.inf).max(axis=0, initial=-np.inf) - offsets, 0.0)
+    scales = np.where(spans > 0, spans / _MAX_CODE, 1.0)
+
+    codes = np.rint((np.where(finite, values, offsets) - offsets) / scales)
+    codes = np.clip(codes, 0, _MAX_CODE).astype(np.uint16)
+    codes[~finite] = _NAN_CODE
+    return codes, offsets, scales
+
+
+def dequantize_profiles(codes, offsets, scales):
+    """Inverse of :func:`quantize_profiles` (NaN codes become NaN)."""
+    values = offsets + codes.astype(np.float64) * scales
+    values[codes == _NAN_CODE] = np.nan
+    return values
+
+
+def _encode_block(deltas, level):
+    # The high and low bytes of the deltas are stored apart before compression
+    shuffled = np.ascontiguousarray(deltas, dtype="<u2").view(np.uint8).reshape(-1, 2).T.tobytes()
+    return zlib.compress(shuffled, level)
+
+
+def _decode_block(blob, n_rows):
+    shuffled = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(2, n_rows)
+    deltas = np.ascontiguousarray(shuffled.T).view("<u2").ravel()
+    return np.cumsum(deltas, dtype=np.uint16)
+
+
+def write_profile_archive(data: pd.DataFrame, file_path, chunk_rows: int = 1024, level: int = 6):
+    """
+    Write hourly profiles to a quantized, compressed archive file (``.pvz``).
+
+    Each column is quantized to 16-bit codes, delta-encoded and compressed
+    (DEFLATE) in blocks of `chunk_rows` rows. The block index stored in the header
+    allows reading single columns and row ranges without decoding the whole file.
+
+    Parameters
+    ----------
+    data : pandas.DataFrame
+        Numeric profiles, one column per series (e.g., the merged measured/simulated
+        data). Non-numeric columns are not stored.
+    file_path : str
+        Path of the archive file (the ``.pvz`` extension is added if missing).
+    chunk_rows : int, optional
+        Number of rows per compressed block (default 1024).
+    level : int, optional
+        zlib compression level from 1 (fastest) to 9 (smallest), default 6.
+
+    Returns
+    -------
+    str
+        Path of the written archive.
+
+    Notes
+    -----
+    The absolute quantization error of a column is at most
+    ``(max - min) / 131068`` (7.6e-6 for profiles between 0 and 1). The bound of
+    every column is stored in the header as `"max_abs_error"`. NaN values are kept.
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> from simeasren.archive import write_profile_archive, read_profile_archive
+    >>> data = pd.read_csv("results/Turin/simulated_PV/Turin_meas_sim.csv")
+    >>> write_profile_archive(data, "results/Turin/simulated_PV/Turin_meas_sim.pvz")
+    'results/Turin/simulated_PV/Turin_meas_sim.pvz'
+    """
+    if not str(file_path).endswith(ARCHIVE_EXTENSION):
+        file_path = f"{file_path}{ARCHIVE_EXTENSION}"
+
+    numeric = data.select_dtypes(include="number")
+    codes, offsets, scales = quantize_profiles(numeric.to_numpy())
+    n_rows, n_columns = codes.shape
+
+    # Deltas of all blocks at once (wrapping modulo 2**16), each block starts from 0
+    deltas = np.diff(codes, axis=0, prepend=np.zeros((1, n_columns), dtype=np.uint16))
+    deltas[::chunk_rows] = codes[::chunk_rows]
+    deltas = np.asfortranarray(deltas)
+
+    blocks = []
+    index = []
+    position = 0
+    for column in range(n_columns):
+        column_index = []
+        for start in range(0, n_rows, chunk_rows):
+            blob = _encode_block(deltas[start:start + chunk_rows, column], level)
+            blocks.append(blob)
+            column_index.append([position, len(blob)])
+            position += len(blob)
+        index.append(column_index)
+
+    header = {
+        "columns": [str(col) for col in numeric.columns],
+        "rows": n_rows,
+        "chunk_rows": chunk_rows,
+        "offsets": offsets.tolist(),
+        "scales": scales.tolist(),
+        "max_abs_error": np.where(np.where(codes == _NAN_CODE, 0, codes).max(axis=0, initial=0) > 0, scales / 2, 0.0).tolist(),
+        "index": index,
+    }
+    header_bytes = json.dumps(header).encode()
+
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for blob in blocks:
+            f.write(blob)
+
+    return str(file_path)
+
+
+def read_archive_header(file_path) -> dict:
+    """Read the JSON header of a ``.pvz`` archive (columns, rows, error bounds, block index)."""
+    with open(file_path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"Not a simeasren profile archive: {file_path}")
+        (header_length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_length))
+    header["data_start"] = len(_MAGIC) + 4 + header_length
+    return header
+
+
+def read_profile_archive(file_path, columns=None, start: int = 0, stop=None) -> pd.DataFrame:
+    """
+    Read profiles from a ``.pvz`` archive written by :func:`write_profile_archive`.
+
+    Only the blocks overlapping the requested columns and rows are read and decoded.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the archive.
+    columns : list of str, optional
+        Columns to read (default: all columns).
+    start, stop : int, optional
+        Row range to read (default: all rows).
+
+    Returns
+    -------
+    pandas.DataFrame
+        The decoded float64 profiles, indexed from `start`.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a profile archive.
+    KeyError
+        If a requested column is not in the archive.
+    """
+    header = read_archive_header(file_path)
+    all_columns = header["columns"]
+    columns = all_columns if columns is None else list(columns)
+    missing = [col for col in columns if col not in all_columns]
+    if missing:
+        raise KeyError(f"Columns {missing} not found in {file_path}")
+
+    n_rows, chunk_rows = header["rows"], header["chunk_rows"]
+    stop = n_rows if stop is None else min(stop, n_rows)
+    first_chunk, last_chunk = start // chunk_rows, max(stop - 1, start) // chunk_rows
+
+    positions = [all_columns.index(col) for col in columns]
+    codes = np.empty((max(stop - start, 0), len(columns)), dtype=np.uint16)
+
+    with open(file_path, "rb") as f:
+        for j, column in enumerate(positions if stop > start else []):
+            for chunk in range(first_chunk, last_chunk + 1):
+                chunk_start = chunk * chunk_rows
+                if chunk_start >= stop:
+                    break
+                offset, length = header["index"][column][chunk]
+                f.seek(header["data_start"] + offset)
+                block = _decode_block(f.read(length), min(chunk_rows, n_rows - chunk_start))
+                lo, hi = max(start, chunk_start), min(stop, chunk_start + len(block))
+                codes[lo - start:hi - start, j] = block[lo - chunk_start:hi - chunk_start]
+
+    values = dequantize_profiles(
+        codes, np.asarray(header["offsets"])[positions], np.asarray(header["scales"])[positions]
+    )
+    return pd.DataFrame(values, columns=columns, index=pd.RangeIndex(start, start + len(values)))
+
+
+def read_profiles(file_path, columns=None, max_rows=None) -> pd.DataFrame:
+    """
+    Read a profile table from a CSV file or from its ``.pvz`` archive.
+
+    Loaders use this function so that archived results are read transparently:
+    if `file_path` is a ``.pvz`` archive, or if the CSV file does not exist but an
+    archive with the same name does, the archive is decoded instead.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the CSV file (or of the archive).
+    columns : list of str, optional
+        Only read these columns (default: all columns). They are returned in the
+        order of the file.
+    max_rows : int, optional
+        Only read the first `max_rows` rows. With `max_rows=0` only the column
+        names are read.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The profiles.
+
+    Raises
+    ------
+    FileNotFoundError
+        If neither the CSV file nor its archive exist.
+    """
+    file_path = str(file_path)
+    archive_path = os.path.splitext(file_path)[0] + ARCHIVE_EXTENSION
+
+    if not file_path.endswith(ARCHIVE_EXTENSION) and os.path.exists(file_path):
+        usecols = None if columns is None else set(columns).__contains__
+        return pd.read_csv(file_path, usecols=usecols, nrows=max_rows)
+    if file_path.endswith(ARCHIVE_EXTENSION):
+        archive_path = file_path
+    elif not os.path.exists(archive_path):
+        raise FileNotFoundError(f"Profile file not found: {file_path} (nor {archive_path})")
+
+    if columns is not None:
+        wanted = set(columns)
+        columns = [col for col in read_archive_header(archive_path)["columns"] if col in wanted]
+    return read_profile_archive(archive_path, columns=columns, stop=max_rows)
+
+
+def archive_csv_profiles(directory, remove_csv: bool = False, chunk_rows: int = 1024, level: int = 6):
+    """
+    Convert every CSV profile file of a directory tree to a ``.pvz`` archive.
+
+    Typical use is on `results/{location_name}/simulated_PV`, which holds the
+    downloaded PVGIS and Renewables.ninja profiles and the merged data file. Only the
+    numeric columns of each CSV file are archived; the non-numeric ones (e.g., the
+    PVGIS time stamp column) are printed, and their CSV file is never deleted.
+
+    Parameters
+    ----------
+    directory : str
+        Directory searched recursively for ``.csv`` files.
+    remove_csv : bool, optional
+        If True, delete each CSV file after its archive is written (default False).
+        Files with non-numeric columns, which the archive cannot hold, are kept.
+    chunk_rows : int, optional
+        Number of rows per compressed block (default 1024).
+    level : int, optional
+        zlib compression level (default 6).
+
+    Returns
+    -------
+    list of str
+        Paths of the written archives.
+    """
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if not name.lower().endswith(".csv"):
+                continue
+            csv_path = os.path.join(root, name)
+            data = pd.read_csv(csv_path)
+            archive_path = write_profile_archive(
+                data, os.path.splitext(csv_path)[0] + ARCHIVE_EXTENSION, chunk_rows, level
+            )
+            written.append(archive_path)
+
+            # Only delete the CSV file if the archive holds all of its columns
+            dropped = [col for col in data.columns if not pd.api.types.is_numeric_dtype(data[col])]
+            if dropped:
+                kept = ", CSV file kept" if remove_csv else ""
+                print(f"{csv_path}: non-numeric columns {dropped} not archived{kept}")
+            elif remove_csv:
+                os.remove(csv_path)
+
+    print(f"{len(written)} profile files archived in '{directory}'")
+    return written
@@ -1,14 +1,27 @@
 import os
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from ..h2_techno_eco.OptiPlant import solve_optiplant
+from ..series_catalog import select_series, find_measured_column
+from ..profiles import ProfileMatrix
+from ..pv_measured.quality import fill_gaps
+from ..storage import get_storage
+from ..results_db import get_results_database, fingerprint
+from ..pv_analysis.bootstrap import block_bootstrap_days
+from ..pv_analysis.metrics import _measured_pairs
 
 def calculate_all_LCOF_diff(
     data_sim_meas,
     location_name,
     H2_end_user_min_load,
     solver_name,
-    technoeco_file_name = "Techno_eco_data_NH3"
+    technoeco_file_name = "Techno_eco_data_NH3",
+    output_dir = "results",
+    storage = None,
+    results_db = None,
+    max_gap_hours = 3
 ):
     """
     Calculate the difference in Levelized Cost of Fuel (LCOF) between 
@@ -19,14 +32,19 @@ def calculate_all_LCOF_diff(
     for the specified location. For each dataset, it computes the LCOF 
     using the `solve_optiplant` optimization model, stores detailed 
     results and flow data as CSV files, and calculates the relative 
-    difference in LCOF between measured and simulated cases.
+    difference in LCOF between measured and simulated cases. Each
+    simulated profile is compared with the measured profile of its own
+    year (or the first measured profile of the location if there is none
+    for its year), and each measured profile is solved once.
 
     Parameters
     ----------
-    data_sim_meas : pandas.DataFrame
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
         DataFrame containing both simulated and measured time-series data 
         for one or more locations. Each column name should include the 
         location name, and the measured data column should contain "PV-MEAS".
+        A :class:`simeasren.ProfileMatrix` shared with other stages can be
+        passed instead.
     location_name : str
         Name of the location to analyze (used to filter columns in 
         `data_sim_meas`).
@@ -39,6 +57,20 @@ def calculate_all_LCOF_diff(
     technoeco_file_name : str, optional
         Base filename (without extension) of the techno-economic data CSV file.
         Defaults to "Techno_eco_data_NH3".
+    output_dir : str, optional
+        Root directory of the results (default `"results"`).
+    storage : LocalStorage, MemoryStorage or WriteBehindStorage, optional
+        Where the result files are written (default: the storage set with
+        :func:`simeasren.set_storage`, the local disk unless changed). For
+        parameter sweeps, a :class:`simeasren.MemoryStorage` avoids writing two
+        CSV files per LP solve.
+    results_db : ResultsDatabase, optional
+        Database where the run is recorded (parameters, input fingerprints, LCOF
+        per series and system size and cost tables). Defaults to the database set
+        with :func:`simeasren.set_results_database`; nothing is recorded if none is set.
+    max_gap_hours : int, optional
+        Longest gap (hours) filled by linear interpolation (default 3). Simulated
+        profiles with longer gaps are skipped.
 
     Returns
     -------
@@ -46,6 +78,7 @@ def calculate_all_LCOF_diff(
         A list of dictionaries, each containing:
 
         - "Location" (str): Name of the analyzed location.
+        - "Year" (str): Year of the simulated profile.
         - "Tool" (str): Identifier of the simulation tool or dataset.
         - "LCOF Difference (%)" (float): Relative difference in LCOF between 
           simulated and measured data.
@@ -56,7 +89,8 @@ def calculate_all_LCOF_diff(
         If the specified techno-economic CSV file does not exist.
     ValueError
         If no measured data column (containing "PV-MEAS") is found for the 
-        given location.
+        given location, or if the measured profile has gaps longer than
+        `max_gap_hours`.
 
     Notes
     -----
@@ -64,9 +98,15 @@ def calculate_all_LCOF_diff(
     in the current environment and returns:
     (LCOF_value, technoeco_results_df, flow_results_df).
 
-    Intermediate results (system costs and hourly flow profiles) are saved 
+    Intermediate results (system costs and hourly flow profiles) are saved
     automatically in the folders `System size and costs` and `Hourly profiles`
 
+    Profiles keep all their hours so that every hour stays aligned with the
+    model time steps: gaps of at most `max_gap_hours` hours are filled by linear
+    interpolation. Longer gaps are not bridged; clean the measured data first
+    with :func:`simeasren.pv_measured.clean_measured_profiles` (clear-sky fill,
+    0 at night).
+
     Examples
     --------
     Import and run the function using a CSV with simulated and measured PV data:
@@ -81,16 +121,151 @@ def calculate_all_LCOF_diff(
         ...     technoeco_file_name="Techno_eco_data_NH3"
         ... )
         >>> results[0]
-        {'Location': 'Utrecht', 'Tool': 'PG2-SARAH2', 'LCOF Difference (%)': -6.3}
+        {'Location': 'Utrecht', 'Year': '2017', 'Tool': 'PG2-SARAH2', 'LCOF Difference (%)': -6.3}
     """
 
     # -------------------- Create output directories --------------------
-    output_dir_technoeco = os.path.join("results", location_name, "Techno-eco assessments results")
+    storage = get_storage(storage)
+    output_dir_technoeco = os.path.join(output_dir, location_name, "Techno-eco assessments results")
     output_dir_technoeco_syst = os.path.join(output_dir_technoeco, f"End-user flex[{H2_end_user_min_load}-1]", "System size and costs")
     output_dir_flows = os.path.join(output_dir_technoeco, f"End-user flex[{H2_end_user_min_load}-1]", "Hourly profiles")
-    os.makedirs(output_dir_technoeco_syst, exist_ok=True)
-    os.makedirs(output_dir_flows, exist_ok=True)
+    storage.makedirs(output_dir_technoeco_syst)
+    storage.makedirs(output_dir_flows)
+
+    file_path_technoeco, data_units = _load_technoeco_data(technoeco_file_name)
+
+    LCOF_diff_results = []
+
+    # Look up the measured and simulated columns for the current location
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    catalog = profiles.catalog
+
+    if find_measured_column(catalog, location=location_name) is None:
+        print(f"No measured data for {location_name}")
+        return
+
+    # Each simulated column is compared with the measured column of its own year
+    # (identify simulations columns with only zero values)
+    pairs = _measured_pairs(catalog, select_series(catalog, location=location_name, is_measured=False))
+    sim_columns = _non_zero_columns(profiles, list(pairs))
+    meas_columns = list(dict.fromkeys(pairs[sim_column] for sim_column in sim_columns))
+    if not meas_columns:
+        meas_columns = [find_measured_column(catalog, location=location_name)]
+
+    # Perform the techno-economic assessment with each measured profile once
+    # (full-length profiles, solve_optiplant picks the hours by position)
+    LCOF_meas = {}
+    solved = []
+    for meas_column in meas_columns:
+        measured_profile_LCOF = _full_length_profile(profiles, meas_column, max_gap_hours)
+        LCOF_meas[meas_column], df_results_meas, df_flows_meas = solve_optiplant(
+            data_units, measured_profile_LCOF, H2_end_user_min_load, solver_name
+        )
+        solved.append((meas_column, measured_profile_LCOF, LCOF_meas[meas_column], None, df_results_meas))
+
+        # Save measured data results
+        output_file_tech_meas = f"{meas_column}.csv"
+        storage.write_frame(
+            os.path.join(output_dir_technoeco_syst, output_file_tech_meas), df_results_meas
+        )
+        output_file_flow_meas = f"{meas_column}.csv"
+        storage.write_frame(
+            os.path.join(output_dir_flows, output_file_flow_meas), df_flows_meas
+        )
+
+    # Calculate and store LCOF for each simulation tool/time series
+    for sim_column in sim_columns:
+        try:
+            simulated_profile_LCOF = _full_length_profile(profiles, sim_column, max_gap_hours)
+        except ValueError as error:
+            print(f"{error} Skipped.")
+            continue
+        LCOF_sim, df_results_sim, df_flows_sim = solve_optiplant(
+            data_units, simulated_profile_LCOF, H2_end_user_min_load, solver_name
+        )
+
+        # Save simulated data results
+        output_file_tech_sim = f"{sim_column}.csv"
+        storage.write_frame(
+            os.path.join(output_dir_technoeco_syst, output_file_tech_sim), df_results_sim
+        )
+        output_file_flow_sim = f"{sim_column}.csv"
+        storage.write_frame(
+            os.path.join(output_dir_flows, output_file_flow_sim), df_flows_sim
+        )
+
+        # Calculate LCOF difference against the measured LCOF of the same year
+        LCOF_ref = LCOF_meas[pairs[sim_column]]
+        LCOF_diff = (LCOF_sim - LCOF_ref) / LCOF_ref * 100
+        solved.append((sim_column, simulated_profile_LCOF, LCOF_sim, LCOF_diff, df_results_sim))
+        LCOF_diff_results.append(
+            {
+                "Location": location_name,
+                "Year": catalog.at[sim_column, "year"],
+                "Tool": catalog.at[sim_column, "tool"],
+                "LCOF Difference (%)": LCOF_diff,
+            }
+        )
 
+    # -------------------- Record the run in the results database --------------------
+    results_db = get_results_database(results_db)
+    if results_db is not None:
+        profile_fingerprints = {column: fingerprint(profile) for column, profile, *_ in solved}
+        run_id = results_db.start_run(
+            "LCOF",
+            location=location_name,
+            parameters={
+                "H2_end_user_min_load": H2_end_user_min_load,
+                "solver_name": solver_name,
+                "technoeco_file_name": technoeco_file_name,
+            },
+            input_fingerprint=fingerprint(file_path_technoeco.read_bytes(), *profile_fingerprints.values()),
+        )
+        results_db.record_lcof(run_id, [
+            {
+                "location": location_name,
+                "year": catalog.at[column, "year"],
+                "series": column,
+                "tool": catalog.at[column, "tool"],
+                "is_measured": column in LCOF_meas,
+                "fuel_cost": fuel_cost,
+                "lcof_difference": lcof_difference,
+                "profile_fingerprint": profile_fingerprints[column],
+            }
+            for column, _, fuel_cost, lcof_difference, _ in solved
+        ])
+        for column, _, _, _, df_results in solved:
+            results_db.record_unit_results(run_id, column, df_results)
+
+    return LCOF_diff_results
+
+
+def _full_length_profile(profiles, column, max_gap_hours=3):
+    """
+    Profile of one series with its short gaps interpolated.
+
+    Dropping the NaN would shift all later hours, as `solve_optiplant` selects the
+    hours of the year by position. Only gaps of at most `max_gap_hours` hours
+    between valid hours are filled linearly: longer gaps (outages, missing days,
+    missing first or last hours) would be bridged with invented production, e.g.
+    at night, so a ValueError is raised instead. Complete profiles are views of
+    the shared array.
+    """
+    if profiles.valid_column(column).all():
+        return profiles.column(column)
+    filled, filled_mask = fill_gaps(profiles.column(column), max_gap_steps=int(max_gap_hours))
+    remaining = int(np.isnan(filled).sum())
+    if remaining:
+        raise ValueError(
+            f"{column}: {remaining} missing hours in gaps longer than {max_gap_hours} hours. "
+            "Fill them first, e.g. with simeasren.pv_measured.clean_measured_profiles."
+        )
+    print(f"{column}: {filled_mask.sum()} missing hours filled by linear interpolation")
+    return filled
+
+
+def _load_technoeco_data(technoeco_file_name):
+    """Path and content of a techno-economic data file shipped with the package."""
     # Get package root (two levels up from this file)
     package_root = Path(__file__).resolve().parent.parent
     technoeco_dir = package_root / "data" / "techno_economic_assessment"
@@ -101,69 +276,150 @@ def calculate_all_LCOF_diff(
     if not file_path_technoeco.exists():
         raise FileNotFoundError(f"Techno-economic file not found: {file_path_technoeco}")
 
-    data_units = pd.read_csv(file_path_technoeco)
+    return file_path_technoeco, pd.read_csv(file_path_technoeco)
 
-    LCOF_diff_results = []
 
-    # Filter columns for the current location
-    loc_data = data_sim_meas[[col for col in data_sim_meas.columns if location_name in col]]
+def _non_zero_columns(profiles, columns):
+    """Columns that are not zero at every hour (failed downloads)."""
+    return [col for col in columns if not (profiles.column(col) == 0).all()]
 
-    # Identify 'PV-MEAS' column as the measured data
-    meas_column = next((col for col in loc_data.columns if "PV-MEAS" in col), None)
-    if meas_column is None:
-        print(f"No measured data for {location_name}")
-        return
 
-    # Perform the techno-economic assessment with the measured data
-    measured_profile_LCOF = loc_data[[meas_column]].dropna()
-    LCOF_meas, df_results_meas, df_flows_meas = solve_optiplant(
-        data_units, measured_profile_LCOF, H2_end_user_min_load, solver_name
-    )
+def bootstrap_LCOF_diff(
+    data_sim_meas,
+    location_name,
+    H2_end_user_min_load,
+    solver_name,
+    technoeco_file_name="Techno_eco_data_NH3",
+    n_resamples=50,
+    block_days=1,
+    confidence=0.95,
+    seed=None,
+    n_jobs=None,
+    return_samples=False,
+    year=None,
+    max_gap_hours=3,
+):
+    """
+    Block bootstrap confidence intervals of the LCOF differences.
 
-    # Save measured data results
-    output_file_tech_meas = f"{meas_column}.csv"
-    df_results_meas.to_csv(
-        os.path.join(output_dir_technoeco_syst, output_file_tech_meas), index=False
-    )
-    output_file_flow_meas = f"{meas_column}.csv"
-    df_flows_meas.to_csv(
-        os.path.join(output_dir_flows, output_file_flow_meas), index=False
+    Synthetic years are built by resampling whole days (blocks of `block_days`
+    days, see :func:`simeasren.pv_analysis.block_bootstrap_days`) with one index
+    matrix shared by the measured and all the simulated profiles, so every source
+    is evaluated on the same weather. The LCOF of each synthetic year is computed
+    with :func:`simeasren.solve_optiplant`, and the LCOF difference of each source
+    with the measured profile of its own year (see
+    :func:`simeasren.calculate_error_metrics_table`) in the same resample gives its
+    bootstrap distribution.
+
+    Unlike the error metrics, the LCOF is the optimum of a linear program, so
+    every resample needs one LP solve per profile: `n_resamples * (sources + 1)`
+    solves, run in parallel threads (the solvers run as separate processes).
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly measured and simulated profiles starting on January 1st at 00:00.
+    location_name : str
+        Name of the location to analyze.
+    H2_end_user_min_load, solver_name, technoeco_file_name
+        See :func:`simeasren.calculate_all_LCOF_diff`.
+    n_resamples : int, optional
+        Number of synthetic years (default 50).
+    block_days : int, optional
+        Length of the resampled blocks in days (default 1).
+    confidence : float, optional
+        Confidence level of the percentile intervals (default 0.95).
+    seed : int, optional
+        Seed of the resampling, for reproducible intervals.
+    n_jobs : int, optional
+        Number of LP solves run at the same time (default: number of CPU cores).
+    return_samples : bool, optional
+        If True, also return the LCOF difference of every resample.
+    year : str, optional
+        Only use the series of this year (default: all years of the location).
+    max_gap_hours : int, optional
+        Longest gap (hours) filled by linear interpolation (default 3), see
+        :func:`simeasren.calculate_all_LCOF_diff`. Simulated profiles with longer
+        gaps are skipped.
+
+    Returns
+    -------
+    pandas.DataFrame or tuple
+        One row per simulated column with `"Location"`, `"Year"`, `"Tool"`,
+        `"Series"`, `"Measured series"`, `"Mean"`, `"CI lower"`, `"CI upper"` and `"Std"` of the LCOF difference (%).
+        With `return_samples=True`, `(table, samples)` where `samples` is a
+        DataFrame of shape (resamples, series).
+
+    Raises
+    ------
+    FileNotFoundError
+        If the specified techno-economic CSV file does not exist.
+    ValueError
+        If no measured data column is found for the location, or if a measured
+        profile has gaps longer than `max_gap_hours`.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots, bootstrap_LCOF_diff
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> table = bootstrap_LCOF_diff(data_sim_meas, "Turin", 0.3, "PULP_CBC_CMD", n_resamples=20, seed=0)
+    """
+    _, data_units = _load_technoeco_data(technoeco_file_name)
+
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    catalog = profiles.catalog
+    if find_measured_column(catalog, location=location_name, year=year) is None:
+        raise ValueError(f"No measured data column found for {location_name}.")
+
+    # Each simulated profile is differenced with the measured profile of its own year
+    pairs = _measured_pairs(
+        catalog, _non_zero_columns(profiles, select_series(catalog, location=location_name, year=year, is_measured=False))
     )
+    meas_columns = list(dict.fromkeys(pairs.values()))
+    full_profiles = {col: _full_length_profile(profiles, col, max_gap_hours) for col in meas_columns}
+    for sim_column in pairs:
+        try:
+            full_profiles[sim_column] = _full_length_profile(profiles, sim_column, max_gap_hours)
+        except ValueError as error:
+            print(f"{error} Skipped.")
+    sim_columns = [col for col in pairs if col in full_profiles]
+    columns = meas_columns + sim_columns
 
-    # Identify simulations columns with only zero values
-    valid_columns = [meas_column] + [
-        col
-        for col in loc_data.columns
-        if col != meas_column and not loc_data[col].eq(0).all()
-    ]
+    # Hours of every synthetic year, shared by all the profiles
+    n_days = len(profiles) // 24
+    days = block_bootstrap_days(n_days, n_resamples, block_days, seed)
+    hours = (days[:, :, None] * 24 + np.arange(24)).reshape(n_resamples, -1)
+    full_profiles = np.column_stack([full_profiles[col] for col in columns])
 
-    # Calculate and store LCOF for each simulation tool/time series
-    for sim_column in valid_columns:
-        if sim_column != meas_column:
-            simulated_profile_LCOF = loc_data[[sim_column]].dropna()
-            LCOF_sim, df_results_sim, df_flows_sim = solve_optiplant(
-                data_units, simulated_profile_LCOF, H2_end_user_min_load, solver_name
-            )
-
-            # Save simulated data results
-            output_file_tech_sim = f"{sim_column}.csv"
-            df_results_sim.to_csv(
-                os.path.join(output_dir_technoeco_syst, output_file_tech_sim),
-                index=False,
-            )
-            output_file_flow_sim = f"{sim_column}.csv"
-            df_flows_sim.to_csv(
-                os.path.join(output_dir_flows, output_file_flow_sim), index=False
-            )
-
-            # Calculate LCOF difference
-            LCOF_diff = (LCOF_sim - LCOF_meas) / LCOF_meas * 100
-            LCOF_diff_results.append(
-                {
-                    "Location": location_name,
-                    "Tool": sim_column.split()[1],
-                    "LCOF Difference (%)": LCOF_diff,
-                }
-            )
+    def solve(task):
+        resample, j = task
+        LCOF, _, _ = solve_optiplant(data_units, full_profiles[hours[resample], j], H2_end_user_min_load, solver_name)
+        return LCOF
 
-    return LCOF_diff_results
+    tasks = [(resample, j) for resample in range(n_resamples) for j in range(len(columns))]
+    n_jobs = n_jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        LCOF = np.array(list(executor.map(solve, tasks))).reshape(n_resamples, len(columns))
+
+    LCOF_meas = LCOF[:, [meas_columns.index(pairs[col]) for col in sim_columns]]
+    samples = (LCOF[:, len(meas_columns):] - LCOF_meas) / LCOF_meas * 100
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(samples, [alpha, 1 - alpha], axis=0)
+    table = pd.DataFrame(
+        {
+            "Location": location_name,
+            "Year": [catalog.at[col, "year"] for col in sim_columns],
+            "Tool": [catalog.at[col, "tool"] for col in sim_columns],
+            "Series": sim_columns,
+            "Measured series": [pairs[col] for col in sim_columns],
+            "Mean": samples.mean(axis=0),
+            "CI lower": lower,
+            "CI upper": upper,
+            "Std": samples.std(axis=0),
+        }
+    )
+    print(f"LCOF bootstrap: {n_resamples} resamples of {n_days} days, {len(tasks)} LP solves")
+
+    if return_samples:
+        return table, pd.DataFrame(samples, columns=sim_columns)
+    return table
@@ -1,7 +1,12 @@
 import numpy as np
 import pandas as pd
+from scipy import sparse
+from scipy.optimize import linprog
 from pulp import LpProblem, LpVariable, LpMinimize, lpSum, LpStatus, value, getSolver
 
+# Solver names handled by the sparse-matrix backend (scipy.optimize.linprog method)
+SPARSE_SOLVERS = {"SCIPY_HIGHS": "highs", "SCIPY_HIGHS_DS": "highs-ds", "SCIPY_HIGHS_IPM": "highs-ipm"}
+
 # Define a function to read csv files (useful to simpliy the writting of the techno-economic optimization function)
 
 
@@ -42,10 +47,9 @@ def solve_optiplant(data_units, PV_profile, H2_end_user_min_load, solver_name):
         
         These data define the structure, interconnections, and cost 
         characteristics of each unit in the modeled system.
-    PV_profile : pandas.DataFrame
-        DataFrame containing the renewable power (e.g., solar PV) time-series profile
-        used as the main input energy source. Must have at least one column
-        with hourly values.
+    PV_profile : pandas.DataFrame, pandas.Series or numpy.ndarray
+        Renewable power (e.g., solar PV) time-series profile used as the main input
+        energy source, with hourly values. For a DataFrame the first column is used.
     H2_end_user_min_load : float
         Minimum allowable load for the hydrogen end-user unit (as a fraction of
         maximum capacity, e.g., `0.3` for 30%).
@@ -53,6 +57,9 @@ def solve_optiplant(data_units, PV_profile, H2_end_user_min_load, solver_name):
         Name of the LP solver to use. Examples include:
         - `"GUROBI_CMD"` (recommended, requires license)
         - `"PULP_CBC_CMD"` (open-source)
+        - `"SCIPY_HIGHS"`, `"SCIPY_HIGHS_DS"`, `"SCIPY_HIGHS_IPM"` (open-source, see
+          `SPARSE_SOLVERS`): the model is built as sparse matrices and solved with
+          :func:`scipy.optimize.linprog` instead of PuLP.
 
     Returns
     -------
@@ -95,6 +102,12 @@ def solve_optiplant(data_units, PV_profile, H2_end_user_min_load, solver_name):
 
     The LP model is constructed using **PuLP** and solved using the chosen backend solver.
     Optimal solutions typically take 5-10 seconds with Gurobi and 180 seconds with cbc.
+    With the `"SCIPY_*"` solvers the constraint matrices are assembled directly from
+    `data_units` and the profile, vectorized over the hours (a few hundredths of a
+    second instead of the tens of seconds PuLP needs to create about 300 000
+    variables and their constraints), and solved with HiGHS. Only the model build
+    is faster: the HiGHS solve of the full model still takes minutes (about 3.5 to
+    4 minutes on one core for the shipped NH3 data), like cbc.
 
     Examples
     --------
@@ -251,14 +264,138 @@ def solve_optiplant(data_units, PV_profile, H2_end_user_min_load, solver_name):
 
     # ------------------- Profile data ---------------------------
 
-    # Flux profiles
-    flux_profile = np.zeros(T)
-    for t in range(T):
-        flux_profile[t] = PV_profile.iloc[
-            Time[t] - 1, 0
-        ]  # Adjusted for 0-based indexing and include maintenance time
+    # Flux profiles (Time is 1-based and skips the maintenance hours)
+    if isinstance(PV_profile, pd.DataFrame):
+        PV_profile = PV_profile.iloc[:, 0]
+    flux_profile = np.asarray(PV_profile, dtype=np.float64)[np.asarray(Time) - 1]
 
     # ------------------------- Model -------------------------
+    if solver_name in SPARSE_SOLVERS:
+        # Sparse matrices built by blocks of hours, solved with scipy (HiGHS)
+        lp = _sparse_model(
+            flux_profile, T - len(Tstart), used_unit, load_min, prod_rate, h2_balance, el_balance, sc_nom,
+            invest, annuity_factor, fix_om, var_om, demand, min_d, products, reactants, tanks,
+            stor_in, stor_out, rpu,
+        )
+        solution = linprog(**lp, method=SPARSE_SOLVERS[solver_name])
+        if solution.status != 0:
+            raise RuntimeError(f"Solver failed with status: {solution.message}")
+        flows = solution.x[: U * T].reshape(U, T).T
+        capacity_values = solution.x[U * T:]
+        objective = solution.fun
+    else:
+        flows, capacity_values, objective = _solve_pulp(
+            Time, Tstart, U, used_unit, load_min, prod_rate, h2_balance, el_balance, sc_nom,
+            invest, annuity_factor, fix_om, var_om, demand, min_d, products, reactants, tanks,
+            stor_in, stor_out, rpu, flux_profile, solver_name,
+        )
+
+    # ---------------------- Results Output ----------------------
+
+    # Total electricity consumption
+    sc_tot = flows @ np.asarray(sc_nom, dtype=np.float64)
+
+    # Flows
+    df_flows = pd.DataFrame(flows, columns=flow_tag)
+    df_flows.insert(0, "Time", Time)  # Insert the time column as first column
+    df_flows["Electricity consumption"] = (
+        sc_tot  # Insert electrical consumption as last column
+    )
+
+    # ---------------------- Main Results ----------------------
+    R_fixOM = [0] * U
+    R_varOM = [0] * U
+    R_invest = [0] * U
+    R_invest_year = [0] * U
+    R_production = [0] * U
+    R_capacity = [0] * U
+    R_El_cons = [0] * U
+    R_cost_unit = [0] * U
+    R_load_av = [0] * U
+    R_FLH = [0] * U
+    R_prodcost_fuel = [0] * U
+    R_prodcost_perunit = [0] * U
+    R_elec_cost = [0] * U
+
+    for u in range(U):
+        total_flow = float(flows[:, u].sum())
+        R_capacity[u] = capacity_values[u] * 1e-3  # Convert to MW or t/h
+        R_invest[u] = invest[u] * capacity_values[u] * 1e-6  # Convert to M€
+        R_invest_year[u] = R_invest[u] * annuity_factor[u]  # Annualized investment
+        R_fixOM[u] = fix_om[u] * capacity_values[u] * 1e-6  # Convert to M€
+        R_varOM[u] = var_om[u] * total_flow * 1e-6  # Convert to M€
+        R_production[u] = total_flow * 1e-6  # ktons or GWh
+        R_cost_unit[u] = R_invest_year[u] + R_fixOM[u] + R_varOM[u]
+
+        if capacity_values[u] != 0:
+            R_load_av[u] = float((flows[:, u] / capacity_values[u]).sum()) * (1 / T)
+        else:
+            R_load_av[u] = 0
+
+        R_FLH[u] = R_load_av[u] * T
+        R_El_cons[u] = sc_nom[u] * total_flow * 1e-6
+
+        if R_production[u] == 0:
+            R_prodcost_perunit[u] = 0
+        else:
+            R_prodcost_perunit[u] = R_cost_unit[u] / R_production[u]
+
+    for u in main_fuel:
+        R_prodcost_fuel[u] = (objective * 1e-6) / R_production[u]
+
+    R_elec_cost_1 = (
+        1e3
+        * sum(R_prodcost_perunit[u] * R_production[u] for u in pu)
+        / sum(R_production[u] for u in pu)
+    )
+    for u in range(U):
+        R_elec_cost[u] = R_elec_cost_1
+
+    # Create DataFrame for results
+    df_results = pd.DataFrame(
+        {
+            "Type of unit": unit_name,
+            "Installed capacity (MW, t/h, MWh, t)": R_capacity,
+            "Total investment (MEUR)": R_invest,
+            "Annualised investment (MEUR)": R_invest_year,
+            "Fixed O&M (MEUR)": R_fixOM,
+            "Variable O&M (MEUR)": R_varOM,
+            "Cost per unit (MEUR)": R_cost_unit,
+            "Production (kton or GWh)": R_production,
+            "Electricity consumption (GWh)": R_El_cons,
+            "Production cost fuel (EUR/kg)": R_prodcost_fuel,
+            "Load average": R_load_av,
+            "Full load hours": R_FLH,
+            "Average electricity cost (EUR/MWh)": R_elec_cost,
+        }
+    )
+
+    # Display fuel cost for the H2 end-user
+    fuel_cost = R_prodcost_fuel[0] * 1000  # Assumes H2 is first in techno-economic data
+    print(f"Fuel cost: {fuel_cost} EUR/t")
+
+    if df_results.empty:
+        raise ValueError(
+            "Optimization produced no results. Check constraints or input data."
+        )
+
+    return fuel_cost, df_results, df_flows
+
+
+def _solve_pulp(
+    Time, Tstart, U, used_unit, load_min, prod_rate, h2_balance, el_balance, sc_nom,
+    invest, annuity_factor, fix_om, var_om, demand, min_d, products, reactants, tanks,
+    stor_in, stor_out, rpu, flux_profile, solver_name,
+):
+    """
+    Build the OptiPlant model with one PuLP variable per unit and hour and solve it.
+
+    Returns the flows (hours x units), the installed capacities and the total cost.
+    """
+    T = len(Time)
+    n_prod = len(products)
+    n_st = len(tanks)
+
     # Initialize the model
     model_lp = LpProblem("TechnoEconomicOptimization", LpMinimize)
 
@@ -367,129 +504,119 @@ def solve_optiplant(data_units, PV_profile, H2_end_user_min_load, solver_name):
 
     model_lp.solve(solver)  # Default solver (cbc)
 
-    # ---------------------- Results Output ----------------------
-
     if model_lp.status != 1:  # 1 indicates "Optimal"
         raise RuntimeError(f"Solver failed with status: {LpStatus[model_lp.status]}")
 
-    if LpStatus[model_lp.status] == "Optimal":
-        # Total electricity consumption
-        sc_tot = [
-            sum(sc_nom[u] * X[(u, Time[t - 1])].varValue for u in range(U))
-            for t in range(1, T + 1)
-        ]
-
-        # Flows
-        solution_x = [
-            [X[(u, Time[t - 1])].varValue for u in range(U)] for t in range(1, T + 1)
-        ]
-        df_flows = pd.DataFrame(solution_x, columns=flow_tag)
-        df_flows.insert(0, "Time", Time)  # Insert the time column as first column
-        df_flows["Electricity consumption"] = (
-            sc_tot  # Insert electrical consumption as last column
-        )
+    flows = np.array([[X[(u, t)].varValue for u in range(U)] for t in Time], dtype=np.float64)
+    capacity_values = np.array([capacity[u].varValue for u in range(U)], dtype=np.float64)
+    return flows, capacity_values, value(model_lp.objective)
 
-        # ---------------------- Main Results ----------------------
-        R_fixOM = [0] * U
-        R_varOM = [0] * U
-        R_invest = [0] * U
-        R_invest_year = [0] * U
-        R_production = [0] * U
-        R_capacity = [0] * U
-        R_El_cons = [0] * U
-        R_cost_unit = [0] * U
-        R_load_av = [0] * U
-        R_FLH = [0] * U
-        R_prodcost_fuel = [0] * U
-        R_prodcost_perunit = [0] * U
-        R_elec_cost = [0] * U
 
-        for u in range(U):
-            R_capacity[u] = capacity[u].varValue * 1e-3  # Convert to MW or t/h
-            R_invest[u] = invest[u] * capacity[u].varValue * 1e-6  # Convert to M€
-            R_invest_year[u] = R_invest[u] * annuity_factor[u]  # Annualized investment
-            R_fixOM[u] = fix_om[u] * capacity[u].varValue * 1e-6  # Convert to M€
-            R_varOM[u] = (
-                sum(var_om[u] * X[(u, t)].varValue for t in Time) * 1e-6
-            )  # Convert to M€
-            R_production[u] = (
-                sum(X[(u, t)].varValue for t in Time) * 1e-6
-            )  # ktons or GWh
-            R_cost_unit[u] = R_invest_year[u] + R_fixOM[u] + R_varOM[u]
-
-            if capacity[u].varValue != 0:
-                R_load_av[u] = sum(
-                    X[(u, t)].varValue / capacity[u].varValue for t in Time
-                ) * (1 / T)
-            else:
-                R_load_av[u] = 0
-
-            R_FLH[u] = R_load_av[u] * T
-            R_El_cons[u] = sum(sc_nom[u] * X[(u, t)].varValue for t in Time) * 1e-6
-
-            if R_production[u] == 0:
-                R_prodcost_perunit[u] = 0
-            else:
-                R_prodcost_perunit[u] = R_cost_unit[u] / R_production[u]
-
-        for u in main_fuel:
-            R_prodcost_fuel[u] = (value(model_lp.objective) * 1e-6) / R_production[u]
-
-        R_elec_cost_1 = (
-            1e3
-            * sum(R_prodcost_perunit[u] * R_production[u] for u in pu)
-            / sum(R_production[u] for u in pu)
-        )
-        for u in range(U):
-            R_elec_cost[u] = R_elec_cost_1
-
-        # Create DataFrame for results
-        df_results = pd.DataFrame(
-            {
-                "Type of unit": unit_name,
-                "Installed capacity (MW, t/h, MWh, t)": R_capacity,
-                "Total investment (MEUR)": R_invest,
-                "Annualised investment (MEUR)": R_invest_year,
-                "Fixed O&M (MEUR)": R_fixOM,
-                "Variable O&M (MEUR)": R_varOM,
-                "Cost per unit (MEUR)": R_cost_unit,
-                "Production (kton or GWh)": R_production,
-                "Electricity consumption (GWh)": R_El_cons,
-                "Production cost fuel (EUR/kg)": R_prodcost_fuel,
-                "Load average": R_load_av,
-                "Full load hours": R_FLH,
-                "Average electricity cost (EUR/MWh)": R_elec_cost,
-            }
-        )
+def _sparse_model(
+    flux_profile, n_begin, used_unit, load_min, prod_rate, h2_balance, el_balance, sc_nom,
+    invest, annuity_factor, fix_om, var_om, demand, min_d, products, reactants, tanks,
+    stor_in, stor_out, rpu,
+):
+    """
+    OptiPlant model as sparse matrices, for :func:`scipy.optimize.linprog`.
+
+    The variables are the flows of each unit over the hours (`u * T + t`) followed by
+    the capacities (`U * T + u`); every constraint family is added as one block of
+    `T` rows with numpy index arithmetic. The total cost is the objective itself, the
+    bought quantities (equal to the flows) are dropped and the sold quantities of the
+    units with a yearly demand are replaced by `sum_t X[u, t] >= demand[u]`, which
+    admits the same flows and capacities.
+    """
+    T = len(flux_profile)
+    U = len(used_unit)
+    time = np.arange(T)
+    terms = {"eq": [], "ub": []}
+    n_rows = {"eq": 0, "ub": 0}
 
-        # Rename columns
-        result_columns = [
-            "Type of unit",
-            "Installed capacity (MW, t/h, MWh, t)",
-            "Total investment (MEUR)",
-            "Annualised investment (MEUR)",
-            "Fixed O&M (MEUR)",
-            "Variable O&M (MEUR)",
-            "Cost per unit (MEUR)",
-            "Production (kton or GWh)",
-            "Electricity consumption (GWh)",
-            "Production cost fuel (EUR/kg)",
-            "Load average",
-            "Full load hours",
-            "Average electricity cost (EUR/MWh)",
-        ]
-        df_results.columns = result_columns
+    def flow(u, t=time):
+        return u * T + t
 
-    else:
-        print("No optimal solution available")
+    def capacity(u):
+        return U * T + u
 
-    # Display fuel cost for the H2 end-user
-    fuel_cost = R_prodcost_fuel[0] * 1000  # Assumes H2 is first in techno-economic data
-    print(f"Fuel cost: {fuel_cost} EUR/t")
+    def add(kind, rows, columns, coefficients):
+        rows, columns, coefficients = np.broadcast_arrays(rows, columns, np.asarray(coefficients, dtype=np.float64))
+        terms[kind].append((rows.ravel(), columns.ravel(), coefficients.ravel()))
 
-    if df_results.empty:
-        raise ValueError(
-            "Optimization produced no results. Check constraints or input data."
-        )
+    def new_rows(kind, count=T):
+        rows = n_rows[kind] + np.arange(count)
+        n_rows[kind] += count
+        return rows
 
-    return fuel_cost, df_results, df_flows
\ No newline at end of file
+    # Production rates
+    for product, reactant in zip(products, reactants):
+        rows = new_rows("eq")
+        add("eq", rows, flow(product), 1.0)
+        add("eq", rows, flow(reactant), -prod_rate[product])
+
+    # Hydrogen balance
+    rows = new_rows("eq")
+    for u in np.flatnonzero(np.asarray(h2_balance, dtype=np.float64)):
+        add("eq", rows, flow(u), h2_balance[u])
+
+    # Storage balance
+    for tank, inflow, outflow in zip(tanks, stor_in, stor_out):
+        rows = new_rows("eq")
+        add("eq", rows, flow(tank), 1.0)
+        add("eq", rows[1:], flow(tank, time[:-1]), -1.0)
+        add("eq", rows, flow(inflow), -1.0)
+        add("eq", rows, flow(outflow), 1.0)
+
+    # Renewable energy production (profile dependent)
+    rows = new_rows("eq")
+    add("eq", rows, flow(rpu[0]), 1.0)
+    add("eq", rows, capacity(rpu[0]), -flux_profile)
+
+    # Electricity produced and consumed must be at equilibrium
+    net_electricity = np.asarray(el_balance, dtype=np.float64) - np.asarray(sc_nom, dtype=np.float64)
+    rows = new_rows("eq")
+    for u in np.flatnonzero(net_electricity):
+        add("eq", rows, flow(u), net_electricity[u])
+
+    # Load constraints (unused units are fixed to zero by their bounds)
+    for u in np.flatnonzero(np.asarray(used_unit) != 0):
+        rows = new_rows("ub")
+        add("ub", rows, flow(u), 1.0)  # Max flow
+        add("ub", rows, capacity(u), -1.0)
+        if load_min[u] > 0:
+            rows = new_rows("ub", T - n_begin)
+            add("ub", rows, flow(u, time[n_begin:]), -1.0)  # Min flow
+            add("ub", rows, capacity(u), load_min[u])
+
+    # Yearly demand
+    b_ub = np.zeros(n_rows["ub"] + len(min_d))
+    for i in min_d:
+        row = new_rows("ub", 1)
+        add("ub", row, flow(i), -1.0)
+        b_ub[row] = -demand[i]
+
+    n_variables = U * T + U
+    matrices = {}
+    for kind, blocks in terms.items():
+        rows, columns, coefficients = (np.concatenate(part) for part in zip(*blocks))
+        matrices[kind] = sparse.csr_array(
+            (coefficients, (rows, columns)), shape=(n_rows[kind], n_variables)
+        )  # Duplicated entries are summed
+
+    cost = np.concatenate([
+        np.repeat(np.asarray(var_om, dtype=np.float64), T),
+        np.asarray(invest, dtype=np.float64) * np.asarray(annuity_factor, dtype=np.float64)
+        + np.asarray(fix_om, dtype=np.float64),
+    ])
+    upper = np.where(np.asarray(used_unit) == 0, 0.0, np.inf)
+    bounds = np.zeros((n_variables, 2))
+    bounds[:, 1] = np.concatenate([np.repeat(upper, T), upper])
+
+    return {
+        "c": cost,
+        "A_ub": matrices["ub"],
+        "b_ub": b_ub,
+        "A_eq": matrices["eq"],
+        "b_eq": np.zeros(n_rows["eq"]),
+        "bounds": bounds,
+    }
@@ -0,0 +1,218 @@
+import os
+import json
+import sqlite3
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from .results_db import fingerprint
+
+# ---------------------------- Content-addressed cache of error metrics (SQLite) -----------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_cache (
+    measured_hash TEXT NOT NULL,
+    simulated_hash TEXT NOT NULL,
+    metric_set TEXT NOT NULL,
+    metrics TEXT NOT NULL,
+    created TEXT NOT NULL,
+    last_used TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (measured_hash, simulated_hash, metric_set)
+);
+CREATE INDEX IF NOT EXISTS idx_metric_cache_last_used ON metric_cache(last_used);
+"""
+
+
+def series_hash(values, valid=None):
+    """Content hash of a profile and of its validity mask (see :func:`simeasren.results_db.fingerprint`)."""
+    values = np.asarray(values, dtype=np.float64)
+    return fingerprint(values, ~np.isnan(values) if valid is None else np.asarray(valid, dtype=bool))
+
+
+class MetricCache:
+    """
+    Error metrics of (measured, simulated) series pairs, keyed by the content of the series.
+
+    The key of an entry is the hash of the measured series, the hash of the
+    simulated series (values and validity mask, see :func:`series_hash`) and the
+    version of the metric set, so an entry is reused whenever the same two series
+    are compared again, whatever their column names or the other columns of the
+    data. Changing a series changes its hash: its old entries are no longer used
+    and are evicted in time. When the cache holds more than `max_entries` entries,
+    the least recently used ones are removed.
+
+    Parameters
+    ----------
+    path : str, optional
+        Cache file (default `"results/simeasren_metric_cache.sqlite"`), created if
+        needed. `":memory:"` keeps the cache in memory.
+    max_entries : int, optional
+        Maximum number of entries (default 100,000, a few tens of MB).
+
+    Examples
+    --------
+    >>> from simeasren import MetricCache, set_metric_cache, calculate_error_metrics
+    >>> set_metric_cache(MetricCache())
+    >>> mean_diff, mae, rmse = calculate_error_metrics(data_sim_meas, "Turin")  # Computes and stores
+    >>> mean_diff, mae, rmse = calculate_error_metrics(data_sim_meas, "Turin")  # Read from the cache
+    >>> get_metric_cache().stats()
+    {'entries': 7, 'hits': 7, 'misses': 7, 'evicted': 0}
+    """
+
+    def __init__(self, path="results/simeasren_metric_cache.sqlite", max_entries=100000):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def __repr__(self):
+        return f"<MetricCache '{self.path}' max_entries={self.max_entries}>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        # Worker processes open their own connection to the same file
+        return {"path": self.path, "max_entries": self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["max_entries"])
+
+    def close(self):
+        self.connection.close()
+
+    def get_many(self, keys, metric_set):
+        """
+        Look up pairs of series.
+
+        Parameters
+        ----------
+        keys : list of tuple
+            `(measured_hash, simulated_hash)` of each pair.
+        metric_set : str
+            Version of the metric set (e.g., `simeasren.pv_analysis.metrics.METRIC_SET`).
+
+        Returns
+        -------
+        dict
+            `{key: metrics}` for the keys found, `metrics` being the stored dict.
+        """
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 400):  # Stay below the SQLite parameter limit
+            batch = unique[start:start + 400]
+            rows = self.connection.execute(
+                "SELECT measured_hash, simulated_hash, metrics FROM metric_cache WHERE metric_set = ? AND "
+                f"(measured_hash, simulated_hash) IN (VALUES {', '.join(['(?, ?)'] * len(batch))})",
+                (metric_set, *(part for key in batch for part in key)),
+            ).fetchall()
+            found.update({(measured, simulated): json.loads(metrics) for measured, simulated, metrics in rows})
+        if found:
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE metric_cache SET hits = hits + 1, last_used = ? "
+                    "WHERE measured_hash = ? AND simulated_hash = ? AND metric_set = ?",
+                    [(_now(), measured, simulated, metric_set) for measured, simulated in found],
+                )
+        self.hits += sum(key in found for key in keys)
+        self.misses += sum(key not in found for key in keys)
+        return found
+
+    def put_many(self, entries, metric_set):
+        """
+        Store the metrics of pairs of series, then evict the least recently used entries beyond `max_entries`.
+
+        Parameters
+        ----------
+        entries : dict
+            `{(measured_hash, simulated_hash): metrics}`, `metrics` being a dict of numbers.
+        metric_set : str
+            Version of the metric set.
+        """
+        now = _now()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO metric_cache (measured_hash, simulated_hash, metric_set, metrics, created, "
+                "last_used, hits) VALUES (?, ?, ?, ?, ?, ?, 0)",
+                [
+                    (measured, simulated, metric_set, json.dumps(metrics), now, now)
+                    for (measured, simulated), metrics in entries.items()
+                ],
+            )
+        self.evict()
+
+    def evict(self, max_entries=None):
+        """Remove the least recently used entries beyond `max_entries` (default: the cache limit). Returns their number."""
+        max_entries = self.max_entries if max_entries is None else max_entries
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM metric_cache").fetchone()
+        excess = count - max_entries
+        if excess <= 0:
+            return 0
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM metric_cache WHERE rowid IN "
+                "(SELECT rowid FROM metric_cache ORDER BY last_used, hits LIMIT ?)",
+                (excess,),
+            )
+        self.evicted += excess
+        return excess
+
+    def clear(self):
+        """Remove all entries."""
+        with self.connection:
+            self.connection.execute("DELETE FROM metric_cache")
+
+    def entries(self, metric_set=None):
+        """All entries as a DataFrame, one column per stored metric, most recently used first."""
+        frame = pd.read_sql_query(
+            "SELECT * FROM metric_cache WHERE (? IS NULL OR metric_set = ?) ORDER BY last_used DESC",
+            self.connection,
+            params=(metric_set, metric_set),
+        )
+        metrics = pd.DataFrame([json.loads(value) for value in frame.pop("metrics")], index=frame.index)
+        return pd.concat([frame, metrics], axis=1)
+
+    def stats(self):
+        """Number of entries, and hits, misses and evictions since this cache object was opened."""
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM metric_cache").fetchone()
+        return {"entries": count, "hits": self.hits, "misses": self.misses, "evicted": self.evicted}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+_default_cache = None
+
+
+def get_metric_cache(cache=None):
+    """Return `cache` if given, else the cache set with :func:`set_metric_cache` (None if not set)."""
+    return cache if cache is not None else _default_cache
+
+
+def set_metric_cache(cache=None):
+    """
+    Set the cache used by all error metric calculations.
+
+    Parameters
+    ----------
+    cache : MetricCache or str, optional
+        Cache, or path of a cache file. None stops caching.
+
+    Returns
+    -------
+    MetricCache or None
+        The previous cache.
+    """
+    global _default_cache
+    previous = _default_cache
+    _default_cache = MetricCache(cache) if isinstance(cache, str) else cache
+    return previous
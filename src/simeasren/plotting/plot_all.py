@@ -10,13 +10,15 @@ from .plots import (
 )
 from ..pv_analysis.metrics import calculate_error_metrics
 from ..plotting import plot_style_config as style_config
+from ..series_catalog import build_series_catalog
+from ..storage import get_storage
 
 import os
 
 # ---------------------------------------------------------------------------
 # 1. PV time series plots (capacity factor, scatter, error metrics)
 # ---------------------------------------------------------------------------
-def generate_PV_timeseries_plots(data_sim_meas, location_name: str, year: str, output_root: str = "results"):
+def generate_PV_timeseries_plots(data_sim_meas, location_name: str, year: str, output_root: str = "results", storage=None):
 
     """
     Generate photovoltaic (PV) time-series comparison plots for measured and simulated data.
@@ -42,6 +44,9 @@ def generate_PV_timeseries_plots(data_sim_meas, location_name: str, year: str, o
     output_root : str, optional
         Root directory where all plots and results will be saved.  
         Defaults to "results".
+    storage : LocalStorage, MemoryStorage or WriteBehindStorage, optional
+        Where the figures are written (default: the storage set with
+        :func:`simeasren.set_storage`, the local disk unless changed).
 
     Returns
     -------
@@ -101,10 +106,10 @@ def generate_PV_timeseries_plots(data_sim_meas, location_name: str, year: str, o
 
     # -------------------- Create output directory --------------------
     output_dir_timeseries = os.path.join(output_root, location_name, "Time series analysis results")
-    os.makedirs(output_dir_timeseries, exist_ok=True)
+    get_storage(storage).makedirs(output_dir_timeseries)
 
     # -------------------- Legend names and formatting --------------------
-    legend_names = sorted(set(col.split()[1] for col in data_sim_meas.columns))
+    legend_names = sorted(set(build_series_catalog(data_sim_meas.columns)["tool"]))
 
     colors_CF, linestyles_CF, line_widths_CF = capacity_factor_formatting(
         legend_names=legend_names,
@@ -121,6 +126,7 @@ def generate_PV_timeseries_plots(data_sim_meas, location_name: str, year: str, o
         linestyles_CF=linestyles_CF,
         line_widths_CF=line_widths_CF,
         output_dir_timeseries=output_dir_timeseries,
+        storage=storage,
     )
 
     # -------------------- Scatter Comparison --------------------
@@ -130,6 +136,7 @@ def generate_PV_timeseries_plots(data_sim_meas, location_name: str, year: str, o
         year=year,
         custom_cmap=style_config.CUSTOM_CMAP,
         output_dir_timeseries=output_dir_timeseries,
+        storage=storage,
     )
 
     # -------------------- Error Metrics --------------------
@@ -149,13 +156,14 @@ def generate_PV_timeseries_plots(data_sim_meas, location_name: str, year: str, o
         plot_palette=style_config.PLOT_PALETTE,
         legend_names=legend_names,
         output_dir_timeseries=output_dir_timeseries,
+        storage=storage,
     )
 
 
 # ---------------------------------------------------------------------------
 # 2. High-resolution PV plots (clear & cloudy days)
 # ---------------------------------------------------------------------------
-def generate_high_res_PV_plots(clear_sky_df, cloudy_sky_df, location_name: str, year: str, output_root: str = "results"):
+def generate_high_res_PV_plots(clear_sky_df, cloudy_sky_df, location_name: str, year: str, output_root: str = "results", storage=None):
 
     """
     Generate high-resolution photovoltaic (PV) plots for clear and cloudy sky conditions.
@@ -179,6 +187,9 @@ def generate_high_res_PV_plots(clear_sky_df, cloudy_sky_df, location_name: str,
     output_root : str, optional
         Root directory where all plots and results will be saved.
         Defaults to `"results"`.
+    storage : LocalStorage, MemoryStorage or WriteBehindStorage, optional
+        Where the figures are written (default: the storage set with
+        :func:`simeasren.set_storage`, the local disk unless changed).
 
     Returns
     -------
@@ -220,15 +231,14 @@ def generate_high_res_PV_plots(clear_sky_df, cloudy_sky_df, location_name: str,
     """
     # -------------------- Create output directory --------------------
     output_dir_timeseries = os.path.join(output_root, location_name, "Time series analysis results")
-    os.makedirs(output_dir_timeseries, exist_ok=True)
+    get_storage(storage).makedirs(output_dir_timeseries)
 
     # -------------------- Legend names and formatting --------------------
     legend_names_high_res = sorted(
         set(
-            col.split()[1]
+            tool
             for df in [clear_sky_df, cloudy_sky_df]
-            for col in df.columns
-            if len(col.split()) == 2  # Only two-part column names (e.g., "Almeria PV-MEAS")
+            for tool in build_series_catalog(df.columns)["tool"]  # Only series columns (e.g., "Almeria PV-MEAS")
         )
     )
 
@@ -247,13 +257,14 @@ def generate_high_res_PV_plots(clear_sky_df, cloudy_sky_df, location_name: str,
         linestyles_high_res=linestyles_high_res,
         line_widths_high_res=line_widths_high_res,
         output_dir_timeseries=output_dir_timeseries,
+        storage=storage,
     )
 
 
 # ---------------------------------------------------------------------------
 # 3 - Wrapper that calls both
 # ---------------------------------------------------------------------------
-def generate_PV_plots(data_sim_meas, clear_sky_df, cloudy_sky_df, location_name: str, year: str, output_root: str = "results"):
+def generate_PV_plots(data_sim_meas, clear_sky_df, cloudy_sky_df, location_name: str, year: str, output_root: str = "results", storage=None):
 
     """
     Generate all photovoltaic (PV) plots for a given location and year.
@@ -283,6 +294,9 @@ def generate_PV_plots(data_sim_meas, clear_sky_df, cloudy_sky_df, location_name:
     output_root : str, optional
         Root directory where all plots and results will be saved.
         Defaults to `"results"`.
+    storage : LocalStorage, MemoryStorage or WriteBehindStorage, optional
+        Where the figures are written (default: the storage set with
+        :func:`simeasren.set_storage`, the local disk unless changed).
 
     Returns
     -------
@@ -328,15 +342,15 @@ def generate_PV_plots(data_sim_meas, clear_sky_df, cloudy_sky_df, location_name:
         print(f"Year {year} not available for {location_name}, skipping plots.")
         return
 
-    generate_PV_timeseries_plots(data_sim_meas, location_name, year, output_root)
-    generate_high_res_PV_plots(clear_sky_df, cloudy_sky_df, location_name, year, output_root)
+    generate_PV_timeseries_plots(data_sim_meas, location_name, year, output_root, storage)
+    generate_high_res_PV_plots(clear_sky_df, cloudy_sky_df, location_name, year, output_root, storage)
 
 
 # ---------------------------------------------------------------------------
 # 4 - Function for LCOF difference plots
 # ---------------------------------------------------------------------------
 
-def generate_LCOF_diff_plot(LCOF_diff_results, location_name: str, year: str, H2_end_user_min_load: float, output_root: str = "results"):
+def generate_LCOF_diff_plot(LCOF_diff_results, location_name: str, year: str, H2_end_user_min_load: float, output_root: str = "results", storage=None):
 
     """
     Generate Levelized Cost of Fuel (LCOF) difference plots for a given location and year.
@@ -366,6 +380,9 @@ def generate_LCOF_diff_plot(LCOF_diff_results, location_name: str, year: str, H2
     output_root : str, optional
         Root directory where all plots and assessment results are saved.
         Defaults to "results".
+    storage : LocalStorage, MemoryStorage or WriteBehindStorage, optional
+        Where the figures are written (default: the storage set with
+        :func:`simeasren.set_storage`, the local disk unless changed).
 
     Returns
     -------
@@ -413,8 +430,8 @@ def generate_LCOF_diff_plot(LCOF_diff_results, location_name: str, year: str, H2
     output_dir_technoeco = os.path.join(output_root, location_name, "Techno-eco assessments results")
     output_dir_technoeco_syst = os.path.join(output_dir_technoeco, f"End-user flex[{H2_end_user_min_load}-1]", "System size and costs")
     output_dir_flows = os.path.join(output_dir_technoeco, f"End-user flex[{H2_end_user_min_load}-1]", "Hourly profiles")
-    os.makedirs(output_dir_technoeco_syst, exist_ok=True)
-    os.makedirs(output_dir_flows, exist_ok=True)
+    get_storage(storage).makedirs(output_dir_technoeco_syst)
+    get_storage(storage).makedirs(output_dir_flows)
 
     # -------------------- Legend names --------------------
     
@@ -429,6 +446,7 @@ def generate_LCOF_diff_plot(LCOF_diff_results, location_name: str, year: str, H2
         legend_names=legend_names,
         H2_end_user_min_load=H2_end_user_min_load,
         plot_palette=style_config.PLOT_PALETTE,
-        output_dir_technoeco=output_dir_technoeco
+        output_dir_technoeco=output_dir_technoeco,
+        storage=storage,
     )
 
@@ -5,11 +5,14 @@ import seaborn as sns
 import pandas as pd
 import numpy as np
 from ..plotting import plot_style_config as style_config
+from ..series_catalog import build_series_catalog, select_series, find_measured_column
+from ..storage import get_storage
+from ..pv_analysis.duration_curves import duration_curves
 
 #------------------- Plot capacity factor duration curve -------------------------
 
 
-def plot_capacity_factors(data_sim_meas, location_name, year, legend_names, colors_CF, linestyles_CF, line_widths_CF, output_dir_timeseries, x_limit=5000):
+def plot_capacity_factors(data_sim_meas, location_name, year, legend_names, colors_CF, linestyles_CF, line_widths_CF, output_dir_timeseries, x_limit=5000, storage=None):
     """
     Plot the capacity factor figure for a given location and dataset.
 
@@ -22,20 +25,21 @@ def plot_capacity_factors(data_sim_meas, location_name, year, legend_names, colo
         line_widths_CF (list): List of line widths for each time series.
         output_dir_timeseries (str): Path to save the figure.
         x_limit (int, optional): Maximum x-axis value (default is 5000).
+        storage (optional): Storage the figure is written to (default: :func:`simeasren.get_storage`).
     """
 
     plt.figure(figsize=(10, 6))
 
     # Filter columns for the current location
-    loc_data = data_sim_meas[
-        [col for col in data_sim_meas.columns if col.startswith(location_name)]
-    ]
+    catalog = build_series_catalog(data_sim_meas.columns)
+    loc_columns = select_series(catalog, location=location_name, year=year)
+    tool_columns = dict(zip(catalog.loc[loc_columns, "tool"], loc_columns))
  
-    # Sort data descending by value for each column (hourly capacity factor)
-    loc_data_sorted = loc_data.apply(lambda x: x.sort_values(ascending=False).reset_index(drop=True))
+    # Duration curves of all columns in one sort (cached, shared with the duration curve metrics)
+    loc_data_sorted = duration_curves(data_sim_meas, loc_columns)
     for idx, tool in enumerate(legend_names):
-        tool_column = f"{location_name}{year} {tool}"
-        if tool_column in loc_data_sorted.columns:
+        tool_column = tool_columns.get(tool)
+        if tool_column is not None:
             plt.plot(
                 loc_data_sorted[tool_column],
                 label=tool,
@@ -53,7 +57,7 @@ def plot_capacity_factors(data_sim_meas, location_name, year, legend_names, colo
     plt.legend(loc="upper right", fontsize=12)
 
     output_file = os.path.join(output_dir_timeseries, f"{location_name}{year}_Capacity_Factors.png")
-    plt.savefig(output_file, bbox_inches="tight")
+    get_storage(storage).write_figure(output_file, plt.gcf(), bbox_inches="tight")
     plt.close()
     
     print(f"Capacity factors figure successfully saved at '{output_file}'")
@@ -115,7 +119,7 @@ def capacity_factor_formatting(
 
 #----------------- Scatter measured vs simulation -------------------
 
-def plot_scatter_comparison(data_sim_meas, location_name, year, custom_cmap, output_dir_timeseries):
+def plot_scatter_comparison(data_sim_meas, location_name, year, custom_cmap, output_dir_timeseries, storage=None):
     """
     Plot scatter plots comparing measured vs simulated data for multiple simulation columns.
 
@@ -126,22 +130,24 @@ def plot_scatter_comparison(data_sim_meas, location_name, year, custom_cmap, out
         location_name (str): Name of the location.
         custom_cmap: Colormap for KDE plot.
         output_dir_timeseries (str): Directory to save the scatter plot figure.
+        storage (optional): Storage the figure is written to (default: :func:`simeasren.get_storage`).
     """
     # Filter columns for the current location
-    loc_data = data_sim_meas[
-        [col for col in data_sim_meas.columns if col.startswith(location_name)]
-    ]
+    catalog = build_series_catalog(data_sim_meas.columns)
 
     # Identify 'PV-MEAS' column as the real (measured) data
-    meas_column = next((col for col in loc_data.columns if "PV-MEAS" in col), None)
+    meas_column = find_measured_column(catalog, location=location_name)
     if meas_column is None:
         print(f"Skipping {location_name}{year}: 'PV-MEAS' column missing.")
 
+    sim_columns = select_series(catalog, location=location_name, is_measured=False)
+    loc_data = data_sim_meas[[meas_column] + sim_columns]
+
     # Identify simulations columns with only zero values
     valid_columns = [meas_column] + [
         col
-        for col in loc_data.columns
-        if col != meas_column and not loc_data[col].eq(0).all()
+        for col in sim_columns
+        if not loc_data[col].eq(0).all()
     ]
 
     # Filter data to exclude rows with zero values in the measured data column and simulation columns with only zero values (used for scatter plot only)
@@ -197,7 +203,7 @@ def plot_scatter_comparison(data_sim_meas, location_name, year, custom_cmap, out
             ax=ax,
         )
 
-        ax.set_title(f"{location_name}{year} - {sim_col.split()[1]}", fontsize=20)
+        ax.set_title(f"{location_name}{year} - {catalog.at[sim_col, 'tool']}", fontsize=20)
         ax.set_xlabel("Measured Data", fontsize=18)
         ax.set_ylabel("Simulated Data", fontsize=18)
         ax.set_xlim(0, 1)
@@ -211,13 +217,13 @@ def plot_scatter_comparison(data_sim_meas, location_name, year, custom_cmap, out
 
     plt.tight_layout()
     output_file = os.path.join(output_dir_timeseries, f"{location_name}{year}_scatterplot.png")
-    plt.savefig(output_file)
+    get_storage(storage).write_figure(output_file, plt.gcf())
     plt.close()
     print(f"Scatter plot figure successfully saved at '{output_file}'")
 
 #------------------ Plot for error metrics -----------------
 
-def plot_error_metrics(location_name, year, mean_diff_results, mae_results, rmse_results, plot_palette, legend_names, output_dir_timeseries):
+def plot_error_metrics(location_name, year, mean_diff_results, mae_results, rmse_results, plot_palette, legend_names, output_dir_timeseries, storage=None):
     """
     Plot error metrics (Mean Difference, MAE, RMSE) for a location.
 
@@ -230,6 +236,7 @@ def plot_error_metrics(location_name, year, mean_diff_results, mae_results, rmse
         plot_palette (dict): Dictionary mapping tools to colors for the bar plots.
         legend_names (list): List of tools to include in the legend.
         output_dir_timeseries (str): Directory to save the combined metrics figure.
+        storage (optional): Storage the figure is written to (default: :func:`simeasren.get_storage`).
     """
 
     def add_labels(ax):
@@ -330,14 +337,14 @@ def plot_error_metrics(location_name, year, mean_diff_results, mae_results, rmse
 
     # Save figure
     output_file = os.path.join(output_dir_timeseries, f"{location_name}{year}_Errors_Analysis.png")
-    plt.savefig(output_file, bbox_inches="tight")
+    get_storage(storage).write_figure(output_file, plt.gcf(), bbox_inches="tight")
     plt.close()
     print(f"Combined error analysis figure successfully saved at '{output_file}'")
 
 #-------------------- High resolution figure -------------------------------
 
 def plot_high_res_days(df_clear, df_cloudy, location_name, legend_names_high_res, colors_high_res,
-                        linestyles_high_res, line_widths_high_res, output_dir_timeseries):
+                        linestyles_high_res, line_widths_high_res, output_dir_timeseries, storage=None):
     """
     Plot high-resolution PV data for Clear Sky and Cloudy Sky days side by side.
 
@@ -350,17 +357,21 @@ def plot_high_res_days(df_clear, df_cloudy, location_name, legend_names_high_res
         linestyles_high_res (list): List of line styles for the legends.
         line_widths_high_res (list): List of line widths for the legends.
         output_dir_timeseries (str): Directory to save the figure.
+        storage (optional): Storage the figure is written to (default: :func:`simeasren.get_storage`).
     """
 
     fig, axs = plt.subplots(1, 2, figsize=(20, 4))  # Two subplots side by side
 
+    clear_tools = build_series_catalog(df_clear.columns)["tool"]
+    cloudy_tools = build_series_catalog(df_cloudy.columns)["tool"]
+
     all_handles = []
     all_labels = []
 
     # Plot Clear Sky Day
-    for col in df_clear.columns:
-        if col.split()[1] in legend_names_high_res:
-            idx = legend_names_high_res.index(col.split()[1])
+    for col, tool in clear_tools.items():
+        if tool in legend_names_high_res:
+            idx = legend_names_high_res.index(tool)
             (line,) = axs[0].plot(
                 df_clear.index,
                 df_clear[col],
@@ -380,9 +391,9 @@ def plot_high_res_days(df_clear, df_cloudy, location_name, legend_names_high_res
     axs[0].grid(True)
 
     # Plot Cloudy Sky Day
-    for col in df_cloudy.columns:
-        if col.split()[1] in legend_names_high_res:
-            idx = legend_names_high_res.index(col.split()[1])
+    for col, tool in cloudy_tools.items():
+        if tool in legend_names_high_res:
+            idx = legend_names_high_res.index(tool)
             (line,) = axs[1].plot(
                 df_cloudy.index,
                 df_cloudy[col],
@@ -420,7 +431,7 @@ def plot_high_res_days(df_clear, df_cloudy, location_name, legend_names_high_res
 
     plt.tight_layout()
     output_file = os.path.join(output_dir_timeseries, f"{location_name}_highres_clear_vs_cloudy.png")
-    plt.savefig(output_file, bbox_inches="tight")
+    get_storage(storage).write_figure(output_file, plt.gcf(), bbox_inches="tight")
     plt.close()
     print(f"High-resolution PV plot saved at '{output_file}'")
 
@@ -487,7 +498,7 @@ def highres_plot_formatting(
 # Plot LCOF error bar chart
 
 def plot_LCOF_diff(LCOF_diff_results, plot_palette, location_name, year, H2_end_user_min_load,
-                   output_dir_technoeco, legend_names):
+                   output_dir_technoeco, legend_names, storage=None):
     """
     Function to plot LCOF difference for error analysis and save the figure.
 
@@ -498,6 +509,7 @@ def plot_LCOF_diff(LCOF_diff_results, plot_palette, location_name, year, H2_end_
     H2_end_user_min_load (float): Minimum load for H2 end user, included in the figure filename.
     output_dir_technoeco (str): Directory to save the plot.
     legend_names (list): List of legend names to filter the plot legend
+    storage (optional): Storage the figure is written to (default: :func:`simeasren.get_storage`).
 
     Returns:
     None
@@ -609,11 +621,12 @@ def plot_LCOF_diff(LCOF_diff_results, plot_palette, location_name, year, H2_end_
     plt.tight_layout()
 
     # Save the figure
-    plt.savefig(
+    get_storage(storage).write_figure(
         os.path.join(
             output_dir_technoeco,
             f"{location_name}{year}_LCOF_diff_flex[{H2_end_user_min_load}-1].png",
-        )
+        ),
+        plt.gcf(),
     )
     
     # Print confirmation
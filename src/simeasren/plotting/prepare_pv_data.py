@@ -1,11 +1,16 @@
 import os
-import re
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from ..series_catalog import build_series_catalog, select_series, find_measured_column
+from ..pv_measured.readers import read_measured_sheet
+from ..pv_measured.highres import load_highres_measurements, highres_day
+from ..storage import get_storage
+from ..profiles import ProfileMatrix
+from ..pv_analysis.sky_conditions import rank_days
 
 def convert_comma_to_dot(df: pd.DataFrame) -> pd.DataFrame:
-    """Convert columns with commas as decimals to numeric floats."""
+    """Convert columns with commas as decimals to numeric floats (for DataFrames not loaded with `read_measured_sheet`)."""
     for column in df.columns:
         if df[column].dtype == "object":
             df[column] = df[column].str.replace(",", ".", regex=False)
@@ -16,18 +21,27 @@ def convert_comma_to_dot(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def extract_year_selected(dataframe: pd.DataFrame, column_pattern=r"([A-Za-z]+[0-9]{4})") -> str:
+def extract_year_selected(dataframe: pd.DataFrame) -> str:
     """Extract year tag (e.g., Location2020) from dataframe column names."""
-    for col in dataframe.columns:
-        match = re.match(column_pattern, col)
-        if match:
-            return match.group(1)
+    catalog = build_series_catalog(dataframe.columns)
+    catalog = catalog[catalog["year"].notna()]
+    if not catalog.empty:
+        return f"{catalog['location'].iloc[0]}{catalog['year'].iloc[0]}"
     raise ValueError(
         "Column entry for cloudy and clear sky data should be written as 'LocationYear PV-MEAS_high_resolution'."
     )
 
 
-def prepare_pv_data_for_plots(location_name: str, year: str):
+def prepare_pv_data_for_plots(
+    location_name: str,
+    year: str,
+    decimal: str = ",",
+    highres_schema=None,
+    clear_sky_day=None,
+    cloudy_sky_day=None,
+    output_dir="results",
+    storage=None,
+):
     """
     Load, clean, and prepare all measured and simulated PV datasets
     for subsequent time series and high-resolution plotting.
@@ -45,6 +59,23 @@ def prepare_pv_data_for_plots(location_name: str, year: str):
     year : str
         Specific year to filter the simulation data (e.g., `"2023"`). The year should exist 
         in the measured data files
+    decimal : str, optional
+        Decimal separator of numbers stored as text in the high-resolution sheets
+        (default `","`). They are parsed while loading.
+    highres_schema : dict, optional
+        Per-column dtypes for the high-resolution sheets, passed to
+        :func:`simeasren.pv_measured.read_measured_sheet`.
+    clear_sky_day, cloudy_sky_day : str or datetime-like, optional
+        Days to take from the full-year high-resolution data stored with
+        :func:`simeasren.pv_measured.ingest_highres_measurements` (e.g., `"2019-03-30"`).
+        If None (default), the `"Clear sky day"` / `"Cloudy sky day"` sheets are used.
+        `"auto"` picks the clearest / cloudiest day of the hourly measured data of
+        `year` (see :func:`simeasren.pv_analysis.rank_days`).
+    output_dir : str, optional
+        Root directory of the results (default `"results"`).
+    storage : LocalStorage, MemoryStorage or WriteBehindStorage, optional
+        Where the merged data is read from (default: the storage set with
+        :func:`simeasren.set_storage`, the local disk unless changed).
 
     Returns
     -------
@@ -74,11 +105,19 @@ def prepare_pv_data_for_plots(location_name: str, year: str):
       with sheet names `"Clear sky day"` and `"Cloudy sky day"`.
     - Simulated PV results must exist in:
       ```
-      results/{location_name}/simulated_pv/{location_name}_meas_sim.csv
+      {output_dir}/{location_name}/simulated_PV/{location_name}_meas_sim.csv
       ```
+      or in its ``.pvz`` archive (see :func:`simeasren.archive_csv_profiles`).
     - Helper functions used:
-      - `convert_comma_to_dot()` for numeric conversion.
+      - `read_measured_sheet()` for loading the high-resolution sheets already numeric
+        (the typed sheets are cached between calls).
       - `extract_year_selected()` for extracting year tags from column names.
+    - Columns are selected through :func:`simeasren.build_series_catalog`, so only
+      series whose parsed year matches `year` are kept.
+    - `data_sim_meas` is backed by a single float64 array, so
+      :meth:`simeasren.ProfileMatrix.from_frame` can hand it to
+      :func:`simeasren.calculate_error_metrics` and
+      :func:`simeasren.calculate_all_LCOF_diff` without copying.
 
     Examples
     --------
@@ -103,43 +142,72 @@ def prepare_pv_data_for_plots(location_name: str, year: str):
     if not file_path_pvdata.exists():
         raise FileNotFoundError(f"Measured PV file not found: {file_path_pvdata}")
     
-    file_path_sim_meas = os.path.join("results",location_name, "simulated_pv", f"{location_name}_meas_sim.csv")
-    data_sim_meas = pd.read_csv(file_path_sim_meas)
-
-    clear_sky_df = pd.read_excel(file_path_pvdata, sheet_name="Clear sky day")
-    cloudy_sky_df = pd.read_excel(file_path_pvdata, sheet_name="Cloudy sky day")
-
-    # -------------------- Preprocess measured PV data --------------------
-    clear_sky_df = convert_comma_to_dot(clear_sky_df)
-    cloudy_sky_df = convert_comma_to_dot(cloudy_sky_df)
+    storage = get_storage(storage)
+    file_path_sim_meas = os.path.join(output_dir, location_name, "simulated_PV", f"{location_name}_meas_sim.csv")
+    # Only the column names for now (CSV or its .pvz archive)
+    sim_meas_columns = storage.read_frame(file_path_sim_meas, max_rows=0).columns
+
+    # Clearest / cloudiest day of the hourly measured data if requested
+    if "auto" in (clear_sky_day, cloudy_sky_day):
+        meas_column = find_measured_column(build_series_catalog(sim_meas_columns), location=location_name, year=year)
+        if meas_column is None:
+            raise ValueError(f"No measured data for {location_name}{year} to detect the clear and cloudy sky days.")
+        measured = storage.read_frame(file_path_sim_meas, columns=[meas_column], max_rows=8760)
+        if clear_sky_day == "auto":
+            clear_sky_day = rank_days(measured, location_name, "clear", n_days=1).index[0]
+        if cloudy_sky_day == "auto":
+            cloudy_sky_day = rank_days(measured, location_name, "cloudy", n_days=1).index[0]
+        print(f"Detected days for {location_name}{year}: clear sky {clear_sky_day:%Y-%m-%d}, cloudy sky {cloudy_sky_day:%Y-%m-%d}")
+
+    # High-resolution days: slices of the full-year data if requested, else the curated sheets
+    # (comma decimals are parsed while reading the sheets)
+    def load_highres_day(day, sheet_name):
+        if day is not None:
+            return highres_day(load_highres_measurements(location_name, year, output_dir), day)
+        return read_measured_sheet(file_path_pvdata, sheet_name=sheet_name, decimal=decimal, schema=highres_schema)
+
+    clear_sky_df = load_highres_day(clear_sky_day, "Clear sky day")
+    cloudy_sky_df = load_highres_day(cloudy_sky_day, "Cloudy sky day")
 
     # -------------------- Preprocess simulated and measured PV data --------------------
-    # Ensure all values are numeric
-    data_sim_meas = data_sim_meas.apply(pd.to_numeric, errors="coerce")
-
-    # Limit to 8760 rows (one year of hourly data)
-    data_sim_meas = data_sim_meas.iloc[:8760, :]
+    catalog = build_series_catalog(sim_meas_columns)
+
+    def highres_location_year(df):
+        highres_catalog = build_series_catalog(df.columns)
+        highres_catalog = highres_catalog[highres_catalog["year"].notna()]
+        if highres_catalog.empty:
+            extract_year_selected(df)  # Raises the naming convention error
+        return tuple(highres_catalog.iloc[0][["location", "year"]])
+
+    highres_keys = [highres_location_year(clear_sky_df), highres_location_year(cloudy_sky_df)]
+
+    # Read only the needed columns and the first 8760 rows (one year of hourly data),
+    # converted once to a single numeric array (non-numeric values become NaN). The
+    # frames returned below are views of this array whenever possible.
+    columns_with_year = select_series(catalog, year=year)
+    needed = set(columns_with_year)
+    for location_selected, year_selected in highres_keys:
+        needed.update(select_series(catalog, location=location_selected, year=year_selected))
+    profiles = ProfileMatrix.from_frame(storage.read_frame(file_path_sim_meas, columns=needed, max_rows=8760))
 
     # -------------------- Merge with high-resolution clear/cloudy data --------------------
-    def merge_with_highres(df, data_sim_meas):
-        year_selected = extract_year_selected(df)
-        data_sim_filtered = data_sim_meas[[col for col in data_sim_meas.columns if year_selected in col]]
-        data_sim_filtered = data_sim_filtered.reset_index().rename(columns={"index": "Hour of the year"})
-        data_sim_filtered["Hour of the year"] = range(1, len(data_sim_filtered) + 1)
+    def merge_with_highres(df, highres_key):
+        location_selected, year_selected = highres_key
+        data_sim_filtered = profiles.to_frame(select_series(catalog, location=location_selected, year=year_selected))
+        data_sim_filtered.insert(0, "Hour of the year", range(1, len(data_sim_filtered) + 1))
         df = df.merge(data_sim_filtered, on="Hour of the year", how="left")
         df = df.iloc[:, 2:]  # Drop first two columns (timestamp info)
         return df
 
-    clear_sky_df = merge_with_highres(clear_sky_df, data_sim_meas)
-    cloudy_sky_df = merge_with_highres(cloudy_sky_df, data_sim_meas)
+    clear_sky_df = merge_with_highres(clear_sky_df, highres_keys[0])
+    cloudy_sky_df = merge_with_highres(cloudy_sky_df, highres_keys[1])
 
     # -------------------- Filter by year (if specified) --------------------
-    columns_with_year = [col for col in data_sim_meas.columns if year in col]
     if columns_with_year:
-        data_sim_meas = data_sim_meas[columns_with_year]
+        data_sim_meas = profiles.to_frame(columns_with_year)
     else:
         print(f"No measured data for the year chosen")
-        data_sim_meas = data_sim_meas.iloc[0:0]
+        data_sim_meas = pd.DataFrame(np.empty((0, len(sim_meas_columns))), columns=sim_meas_columns)
 
     return (
         data_sim_meas,
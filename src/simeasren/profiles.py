@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from .series_catalog import build_series_catalog
+
+# ---------------------------- Shared profile matrix for the analysis stages -----------------------------
+
+
+class ProfileMatrix:
+    """
+    Hourly profiles held as one 2-D float64 array plus a validity mask.
+
+    The preparation, error metrics and LCOF stages all work on the same
+    measured/simulated columns. A `ProfileMatrix` converts them once to a
+    column-major (hour, series) array and computes the NaN mask once; the stages
+    then take column views instead of copying the data with `apply`, `dropna`,
+    `.loc` or `iloc`.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        2-D float64 array of shape (hours, series), NaN for missing values.
+    columns : list of str
+        Name of each series (e.g., `"Turin2019 PG3-SARAH3"`).
+    valid : numpy.ndarray, optional
+        Boolean mask of the non-NaN values. Computed from `values` if not given.
+
+    Examples
+    --------
+    >>> from simeasren import ProfileMatrix, prepare_pv_data_for_plots, calculate_error_metrics
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> profiles = ProfileMatrix.from_frame(data_sim_meas)  # No copy, data_sim_meas is a view
+    >>> mean_diff, mae, rmse = calculate_error_metrics(profiles, "Turin")
+    """
+
+    def __init__(self, values, columns, valid=None):
+        if values.ndim != 2 or values.shape[1] != len(columns):
+            raise ValueError("values must be a 2-D array with one column per name in columns.")
+        self.values = values
+        self.columns = list(columns)
+        self.valid = ~np.isnan(values) if valid is None else valid
+        self._positions = {column: j for j, column in enumerate(self.columns)}
+        self.catalog = build_series_catalog(self.columns)
+
+    def __repr__(self):
+        return f"<ProfileMatrix hours={self.values.shape[0]} series={self.values.shape[1]}>"
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @classmethod
+    def from_frame(cls, data, columns=None, max_rows=None):
+        """
+        Build the matrix from a DataFrame of profiles.
+
+        A frame holding only float64 columns in one block (e.g., the output of
+        :func:`simeasren.prepare_pv_data_for_plots`) is used as it is, without
+        copying. Other frames, and selections of `columns`, are converted in a
+        single pass into a new column-major array holding only these columns,
+        non-numeric entries becoming NaN.
+
+        Parameters
+        ----------
+        data : pandas.DataFrame or ProfileMatrix
+            Profiles, one column per series. A `ProfileMatrix` is returned unchanged.
+        columns : list of str, optional
+            Columns to keep (default: all columns).
+        max_rows : int, optional
+            Only keep the first `max_rows` rows (e.g., 8760).
+
+        Returns
+        -------
+        ProfileMatrix
+        """
+        if isinstance(data, cls):
+            return data
+
+        if columns is not None:
+            columns = list(columns)
+            positions = [data.columns.get_loc(column) for column in columns]
+        else:
+            columns = list(data.columns)
+            positions = list(range(len(columns)))
+        n_rows = len(data) if max_rows is None else min(max_rows, len(data))
+
+        if all(dtype == np.float64 for dtype in data.dtypes):
+            values = data.to_numpy()  # A view when the frame is one float64 block
+            if positions != list(range(data.shape[1])):
+                # Compact copy, a view would keep all the other columns in memory
+                values = np.array(values[:n_rows, positions], order="F")
+            return cls(values[:n_rows], columns)
+
+        values = np.empty((n_rows, len(columns)), order="F")
+        for j, position in enumerate(positions):
+            values[:, j] = pd.to_numeric(data.iloc[:n_rows, position], errors="coerce")
+        return cls(values, columns)
+
+    def position(self, column):
+        """Position of `column` in the matrix (raises KeyError if missing)."""
+        return self._positions[column]
+
+    def column(self, column):
+        """View of the values of one series."""
+        return self.values[:, self._positions[column]]
+
+    def valid_column(self, column):
+        """View of the validity mask of one series."""
+        return self.valid[:, self._positions[column]]
+
+    def valid_values(self, column):
+        """Values of one series without its NaN (a view if the series has no NaN)."""
+        valid = self.valid_column(column)
+        values = self.column(column)
+        return values if valid.all() else values[valid]
+
+    def to_frame(self, columns=None):
+        """
+        DataFrame over the matrix, sharing its memory where possible.
+
+        All columns, or columns that are adjacent in the matrix, are returned as a
+        view; other selections are copied once.
+        """
+        if columns is None:
+            return pd.DataFrame(self.values, columns=self.columns, copy=False)
+        columns = list(columns)
+        values = _take_columns(self.values, [self._positions[column] for column in columns])
+        return pd.DataFrame(values, columns=columns, copy=False)
+
+
+def _take_columns(values, positions):
+    # Adjacent increasing positions are a slice, so no copy is needed
+    if positions and positions == list(range(positions[0], positions[0] + len(positions))):
+        return values[:, positions[0]:positions[0] + len(positions)]
+    return np.asfortranarray(values[:, positions])
@@ -1,3 +1,27 @@
-from .metrics import calculate_error_metrics
+from .metrics import calculate_error_metrics, calculate_error_metrics_table
+from .chunked import aggregate_file_to_hourly, calculate_error_metrics_chunked
+from .cube import build_pv_cube, open_pv_cube, PVCube
+from .alignment import estimate_lags, align_profiles, shift_profile
+from .sky_conditions import (daily_sky_indices, classify_days, rank_days, calculate_error_metrics_by_sky_condition,
+                             SKY_CONDITIONS)
+from .streaming import MetricAccumulator, calculate_extended_metrics, calculate_extended_metrics_chunked
+from .bootstrap import bootstrap_error_metrics, block_bootstrap_days, BOOTSTRAP_METRICS
+from .grouped import build_group_index, calculate_grouped_error_metrics, GROUP_KEYS
+from .batch import calculate_batch_error_metrics
+from .duration_curves import (duration_curves, calculate_duration_curve_metrics, duration_curve_features,
+                              clear_duration_curve_cache)
+from .resolution import calculate_resolution_metrics, ramp_rate_distributions
+from .monitoring import SiteMonitor, WINDOWS
+from .bias_correction import fit_quantile_mapping, QuantileMapping, CALENDAR_KEYS
+from .similarity import similarity_matrices, cluster_sources, SIMILARITY_METRICS
 
-__all__ = ["calculate_error_metrics"]
\ No newline at end of file
+__all__ = ["calculate_error_metrics", "calculate_error_metrics_table", "aggregate_file_to_hourly",
+           "calculate_error_metrics_chunked", "build_pv_cube", "open_pv_cube", "PVCube", "estimate_lags",
+           "align_profiles", "shift_profile", "daily_sky_indices", "classify_days", "rank_days",
+           "calculate_error_metrics_by_sky_condition", "SKY_CONDITIONS", "MetricAccumulator",
+           "calculate_extended_metrics", "calculate_extended_metrics_chunked", "bootstrap_error_metrics",
+           "block_bootstrap_days", "BOOTSTRAP_METRICS", "build_group_index", "calculate_grouped_error_metrics",
+           "GROUP_KEYS", "calculate_batch_error_metrics", "duration_curves", "calculate_duration_curve_metrics",
+           "duration_curve_features", "clear_duration_curve_cache", "calculate_resolution_metrics",
+           "ramp_rate_distributions", "SiteMonitor", "WINDOWS", "fit_quantile_mapping", "QuantileMapping",
+           "CALENDAR_KEYS", "similarity_matrices", "cluster_sources", "SIMILARITY_METRICS"]
@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+from ..series_catalog import select_series, find_measured_column
+from ..profiles import ProfileMatrix
+from .metrics import _measured_pairs
+
+# ---------------------------- Time alignment of simulated and measured profiles -----------------------------
+
+
+def estimate_lags(data_sim_meas, location_name, max_lag_hours=3, fractional=True) -> pd.DataFrame:
+    """
+    Estimate the time shift of every simulated profile relative to the measured one.
+
+    The cross-correlation of each simulated column with the `"PV-MEAS"` column of
+    its own year (see :func:`simeasren.calculate_error_metrics_table`) is
+    computed with one batched real FFT over all columns (series centred, missing
+    hours set to 0, zero-padded so the correlation is not circular). The lag is the
+    peak of the correlation within `max_lag_hours`, refined to a fraction of an hour
+    by fitting a parabola through the peak and its two neighbours. A year of hourly
+    data with ten sources takes a few milliseconds.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly measured and simulated profiles.
+    location_name : str
+        Location of the profiles (e.g., `"Turin"`).
+    max_lag_hours : int, optional
+        Largest shift searched for, in hours (default 3). Keep it below 12, the
+        daily cycle makes the correlation peak again every 24 hours.
+    fractional : bool, optional
+        If True (default), refine the lag to a fraction of an hour. If False, lags
+        are whole hours.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per simulated column (index), with the columns `"Tool"`,
+        `"Measured series"`, `"Lag (h)"` and `"Correlation"` (correlation coefficient at the best whole-hour
+        lag). A positive lag means that the simulated profile is late: its value at
+        hour `t + lag` corresponds to the measured value at hour `t`.
+
+    Raises
+    ------
+    ValueError
+        If no measured column is found for the location.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import estimate_lags
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> lags = estimate_lags(data_sim_meas, "Turin")  # One row per simulated column
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    catalog = profiles.catalog
+    meas_column = find_measured_column(catalog, location=location_name)
+    if meas_column is None:
+        raise ValueError(f"No measured data column found for {location_name}.")
+    pairs = _measured_pairs(catalog, select_series(catalog, location=location_name, is_measured=False))
+    sim_columns = list(pairs)
+    if not sim_columns:
+        return pd.DataFrame(columns=["Tool", "Measured series", "Lag (h)", "Correlation"])
+
+    positions = [profiles.position(col) for col in sim_columns]
+    meas_positions = [profiles.position(pairs[col]) for col in sim_columns]
+    simulated = profiles.values[:, positions]
+    measured = profiles.values[:, meas_positions]
+
+    # Centre on the hours where each pair is available, missing hours contribute 0
+    common = profiles.valid[:, positions] & profiles.valid[:, meas_positions]
+    n_common = np.maximum(common.sum(axis=0), 1)
+    simulated = np.where(common, simulated, 0.0)
+    measured = np.where(common, measured, 0.0)
+    simulated = np.where(common, simulated - simulated.sum(axis=0) / n_common, 0.0)
+    measured = np.where(common, measured - measured.sum(axis=0) / n_common, 0.0)
+
+    # Cross-correlation c[k] = sum_t measured[t] * simulated[t + k] for all columns at once
+    n_hours = len(profiles)
+    n_fft = int(2 ** np.ceil(np.log2(n_hours + max_lag_hours + 1)))
+    spectrum = np.conj(np.fft.rfft(measured, n_fft, axis=0)) * np.fft.rfft(simulated, n_fft, axis=0)
+    correlation = np.fft.irfft(spectrum, n_fft, axis=0)
+    lags = np.arange(-max_lag_hours, max_lag_hours + 1)
+    correlation = correlation[lags % n_fft]
+
+    norms = np.sqrt((measured**2).sum(axis=0) * (simulated**2).sum(axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = correlation / norms
+
+    peak = np.nanargmax(np.nan_to_num(correlation, nan=-np.inf), axis=0)
+    columns = np.arange(len(sim_columns))
+    best = correlation[peak, columns]
+    lag_hours = lags[peak].astype(np.float64)
+
+    if fractional:
+        # Parabola through the peak and its neighbours (not at the edges of the search window)
+        inner = (peak > 0) & (peak < len(lags) - 1)
+        before = correlation[np.clip(peak - 1, 0, len(lags) - 1), columns]
+        after = correlation[np.clip(peak + 1, 0, len(lags) - 1), columns]
+        curvature = before - 2 * best + after
+        with np.errstate(divide="ignore", invalid="ignore"):
+            offset = np.where(inner & (curvature < 0), 0.5 * (before - after) / curvature, 0.0)
+        lag_hours += offset
+
+    return pd.DataFrame(
+        {
+            "Tool": [catalog.at[col, "tool"] for col in sim_columns],
+            "Measured series": [pairs[col] for col in sim_columns],
+            "Lag (h)": lag_hours,
+            "Correlation": best,
+        },
+        index=pd.Index(sim_columns, name="Series"),
+    )
+
+
+def shift_profile(values, lag_hours):
+    """
+    Shift an hourly profile earlier by `lag_hours` (can be fractional).
+
+    The shifted value at hour `t` is the value at hour `t + lag_hours`, linearly
+    interpolated between the two neighbouring hours for fractional lags. Hours
+    shifted in from outside the profile are NaN.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    hours = np.arange(len(values), dtype=np.float64)
+    return np.interp(hours + lag_hours, hours, values, left=np.nan, right=np.nan)
+
+
+def align_profiles(data_sim_meas, location_name, lags=None, max_lag_hours=3, fractional=True, min_lag_hours=0.25):
+    """
+    Shift every simulated profile onto the time axis of the measured profile.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly measured and simulated profiles.
+    location_name : str
+        Location of the profiles (e.g., `"Turin"`).
+    lags : pandas.DataFrame, optional
+        Lags to apply, as returned by :func:`estimate_lags`. Estimated if None.
+    max_lag_hours, fractional
+        See :func:`estimate_lags`.
+    min_lag_hours : float, optional
+        Lags smaller than this (in absolute value, default 0.25 h) are not applied,
+        so the sub-hour offsets of the simulation time stamps (e.g., PVGIS values at
+        hh:10) do not smear the profiles.
+
+    Returns
+    -------
+    tuple
+        `(profiles, lags)`: a new :class:`simeasren.ProfileMatrix` with the shifted
+        simulated columns (hours shifted in from outside the year are NaN) and the
+        lag table, with an extra boolean column `"Applied"`.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots, calculate_error_metrics
+    >>> from simeasren.pv_analysis import align_profiles
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> profiles, lags = align_profiles(data_sim_meas, "Turin")
+    >>> mean_diff, mae, rmse = calculate_error_metrics(profiles, "Turin")
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    if lags is None:
+        lags = estimate_lags(profiles, location_name, max_lag_hours=max_lag_hours, fractional=fractional)
+    lags = lags.copy()
+    lags["Applied"] = lags["Lag (h)"].abs() >= min_lag_hours
+
+    # New array, the input profiles may be views of the caller's frame
+    values = np.array(profiles.values, order="F")
+    for column, row in lags[lags["Applied"]].iterrows():
+        values[:, profiles.position(column)] = shift_profile(profiles.column(column), row["Lag (h)"])
+        print(f"{column}: shifted by {row['Lag (h)']:+.2f} h (correlation {row['Correlation']:.3f})")
+
+    return ProfileMatrix(values, profiles.columns), lags
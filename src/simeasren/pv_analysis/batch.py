@@ -0,0 +1,151 @@
+import os
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from ..series_catalog import build_series_catalog, select_series
+from ..profiles import ProfileMatrix
+from ..storage import get_storage
+from ..metric_cache import get_metric_cache
+from .metrics import calculate_error_metrics_table
+from .streaming import calculate_extended_metrics
+
+# ---------------------------- Error metrics of many sites and years -----------------------------
+
+
+def _site_task(location_name, years, extended, output_dir, storage, plot_palette, exclude_non_palette, cache):
+    """Metrics of all the requested years of one site: one read of its merged file, then one table per year."""
+    start = time.perf_counter()
+    tables, timings = [], []
+    try:
+        file_path = os.path.join(output_dir, location_name, "simulated_PV", f"{location_name}_meas_sim.csv")
+        catalog = build_series_catalog(storage.read_frame(file_path, max_rows=0).columns)
+        catalog = catalog[catalog["location"] == location_name]
+        available = sorted(year for year in catalog["year"].dropna().unique())
+        years = available if years is None else [year for year in years if year in available]
+
+        columns = [col for year in years for col in select_series(catalog, year=year)]
+        frame = storage.read_frame(file_path, columns=columns, max_rows=8760)
+        load_seconds = time.perf_counter() - start
+    except Exception as error:
+        return tables, [{"Location": location_name, "Year": None, "Series": 0, "Load (s)": time.perf_counter() - start,
+                         "Metrics (s)": 0.0, "Worker": os.getpid(), "Error": repr(error)}]
+
+    for year in years:
+        start = time.perf_counter()
+        year_columns = select_series(catalog, year=year)
+        profiles = ProfileMatrix.from_frame(frame, columns=year_columns)
+        if extended:
+            table = calculate_extended_metrics(profiles, location_name, plot_palette, exclude_non_palette)
+        else:
+            table = calculate_error_metrics_table(profiles, location_name, plot_palette, exclude_non_palette, cache)
+        tables.append(table)
+        timings.append(
+            {
+                "Location": location_name,
+                "Year": year,
+                "Series": len(year_columns),
+                "Load (s)": load_seconds / len(years),
+                "Metrics (s)": time.perf_counter() - start,
+                "Worker": os.getpid(),
+                "Error": None,
+            }
+        )
+    return tables, timings
+
+
+def calculate_batch_error_metrics(
+    locations,
+    years=None,
+    extended=False,
+    n_jobs=None,
+    output_dir="results",
+    storage=None,
+    plot_palette=None,
+    exclude_non_palette=True,
+    cache=None,
+):
+    """
+    Error metrics of many sites and years in parallel processes, as one tidy DataFrame.
+
+    The work is planned per site: the merged file of each site (see
+    :func:`simeasren.merge_sim_with_measured`) is read once, with only the columns
+    of the requested years and the first 8760 hours, and the metrics of each year
+    are computed from it. Sites are spread over `n_jobs` worker processes. A site
+    that fails (e.g., missing file) is reported in the timings and the other sites
+    go on.
+
+    Parameters
+    ----------
+    locations : list of str
+        Names of the sites (e.g., `["Turin", "Utrecht"]`).
+    years : list of str, optional
+        Years to compute (default: every year found in each site's file). Years
+        missing for a site are skipped.
+    extended : bool, optional
+        If True, compute the metrics of
+        :func:`simeasren.pv_analysis.calculate_extended_metrics`, else those of
+        :func:`simeasren.calculate_error_metrics_table` (default).
+    n_jobs : int, optional
+        Number of worker processes (default: number of CPU cores). With 1, the
+        sites are processed in the current process.
+    output_dir : str, optional
+        Root directory of the results (default `"results"`).
+    storage : LocalStorage or MemoryStorage, optional
+        Where the merged files are read from (default: the storage set with
+        :func:`simeasren.set_storage`). It is sent to the workers, so it must be
+        picklable.
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+    cache : MetricCache, optional
+        Cache of the metrics of series pairs (default: the cache set with
+        :func:`simeasren.set_metric_cache`), so that only new or changed series are
+        computed. Each worker opens its own connection to the cache file. Not used
+        with `extended=True`.
+
+    Returns
+    -------
+    tuple of pandas.DataFrame
+        `(table, timings)`: the metrics of every site, year and simulated series
+        (columns `"Location"`, `"Year"`, `"Tool"`, `"Series"`, ... as in the metric
+        function), and one row per site-year with `"Series"` (number of columns),
+        `"Load (s)"` (share of the site's read), `"Metrics (s)"`, `"Worker"`
+        (process id) and `"Error"`.
+
+    Examples
+    --------
+    >>> from simeasren.pv_analysis import calculate_batch_error_metrics
+    >>> table, timings = calculate_batch_error_metrics(["Turin", "Utrecht", "Almeria"], n_jobs=3)
+    >>> table.pivot_table(index="Tool", columns="Location", values="RMSE (%)")
+    >>> timings.sort_values("Metrics (s)", ascending=False).head()
+    """
+    storage = get_storage(storage)
+    cache = get_metric_cache(cache)
+    years = None if years is None else [str(year) for year in years]
+    tasks = [
+        (location, years, extended, output_dir, storage, plot_palette, exclude_non_palette, cache)
+        for location in locations
+    ]
+
+    start = time.perf_counter()
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(tasks), 1))
+    if n_jobs == 1:
+        results = [_site_task(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_site_task, *zip(*tasks)))
+
+    tables = [table for site_tables, _ in results for table in site_tables]
+    table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+    timings = pd.DataFrame(
+        [timing for _, site_timings in results for timing in site_timings],
+        columns=["Location", "Year", "Series", "Load (s)", "Metrics (s)", "Worker", "Error"],
+    )
+    for _, failed in timings[timings["Error"].notna()].iterrows():
+        print(f"{failed['Location']}: {failed['Error']}")
+    print(
+        f"Metrics of {timings['Error'].isna().sum()} site-years computed in {time.perf_counter() - start:.2f} s "
+        f"with {n_jobs} workers"
+    )
+    return table, timings
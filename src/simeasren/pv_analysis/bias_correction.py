@@ -0,0 +1,314 @@
+import numpy as np
+import pandas as pd
+from ..series_catalog import select_series
+from ..profiles import ProfileMatrix
+from .metrics import _measured_pairs
+from .grouped import SEASONS
+
+# ---------------------------- Empirical quantile mapping of the simulated profiles -----------------------------
+
+CALENDAR_KEYS = ["Month", "Hour", "Season"]
+
+_KEY_SIZES = {"Month": 12, "Hour": 24, "Season": 4}
+
+
+def _calendar_groups(n_hours, year, by):
+    """Group code of every hour for the calendar keys `by` (profiles starting on January 1st), and the number of groups."""
+    hours = pd.date_range(f"{year}-01-01", periods=n_hours, freq="h")
+    month = hours.month.to_numpy()
+    codes = {"Month": month - 1, "Hour": hours.hour.to_numpy(), "Season": month % 12 // 3}
+    if not by:
+        return np.zeros(n_hours, dtype=np.int64), 1
+    sizes = [_KEY_SIZES[key] for key in by]
+    return np.ravel_multi_index([codes[key] for key in by], sizes), int(np.prod(sizes))
+
+
+def _nan_quantiles(values, levels):
+    """Quantiles of every column ignoring NaN, shape (levels, columns), with one sort for all columns and levels."""
+    ordered = np.sort(values, axis=0)  # NaN last
+    count = (~np.isnan(values)).sum(axis=0)
+    position = levels[:, None] * np.maximum(count - 1, 0)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, np.maximum(count - 1, 0))
+    low_value = np.take_along_axis(ordered, low, axis=0)
+    high_value = np.take_along_axis(ordered, high, axis=0)
+    quantiles = low_value + (position - low) * (high_value - low_value)
+    quantiles[:, count == 0] = np.nan
+    return quantiles
+
+
+def _map_quantiles(values, rows, sim_table, meas_table):
+    """
+    Map `values` through the quantile tables, each value with its own row of the tables.
+
+    All rows are placed one after the other on a single increasing axis (row `r`
+    shifted by `r` times the range of the values), so every value of every column
+    is located with one `numpy.searchsorted`. Values tied with several simulated
+    quantiles (e.g., clipped output) take the middle of these quantiles. Beyond the
+    fitted range, the correction of the first or last quantile is applied.
+    """
+    n_rows, n_levels = sim_table.shape
+    fitted = ~np.isnan(sim_table).any(axis=1)
+    sim_table = np.where(fitted[:, None], sim_table, 0.0)
+
+    lower = min(sim_table.min(), np.nanmin(values, initial=0.0))
+    span = max(sim_table.max(), np.nanmax(values, initial=0.0)) - lower + 1.0
+    keys = (sim_table - lower + np.arange(n_rows)[:, None] * span).ravel()
+    shifted = np.where(np.isnan(values), 0.0, values) - lower + rows * span
+
+    first = rows * n_levels
+    left = np.searchsorted(keys, shifted, side="left") - first
+    # Ties are rare (values equal to a quantile): search the right side for these values only
+    right = left.copy()
+    tied = keys[first + np.minimum(left, n_levels - 1)] == shifted
+    right[tied] = np.searchsorted(keys, shifted[tied], side="right") - first[tied]
+
+    # Fractional index of each value in its row of simulated quantiles
+    inner = np.clip(left, 1, n_levels - 1)
+    below = keys[first + inner - 1]
+    step = keys[first + inner] - below
+    with np.errstate(invalid="ignore", divide="ignore"):
+        index = np.where(step > 0, inner - 1 + (shifted - below) / step, inner)
+    index = np.where(right > left, (left + right - 1) / 2, index)
+    index = np.clip(index, 0, n_levels - 1)
+
+    low = np.floor(index).astype(np.int64)
+    high = np.minimum(low + 1, n_levels - 1)
+    meas_flat = meas_table.ravel()
+    mapped = meas_flat[first + low] + (index - low) * (meas_flat[first + high] - meas_flat[first + low])
+
+    # Outside the fitted range: shift by the correction of the end quantile
+    sim_flat = sim_table.ravel()
+    mapped = np.where(right == 0, values - sim_flat[first] + meas_flat[first], mapped)
+    last = first + n_levels - 1
+    mapped = np.where(left == n_levels, values - sim_flat[last] + meas_flat[last], mapped)
+    return np.where(fitted[rows] & ~np.isnan(values), np.maximum(mapped, 0.0), values)
+
+
+class QuantileMapping:
+    """
+    Empirical quantile mappings of simulated profiles onto the measured profile, per tool and calendar group.
+
+    Built with :func:`fit_quantile_mapping`. The mappings are stored per tool
+    (e.g., `"PG3-SARAH3"`), so they can be applied to the profiles of other years or
+    sites with :meth:`apply`.
+
+    Attributes
+    ----------
+    tools : list of str
+        Tools with a mapping.
+    by : list of str
+        Calendar keys of the groups (empty for one mapping per tool).
+    levels : numpy.ndarray
+        Quantile levels, from 0 to 1.
+    sim_quantiles, meas_quantiles : numpy.ndarray
+        Simulated and measured quantiles, shape (groups, levels, tools).
+    samples : numpy.ndarray
+        Daylight hours used for each group and tool, shape (groups, tools). Groups
+        with fewer than `min_samples` hours use the mapping of the whole year.
+    """
+
+    def __init__(self, tools, by, levels, sim_quantiles, meas_quantiles, samples, location_name=None, year=None):
+        self.tools = list(tools)
+        self.by = list(by)
+        self.levels = levels
+        self.sim_quantiles = sim_quantiles
+        self.meas_quantiles = meas_quantiles
+        self.samples = samples
+        self.location_name = location_name
+        self.year = year
+
+    def __repr__(self):
+        return (
+            f"<QuantileMapping tools={len(self.tools)} groups={self.sim_quantiles.shape[0]} "
+            f"levels={len(self.levels)} fitted on {self.location_name}{self.year or ''}>"
+        )
+
+    def apply(self, data_sim_meas, location_name=None, year=None) -> ProfileMatrix:
+        """
+        Correct the simulated profiles, all columns at once.
+
+        Simulated columns whose tool has a mapping are corrected; the measured
+        columns and the other simulated columns are kept as they are. Hours with a
+        zero or missing simulated value are not changed.
+
+        Parameters
+        ----------
+        data_sim_meas : pandas.DataFrame or ProfileMatrix
+            Hourly profiles of one year, starting on January 1st at 00:00, of any
+            site or year.
+        location_name : str, optional
+            Only correct the columns of this location (default: all locations).
+        year : str or int, optional
+            Only correct the columns of this year (default: all years).
+
+        Returns
+        -------
+        ProfileMatrix
+            New profiles with the corrected simulated columns, e.g. for
+            :func:`simeasren.calculate_error_metrics` or
+            :func:`simeasren.calculate_all_LCOF_diff`.
+        """
+        profiles = ProfileMatrix.from_frame(data_sim_meas)
+        catalog = profiles.catalog
+        sim_columns = select_series(catalog, location=location_name, year=year, is_measured=False)
+        columns = [col for col in sim_columns if catalog.at[col, "tool"] in self.tools]
+        for col in sim_columns:
+            if col not in columns:
+                print(f"{col}: no quantile mapping for {catalog.at[col, 'tool']}, left unchanged")
+
+        # New array, the input profiles may be views of the caller's frame
+        values = np.array(profiles.values, order="F")
+        if not columns:
+            return ProfileMatrix(values, profiles.columns)
+
+        data_year = catalog.at[columns[0], "year"] or self.year or 2019
+        codes, n_groups = _calendar_groups(len(profiles), data_year, self.by)
+        tool_index = np.array([self.tools.index(catalog.at[col, "tool"]) for col in columns])
+        rows = codes[:, None] * len(self.tools) + tool_index
+
+        # (group, tool) rows of the quantile tables
+        n_levels = len(self.levels)
+        sim_table = self.sim_quantiles.transpose(0, 2, 1).reshape(n_groups * len(self.tools), n_levels)
+        meas_table = self.meas_quantiles.transpose(0, 2, 1).reshape(n_groups * len(self.tools), n_levels)
+
+        positions = [profiles.position(col) for col in columns]
+        simulated = values[:, positions]
+        corrected = _map_quantiles(simulated, rows, sim_table, meas_table)
+        keep = np.isnan(simulated) | (simulated <= 0)
+        values[:, positions] = np.where(keep, simulated, corrected)
+        print(f"Quantile mapping applied to {len(columns)} simulated profiles")
+        return ProfileMatrix(values, profiles.columns)
+
+    def to_frame(self) -> pd.DataFrame:
+        """The mappings as a tidy DataFrame: group keys, `"Tool"`, `"Quantile"`, `"Simulated"`, `"Measured"`."""
+        n_groups, n_levels, n_tools = self.sim_quantiles.shape
+        group, level, tool = np.indices((n_groups, n_levels, n_tools)).reshape(3, -1)
+        frame = {}
+        if self.by:
+            keys = np.unravel_index(group, [_KEY_SIZES[key] for key in self.by])
+            labels = {"Month": np.arange(1, 13), "Hour": np.arange(24), "Season": np.array(SEASONS)}
+            frame.update({key: labels[key][code] for key, code in zip(self.by, keys)})
+        frame.update(
+            {
+                "Tool": np.array(self.tools, dtype=object)[tool],
+                "Quantile": self.levels[level],
+                "Simulated": self.sim_quantiles.ravel(),
+                "Measured": self.meas_quantiles.ravel(),
+            }
+        )
+        return pd.DataFrame(frame)
+
+
+def fit_quantile_mapping(
+    data_sim_meas,
+    location_name,
+    year=None,
+    by=None,
+    n_quantiles=101,
+    min_samples=20,
+    plot_palette=None,
+    exclude_non_palette=True,
+) -> QuantileMapping:
+    """
+    Fit empirical quantile mappings from every simulated column to the measured profile.
+
+    For each simulated column and each calendar group of hours (e.g., month and
+    hour of the day), the quantiles of the simulated and measured values over the
+    daylight hours (simulated value above zero, both values available) are
+    computed for all columns at once. Applying the mapping replaces each simulated
+    value by the measured value of the same quantile, which removes the systematic
+    biases seen in the mean differences of :func:`simeasren.plot_error_metrics`
+    while keeping the timing of the simulated profile.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly measured and simulated profiles of one year, starting on January 1st
+        at 00:00. Simulated columns are paired with measured columns as in
+        :func:`simeasren.calculate_error_metrics_table`.
+    location_name : str
+        Location of the profiles (e.g., `"Turin"`).
+    year : str or int, optional
+        Only use the columns of this year. Needed when the data holds several
+        columns of the same tool.
+    by : str or list of str, optional
+        Keys of `CALENDAR_KEYS` (`"Month"`, `"Hour"`, `"Season"`) of the groups with
+        their own mapping (default: one mapping per tool for the whole year).
+    n_quantiles : int, optional
+        Number of quantile levels, evenly spaced from 0 to 1 (default 101).
+    min_samples : int, optional
+        Groups with fewer daylight hours use the mapping of the whole year
+        (default 20).
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+
+    Returns
+    -------
+    QuantileMapping
+
+    Raises
+    ------
+    ValueError
+        If a key of `by` is unknown, or if several columns share a tool.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots, calculate_error_metrics_table
+    >>> from simeasren.pv_analysis import fit_quantile_mapping
+    >>> data_2019, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> data_2020, _, _ = prepare_pv_data_for_plots("Turin", "2020")
+    >>> mapping = fit_quantile_mapping(data_2019, "Turin", by=("Month", "Hour"))
+    >>> corrected = mapping.apply(data_2020)  # Out-of-sample correction
+    >>> calculate_error_metrics_table(corrected, "Turin")[["Tool", "Mean Difference (%)", "RMSE (%)"]]
+    """
+    by = [] if by is None else [by] if isinstance(by, str) else list(by)
+    unknown = [key for key in by if key not in CALENDAR_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown group keys {unknown}, use some of {CALENDAR_KEYS}.")
+
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    catalog = profiles.catalog
+    palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+    pairs = _measured_pairs(
+        catalog, select_series(catalog, location=location_name, year=year, tools=palette_tools, is_measured=False)
+    )
+    sim_columns = list(pairs)
+    tools = catalog.loc[sim_columns, "tool"].tolist()
+    duplicated = sorted({tool for tool in tools if tools.count(tool) > 1})
+    if duplicated:
+        raise ValueError(f"Several columns for the tools {duplicated}, select a year.")
+
+    sim_positions = [profiles.position(col) for col in sim_columns]
+    meas_positions = [profiles.position(col) for col in pairs.values()]
+    use = profiles.valid[:, sim_positions] & profiles.valid[:, meas_positions] & (profiles.values[:, sim_positions] > 0)
+    simulated = np.where(use, profiles.values[:, sim_positions], np.nan)
+    measured = np.where(use, profiles.values[:, meas_positions], np.nan)
+
+    levels = np.linspace(0.0, 1.0, n_quantiles)
+    data_year = year or (catalog.at[sim_columns[0], "year"] if sim_columns else None) or 2019
+    codes, n_groups = _calendar_groups(len(profiles), data_year, by)
+
+    # Quantiles of every group for all columns at once; sparse groups use the whole year
+    pooled_sim = _nan_quantiles(simulated, levels)
+    pooled_meas = _nan_quantiles(measured, levels)
+    sim_quantiles = np.empty((n_groups, n_quantiles, len(sim_columns)))
+    meas_quantiles = np.empty_like(sim_quantiles)
+    samples = np.zeros((n_groups, len(sim_columns)), dtype=np.int64)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(n_groups + 1))
+    for group in range(n_groups):
+        rows = order[bounds[group]:bounds[group + 1]]
+        samples[group] = use[rows].sum(axis=0)
+        sparse = samples[group] < min_samples
+        if sparse.all():
+            sim_quantiles[group], meas_quantiles[group] = pooled_sim, pooled_meas
+            continue
+        sim_quantiles[group] = np.where(sparse, pooled_sim, _nan_quantiles(simulated[rows], levels))
+        meas_quantiles[group] = np.where(sparse, pooled_meas, _nan_quantiles(measured[rows], levels))
+
+    return QuantileMapping(
+        tools, by, levels, sim_quantiles, meas_quantiles, samples, location_name=location_name, year=year
+    )
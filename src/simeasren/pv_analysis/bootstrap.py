@@ -0,0 +1,224 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from ..series_catalog import select_series
+from ..profiles import ProfileMatrix
+from .metrics import _measured_pairs
+
+# ---------------------------- Block bootstrap confidence intervals -----------------------------
+
+BOOTSTRAP_METRICS = [
+    "Mean Difference (%)",
+    "MAE (%)",
+    "RMSE (%)",
+    "nMBE (%)",
+    "nRMSE (%)",
+    "R2",
+    "Pearson r",
+    "Energy yield ratio",
+]
+
+
+def block_bootstrap_days(n_days, n_resamples, block_days=1, seed=None):
+    """
+    Index matrix of the days of each bootstrap resample.
+
+    Each resample is a year of `n_days` days built from blocks of `block_days`
+    consecutive days (moving blocks, wrapping around the end of the year) with
+    random starting days. Whole days are kept so the hours of the day, and the
+    autocorrelation within the day, are preserved.
+
+    Parameters
+    ----------
+    n_days : int
+        Number of days of the original series.
+    n_resamples : int
+        Number of resamples.
+    block_days : int, optional
+        Length of the blocks in days (default 1).
+    seed : int or numpy.random.Generator, optional
+        Seed of the random draws, for reproducible intervals.
+
+    Returns
+    -------
+    numpy.ndarray
+        Integer array of shape `(n_resamples, n_days)`: the original day used for
+        each day of each resample.
+    """
+    rng = np.random.default_rng(seed)
+    n_blocks = -(-n_days // block_days)
+    starts = rng.integers(0, n_days, size=(n_resamples, n_blocks))
+    days = (starts[:, :, None] + np.arange(block_days)) % n_days
+    return days.reshape(n_resamples, -1)[:, :n_days]
+
+
+def _daily_sums(simulated, measured, valid, n_days):
+    """Per-day sums of the pair statistics, shape (days, 8 * pairs)."""
+    simulated = np.where(valid, simulated, 0.0)[: n_days * 24]
+    measured = np.where(valid, measured, 0.0)[: n_days * 24]
+    diff = simulated - measured
+    stats = [
+        valid[: n_days * 24].astype(np.float64),
+        simulated,
+        measured,
+        np.abs(diff),
+        diff**2,
+        simulated**2,
+        measured**2,
+        simulated * measured,
+    ]
+    return np.concatenate([stat.reshape(n_days, 24, -1).sum(axis=1) for stat in stats], axis=1)
+
+
+def _metrics_from_sums(sums):
+    """Metrics of `BOOTSTRAP_METRICS` from summed statistics (..., 8 * pairs), each of shape (..., pairs)."""
+    count, s_sim, s_meas, s_abs, s_sq, s_sim2, s_meas2, s_cross = np.split(sums, 8, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_sim = s_sim / count
+        mean_meas = s_meas / count
+        var_sim = s_sim2 / count - mean_sim**2
+        var_meas = s_meas2 / count - mean_meas**2
+        rmse = np.sqrt(s_sq / count)
+        return {
+            "Mean Difference (%)": (mean_sim - mean_meas) * 100,
+            "MAE (%)": s_abs / count * 100,
+            "RMSE (%)": rmse * 100,
+            "nMBE (%)": (mean_sim - mean_meas) / mean_meas * 100,
+            "nRMSE (%)": rmse / mean_meas * 100,
+            "R2": 1 - s_sq / count / var_meas,
+            "Pearson r": (s_cross / count - mean_sim * mean_meas) / np.sqrt(var_sim * var_meas),
+            "Energy yield ratio": s_sim / s_meas,
+        }
+
+
+def bootstrap_error_metrics(
+    data_sim_meas,
+    location_name=None,
+    plot_palette=None,
+    exclude_non_palette=True,
+    n_resamples=10000,
+    block_days=1,
+    confidence=0.95,
+    seed=None,
+    n_jobs=None,
+    batch_size=1000,
+    return_samples=False,
+):
+    """
+    Block bootstrap confidence intervals of the error metrics of all simulated columns.
+
+    The days of the year are resampled with :func:`block_bootstrap_days` and the
+    same resampled days are used for every column, so the intervals of the
+    different sources can be compared. The metrics only depend on sums over the
+    hours, so the sums of each day are computed once and each resample is a
+    weighted sum of the days: all resamples of a batch are one matrix product,
+    and batches run in parallel threads. 10,000 resamples of 20 sources take
+    well under a second.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly measured and simulated profiles starting on January 1st at 00:00.
+        Simulated columns are paired with measured columns as in
+        :func:`simeasren.calculate_error_metrics_table`.
+    location_name : str, optional
+        Only use this location (default: all locations).
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+    n_resamples : int, optional
+        Number of bootstrap resamples (default 10,000).
+    block_days : int, optional
+        Length of the resampled blocks in days (default 1). Longer blocks keep the
+        correlation between consecutive days (e.g., multi-day weather events).
+    confidence : float, optional
+        Confidence level of the percentile intervals (default 0.95).
+    seed : int, optional
+        Seed of the resampling, for reproducible intervals.
+    n_jobs : int, optional
+        Number of worker threads (default: number of CPU cores).
+    batch_size : int, optional
+        Number of resamples per batch (default 1,000), bounds the memory used.
+    return_samples : bool, optional
+        If True, also return the metric values of every resample.
+
+    Returns
+    -------
+    pandas.DataFrame or tuple
+        One row per simulated column and metric (`BOOTSTRAP_METRICS`) with the
+        columns `"Location"`, `"Year"`, `"Tool"`, `"Series"`, `"Metric"`,
+        `"Estimate"` (value on the original data), `"CI lower"`, `"CI upper"` and
+        `"Std"`. With `return_samples=True`, `(table, samples)` where `samples` maps
+        each metric to a DataFrame of shape (resamples, series).
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import bootstrap_error_metrics
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> table, samples = bootstrap_error_metrics(data_sim_meas, "Turin", seed=0, return_samples=True)
+    >>> rmse = samples["RMSE (%)"]
+    >>> (rmse["Turin2019 PG3-SARAH3"] < rmse["Turin2019 RN-MERRA2"]).mean()  # Probability that PG3-SARAH3 is better
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    catalog = profiles.catalog
+    palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+    pairs = _measured_pairs(catalog, select_series(catalog, location=location_name, tools=palette_tools, is_measured=False))
+    sim_columns = list(pairs)
+    n_pairs = len(sim_columns)
+
+    sim_positions = [profiles.position(col) for col in sim_columns]
+    meas_positions = [profiles.position(col) for col in pairs.values()]
+    n_days = len(profiles) // 24
+    daily = _daily_sums(
+        profiles.values[:, sim_positions],
+        profiles.values[:, meas_positions],
+        profiles.valid[:, sim_positions] & profiles.valid[:, meas_positions],
+        n_days,
+    )
+    estimates = _metrics_from_sums(daily.sum(axis=0))
+
+    # Resample weights: how many times each day is drawn in each resample
+    days = block_bootstrap_days(n_days, n_resamples, block_days, seed)
+
+    def resample(batch):
+        draws = days[batch]
+        offsets = np.arange(len(draws))[:, None] * n_days
+        weights = np.bincount((draws + offsets).ravel(), minlength=len(draws) * n_days).reshape(len(draws), n_days)
+        return _metrics_from_sums(weights.astype(np.float64) @ daily)
+
+    batches = [slice(start, start + batch_size) for start in range(0, n_resamples, batch_size)]
+    n_jobs = n_jobs or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        results = list(executor.map(resample, batches))
+    samples = {metric: np.concatenate([result[metric] for result in results]) for metric in BOOTSTRAP_METRICS}
+
+    alpha = (1 - confidence) / 2
+    rows = []
+    for metric in BOOTSTRAP_METRICS:
+        with np.errstate(invalid="ignore"):
+            lower, upper = np.nanquantile(samples[metric], [alpha, 1 - alpha], axis=0)
+        std = np.nanstd(samples[metric], axis=0)
+        for i, col in enumerate(sim_columns):
+            rows.append(
+                {
+                    "Location": catalog.at[col, "location"],
+                    "Year": catalog.at[col, "year"],
+                    "Tool": catalog.at[col, "tool"],
+                    "Series": col,
+                    "Metric": metric,
+                    "Estimate": estimates[metric][i],
+                    "CI lower": lower[i],
+                    "CI upper": upper[i],
+                    "Std": std[i],
+                }
+            )
+    table = pd.DataFrame(rows, columns=["Location", "Year", "Tool", "Series", "Metric", "Estimate", "CI lower",
+                                        "CI upper", "Std"])
+    print(f"Bootstrap: {n_resamples} resamples of {n_days} days (blocks of {block_days} days) for {n_pairs} series")
+
+    if return_samples:
+        return table, {metric: pd.DataFrame(samples[metric], columns=sim_columns) for metric in BOOTSTRAP_METRICS}
+    return table
@@ -0,0 +1,290 @@
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from ..series_catalog import build_series_catalog, select_series, find_measured_column
+from ..pv_measured.highres import hourly_sums, hourly_means
+from .metrics import _measured_pairs
+
+# Rough in-memory cost of one parsed CSV value (float64 plus pandas parsing buffers)
+_BYTES_PER_VALUE = 64
+
+
+@contextmanager
+def _memory_trace():
+    """
+    Trace the Python and numpy allocations of a block loop.
+
+    Yields a dict whose `"peak_memory_mb"` entry is set on exit to the peak of the
+    memory allocated inside the `with` block (in MB), so it reflects the size of one
+    block rather than the lifetime peak of the process.
+    """
+    trace = {"peak_memory_mb": None}
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        yield trace
+    finally:
+        peak = tracemalloc.get_traced_memory()[1]
+        if started:
+            tracemalloc.stop()
+        trace["peak_memory_mb"] = round((peak - baseline) / 1024**2, 1)
+
+
+def _chunk_rows(n_columns, max_memory_mb, chunksize):
+    """Number of rows per block: given explicitly, or derived from the memory budget."""
+    if chunksize is not None:
+        return int(chunksize)
+    return max(1, int(max_memory_mb * 1024**2 / (max(n_columns, 1) * _BYTES_PER_VALUE)))
+
+
+def _read_blocks(file_path, usecols, chunk_rows, max_rows=None):
+    """Yield numeric blocks of a CSV file (non-numeric entries become NaN)."""
+    rows_read = 0
+    for block in pd.read_csv(file_path, usecols=usecols, chunksize=chunk_rows):
+        if max_rows is not None:
+            block = block.iloc[: max_rows - rows_read]
+        rows_read += len(block)
+        yield block
+        if max_rows is not None and rows_read >= max_rows:
+            break
+
+
+def aggregate_file_to_hourly(
+    file_path,
+    time_column,
+    value_columns=None,
+    step_seconds=60,
+    min_coverage=0.5,
+    max_memory_mb=256,
+    chunksize=None,
+):
+    """
+    Average a long high-resolution CSV file to hourly values block by block.
+
+    The file is read in fixed-size blocks, each block is cleaned (non-numeric values
+    become NaN) and reduced to per-hour sums and counts. The rows of the last,
+    possibly incomplete hour of a block are carried over to the next block, so the
+    result is the same as :func:`simeasren.pv_measured.aggregate_to_hourly` on the
+    whole series, while only one block is held in memory.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the CSV file, sorted by time (e.g., multi-year 1-minute inverter data).
+    time_column : str
+        Name of the timestamp column.
+    value_columns : list of str, optional
+        Columns to aggregate. Defaults to all other columns.
+    step_seconds : int, optional
+        Sampling step of the file in seconds (default 60).
+    min_coverage : float, optional
+        Minimum share of valid samples in an hour (default 0.5), below which the
+        hour is NaN.
+    max_memory_mb : float, optional
+        Memory budget for one block, used to choose the number of rows per block
+        (default 256 MB).
+    chunksize : int, optional
+        Number of rows per block. Overrides `max_memory_mb` if given.
+
+    Returns
+    -------
+    tuple
+        `(hourly, report)` where `hourly` is a DataFrame of hourly means indexed by
+        the start of each hour, and `report` is a dict with the keys `"rows"`,
+        `"blocks"`, `"chunksize"` and `"peak_memory_mb"` (peak memory allocated while
+        reading and reducing the blocks, traced with :mod:`tracemalloc`).
+
+    Raises
+    ------
+    ValueError
+        If the timestamps of the file are not sorted.
+
+    Examples
+    --------
+    >>> from simeasren.pv_analysis.chunked import aggregate_file_to_hourly
+    >>> hourly, report = aggregate_file_to_hourly(
+    ...     "Turin_2015-2024_1min.csv", "DATE_TIME", ["Turin PV-MEAS"], max_memory_mb=64
+    ... )
+    """
+    if value_columns is None:
+        value_columns = [col for col in pd.read_csv(file_path, nrows=0).columns if col != time_column]
+    value_columns = list(value_columns)
+
+    chunk_rows = _chunk_rows(len(value_columns) + 1, max_memory_mb, chunksize)
+
+    bin_hours, bin_sums, bin_counts = [], [], []
+    carry = None
+    n_rows = 0
+    n_blocks = 0
+
+    with _memory_trace() as trace:
+        for block in _read_blocks(file_path, [time_column] + value_columns, chunk_rows):
+            n_rows += len(block)
+            n_blocks += 1
+            if carry is not None:
+                block = pd.concat([carry, block], ignore_index=True)
+
+            timestamps = pd.to_datetime(block[time_column]).values
+            # The carried rows are part of the block, so this also checks the order across blocks
+            if (np.diff(timestamps) < np.timedelta64(0)).any():
+                raise ValueError(f"Timestamps in '{file_path}' must be sorted for block processing.")
+
+            # Keep the last (possibly incomplete) hour for the next block
+            hours = timestamps.astype("datetime64[h]")
+            complete = hours < hours[-1]
+            carry = block[~complete]
+
+            if complete.any():
+                values = block.loc[complete, value_columns].apply(pd.to_numeric, errors="coerce").to_numpy(np.float64)
+                hours_block, sums, counts = hourly_sums(timestamps[complete], values)
+                bin_hours.append(hours_block)
+                bin_sums.append(sums)
+                bin_counts.append(counts)
+
+        if carry is not None and len(carry):
+            values = carry[value_columns].apply(pd.to_numeric, errors="coerce").to_numpy(np.float64)
+            hours_block, sums, counts = hourly_sums(pd.to_datetime(carry[time_column]).values, values)
+            bin_hours.append(hours_block)
+            bin_sums.append(sums)
+            bin_counts.append(counts)
+
+    if not bin_hours:
+        return pd.DataFrame(columns=value_columns), {"rows": 0, "blocks": 0, "chunksize": chunk_rows, **trace}
+
+    hourly = hourly_means(
+        np.concatenate(bin_hours), np.concatenate(bin_sums), np.concatenate(bin_counts), step_seconds, min_coverage
+    )
+    hourly.columns = value_columns
+
+    report = {"rows": n_rows, "blocks": n_blocks, "chunksize": chunk_rows, **trace}
+    print(f"Aggregated {n_rows} rows in {n_blocks} blocks of {chunk_rows} rows (peak memory: {report['peak_memory_mb']} MB)")
+    return hourly, report
+
+
+def calculate_error_metrics_chunked(
+    file_path,
+    location_name,
+    year=None,
+    plot_palette=None,
+    exclude_non_palette=True,
+    max_rows=None,
+    max_memory_mb=256,
+    chunksize=None,
+):
+    """
+    Calculate the error metrics of :func:`simeasren.calculate_error_metrics` block by block from a CSV file.
+
+    Only running sums are kept between blocks (number of valid pairs, sums of the
+    simulated and measured values, of the absolute and of the squared differences),
+    so files with many years or sites can be processed with bounded memory. Each
+    simulated column is compared with the measured column of its own year, as in
+    :func:`simeasren.calculate_error_metrics_table`, and the results are the same
+    as with the in-memory function, up to floating-point rounding.
+
+    Parameters
+    ----------
+    file_path : str
+        CSV file with measured and simulated series, e.g. the file written by
+        :func:`simeasren.merge_sim_with_measured`.
+    location_name : str
+        Name of the location (e.g., `"Turin"`).
+    year : str, optional
+        Only use series of this year. Defaults to all years of the location.
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+    max_rows : int, optional
+        Only read the first `max_rows` rows (e.g., 8760 as in
+        :func:`simeasren.prepare_pv_data_for_plots`).
+    max_memory_mb : float, optional
+        Memory budget for one block, used to choose the number of rows per block
+        (default 256 MB).
+    chunksize : int, optional
+        Number of rows per block. Overrides `max_memory_mb` if given.
+
+    Returns
+    -------
+    tuple
+        `(mean_diff_results, mae_results, rmse_results, report)`: the three lists of
+        dictionaries returned by :func:`simeasren.calculate_error_metrics` and a dict
+        with the keys `"rows"`, `"blocks"`, `"chunksize"` and `"peak_memory_mb"`.
+
+    Examples
+    --------
+    >>> from simeasren.pv_analysis.chunked import calculate_error_metrics_chunked
+    >>> mean_diff, mae, rmse, report = calculate_error_metrics_chunked(
+    ...     "results/Turin/simulated_PV/Turin_meas_sim.csv", "Turin", year="2019", chunksize=1000
+    ... )
+    """
+    mean_diff_results, mae_results, rmse_results = [], [], []
+
+    catalog = build_series_catalog(pd.read_csv(file_path, nrows=0).columns)
+    if find_measured_column(catalog, location=location_name) is None:
+        print(f"'PV-MEAS' column missing for {location_name}")
+        return mean_diff_results, mae_results, rmse_results, None
+
+    # Same pairing as the in-memory metrics: the measured column of each simulated column's year
+    palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+    pairs = _measured_pairs(
+        catalog, select_series(catalog, location=location_name, year=year, tools=palette_tools, is_measured=False)
+    )
+    sim_columns = list(pairs)
+    meas_columns = list(pairs.values())
+    used_columns = list(dict.fromkeys(meas_columns + sim_columns))
+
+    chunk_rows = _chunk_rows(len(used_columns), max_memory_mb, chunksize)
+
+    n_sim = len(sim_columns)
+    count = np.zeros(n_sim)
+    sum_sim = np.zeros(n_sim)
+    sum_meas = np.zeros(n_sim)
+    sum_abs = np.zeros(n_sim)
+    sum_sq = np.zeros(n_sim)
+    n_rows = 0
+    n_blocks = 0
+
+    with _memory_trace() as trace:
+        for block in _read_blocks(file_path, used_columns, chunk_rows, max_rows):
+            n_rows += len(block)
+            n_blocks += 1
+            block = block.apply(pd.to_numeric, errors="coerce")
+            measured = block[meas_columns].to_numpy(np.float64)
+            simulated = block[sim_columns].to_numpy(np.float64)
+
+            valid = ~np.isnan(simulated) & ~np.isnan(measured)
+            diff = np.where(valid, simulated - measured, 0.0)
+            count += valid.sum(axis=0)
+            sum_sim += np.where(valid, simulated, 0.0).sum(axis=0)
+            sum_meas += np.where(valid, measured, 0.0).sum(axis=0)
+            sum_abs += np.abs(diff).sum(axis=0)
+            sum_sq += (diff**2).sum(axis=0)
+
+    for i, sim_col in enumerate(sim_columns):
+        if count[i] == 0:
+            continue
+        tool_name = catalog.at[sim_col, "tool"]
+        mean_diff_results.append({
+            "Location": location_name,
+            "Tool": tool_name,
+            "Mean Difference (%)": (sum_sim[i] / count[i] - sum_meas[i] / count[i]) * 100,
+        })
+        mae_results.append({
+            "Location": location_name,
+            "Tool": tool_name,
+            "MAE (%)": sum_abs[i] / count[i] * 100,
+        })
+        rmse_results.append({
+            "Location": location_name,
+            "Tool": tool_name,
+            "RMSE (%)": np.sqrt(sum_sq[i] / count[i]) * 100,
+        })
+
+    report = {"rows": n_rows, "blocks": n_blocks, "chunksize": chunk_rows, **trace}
+    print(f"Error metrics computed over {n_rows} rows in {n_blocks} blocks of {chunk_rows} rows (peak memory: {report['peak_memory_mb']} MB)")
+    return mean_diff_results, mae_results, rmse_results, report
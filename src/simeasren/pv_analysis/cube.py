@@ -0,0 +1,313 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from ..series_catalog import build_series_catalog
+from ..archive import read_profiles
+
+HOURS_PER_YEAR = 8760
+MEASURED_SOURCE = "PV-MEAS"
+
+# ---------------------------- Build the on-disk cube -----------------------------
+
+
+def build_pv_cube(locations, output_dir="results", cube_dir=None):
+    """
+    Store the merged measured/simulated data of several sites as a chunked data cube.
+
+    Each (site, year) is written as one chunk file holding a float32 array of shape
+    (source, hour), with NaN for sources not available at that site and year. A
+    small JSON index records the labels of the four dimensions
+    (site, source, year, hour). The cube is then opened lazily with
+    :func:`open_pv_cube`.
+
+    Parameters
+    ----------
+    locations : list of str
+        Sites to include (e.g., `["Turin", "Almeria"]`). Their merged data must exist
+        (see :func:`simeasren.merge_sim_with_measured`) in:
+        ```
+        {output_dir}/{location}/simulated_PV/{location}_meas_sim.csv
+        ```
+        or in its ``.pvz`` archive.
+    output_dir : str, optional
+        Root directory of the results (default `"results"`).
+    cube_dir : str, optional
+        Directory of the cube. Defaults to `"{output_dir}/PV_cube"`.
+
+    Returns
+    -------
+    str
+        Path of the cube directory.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the merged data of a location does not exist.
+
+    Examples
+    --------
+    >>> from simeasren.pv_analysis import build_pv_cube, open_pv_cube
+    >>> cube_dir = build_pv_cube(["Turin", "Almeria"])
+    >>> cube = open_pv_cube(cube_dir)
+    """
+    cube_dir = cube_dir or os.path.join(output_dir, "PV_cube")
+    os.makedirs(cube_dir, exist_ok=True)
+
+    frames = {}
+    for location_name in locations:
+        file_path = os.path.join(output_dir, location_name, "simulated_PV", f"{location_name}_meas_sim.csv")
+        data = read_profiles(file_path).apply(pd.to_numeric, errors="coerce").iloc[:HOURS_PER_YEAR]
+        catalog = build_series_catalog(data.columns)
+        catalog = catalog[(catalog["location"] == location_name) & (catalog["resolution"] == "hourly")]
+        frames[location_name] = (data, catalog.dropna(subset=["year"]))
+
+    # Dimension labels shared by all chunks
+    sources = sorted(set().union(*(catalog["tool"] for _, catalog in frames.values())))
+    sources = [MEASURED_SOURCE] + [source for source in sources if source != MEASURED_SOURCE]
+    years = sorted(set().union(*(catalog["year"].dropna() for _, catalog in frames.values())))
+    source_position = {source: i for i, source in enumerate(sources)}
+
+    chunks = []
+    for location_name, (data, catalog) in frames.items():
+        for year, year_catalog in catalog.groupby("year"):
+            chunk = np.full((len(sources), HOURS_PER_YEAR), np.nan, dtype=np.float32)
+            values = data[year_catalog.index].to_numpy(np.float32).T
+            chunk[[source_position[tool] for tool in year_catalog["tool"]], : values.shape[1]] = values
+            np.save(os.path.join(cube_dir, f"{location_name}_{year}.npy"), chunk)
+            chunks.append([location_name, year])
+
+    index = {"sites": list(locations), "sources": sources, "years": years, "hours": HOURS_PER_YEAR, "chunks": chunks}
+    with open(os.path.join(cube_dir, "cube_index.json"), "w") as f:
+        json.dump(index, f, indent=1)
+
+    print(f"PV data cube with {len(chunks)} site-year chunks saved in '{cube_dir}'")
+    return cube_dir
+
+
+def open_pv_cube(cube_dir="results/PV_cube"):
+    """
+    Open a data cube written by :func:`build_pv_cube` without loading any data.
+
+    Parameters
+    ----------
+    cube_dir : str, optional
+        Directory of the cube (default `"results/PV_cube"`).
+
+    Returns
+    -------
+    PVCube
+        Lazy view over all sites, sources, years and hours of the cube.
+
+    Raises
+    ------
+    FileNotFoundError
+        If `cube_dir` does not contain a cube index.
+    """
+    index_path = os.path.join(cube_dir, "cube_index.json")
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(f"PV data cube not found: {index_path}")
+    with open(index_path) as f:
+        index = json.load(f)
+    return PVCube(cube_dir, index)
+
+
+# ---------------------------- Lazy view over the cube -----------------------------
+
+
+class PVCube:
+    """
+    Lazy labeled view of PV data along the dimensions (site, source, year, hour).
+
+    Selections with :meth:`sel` only narrow the labels. Data is read when the view
+    is evaluated (:meth:`to_array`, :meth:`to_frame`, :meth:`map_chunks`,
+    :meth:`error_metrics`), and then only the selected sources and hours of the
+    selected site-year chunks are read from the memory-mapped chunk files.
+    Chunks are evaluated in parallel by a pool of threads (NumPy releases the GIL
+    in the reductions), one per CPU core by default.
+
+    Examples
+    --------
+    >>> from simeasren.pv_analysis import open_pv_cube
+    >>> cube = open_pv_cube("results/PV_cube")
+    >>> summer = cube.sel(source=["PV-MEAS", "PG3-SARAH3"], hours=slice(3624, 5832))
+    >>> summer.to_array().shape
+    (2, 2, 2, 2208)
+    >>> cube.error_metrics(by="source")
+    """
+
+    dims = ("site", "source", "year", "hour")
+
+    def __init__(self, cube_dir, index, sites=None, sources=None, years=None, hours=None):
+        self.cube_dir = cube_dir
+        self._index = index
+        self.sites = list(sites if sites is not None else index["sites"])
+        self.sources = list(sources if sources is not None else index["sources"])
+        self.years = list(years if years is not None else index["years"])
+        self.hours = hours if hours is not None else slice(0, index["hours"])
+        self._chunks = {tuple(chunk) for chunk in index["chunks"]}
+
+    def __repr__(self):
+        n_hours = len(range(*self.hours.indices(self._index["hours"])))
+        return (
+            f"<PVCube sites={len(self.sites)} sources={len(self.sources)} "
+            f"years={len(self.years)} hours={n_hours} at '{self.cube_dir}'>"
+        )
+
+    @property
+    def shape(self):
+        return (len(self.sites), len(self.sources), len(self.years), len(range(*self.hours.indices(self._index["hours"]))))
+
+    def sel(self, site=None, source=None, year=None, hours=None):
+        """
+        Select labels along one or more dimensions (no data is read).
+
+        Parameters
+        ----------
+        site, source, year : str or list of str, optional
+            Labels to keep (e.g., `site="Turin"`, `source=["PV-MEAS", "RN-MERRA2"]`).
+        hours : slice, optional
+            0-based hour positions to keep within the year (e.g., `slice(0, 744)` for January).
+
+        Returns
+        -------
+        PVCube
+            New lazy view.
+
+        Raises
+        ------
+        KeyError
+            If a label is not part of the cube.
+        """
+        def pick(current, requested, dim):
+            if requested is None:
+                return current
+            requested = [str(r) for r in ([requested] if isinstance(requested, (str, int)) else requested)]
+            missing = [r for r in requested if r not in current]
+            if missing:
+                raise KeyError(f"{missing} not available along '{dim}'")
+            return requested
+
+        return PVCube(
+            self.cube_dir,
+            self._index,
+            sites=pick(self.sites, site, "site"),
+            sources=pick(self.sources, source, "source"),
+            years=pick(self.years, year, "year"),
+            hours=hours if hours is not None else self.hours,
+        )
+
+    def _selected_chunks(self):
+        return [(site, year) for site in self.sites for year in self.years if (site, year) in self._chunks]
+
+    def _read_chunk(self, site, year, sources=None):
+        """Read the selected sources and hours of one chunk as a float64 (source, hour) array."""
+        sources = self.sources if sources is None else sources
+        positions = [self._index["sources"].index(source) for source in sources]
+        chunk = np.load(os.path.join(self.cube_dir, f"{site}_{year}.npy"), mmap_mode="r")
+        return np.asarray(chunk[positions, self.hours], dtype=np.float64)
+
+    def map_chunks(self, func, n_jobs=None, sources=None):
+        """
+        Apply `func(values, site, year)` to every selected site-year chunk in parallel.
+
+        Parameters
+        ----------
+        func : callable
+            Function receiving the (source, hour) array of one chunk, its site and its year.
+        n_jobs : int, optional
+            Number of worker threads (default: number of CPU cores).
+        sources : list of str, optional
+            Sources to read instead of the selected ones.
+
+        Returns
+        -------
+        dict
+            `{(site, year): result}` for every chunk present in the cube.
+        """
+        chunks = self._selected_chunks()
+        n_jobs = n_jobs or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            results = executor.map(lambda key: func(self._read_chunk(*key, sources=sources), *key), chunks)
+            return dict(zip(chunks, results))
+
+    def to_array(self, n_jobs=None):
+        """Evaluate the view as a (site, source, year, hour) array, NaN where no data exists."""
+        values = np.full(self.shape, np.nan)
+        site_position = {site: i for i, site in enumerate(self.sites)}
+        year_position = {year: i for i, year in enumerate(self.years)}
+        for (site, year), chunk in self.map_chunks(lambda chunk, site, year: chunk, n_jobs).items():
+            values[site_position[site], :, year_position[year], :] = chunk
+        return values
+
+    def to_frame(self, n_jobs=None):
+        """
+        Evaluate the view as a wide DataFrame with the package column names.
+
+        Columns are named `"{site}{year} {source}"` as in the merged data files, so
+        the result can be passed to :func:`simeasren.calculate_error_metrics` or the
+        plotting functions.
+        """
+        columns = {}
+        for (site, year), chunk in self.map_chunks(lambda chunk, site, year: chunk, n_jobs).items():
+            for source, values in zip(self.sources, chunk):
+                if not np.isnan(values).all():
+                    columns[f"{site}{year} {source}"] = values
+        return pd.DataFrame(columns)
+
+    def error_metrics(self, by=("site", "year", "source"), n_jobs=None):
+        """
+        Mean difference, MAE and RMSE (%) of every selected source against `"PV-MEAS"`.
+
+        Each chunk is reduced in parallel to sums over the valid hours, which are then
+        pooled along the dimensions not listed in `by`. For example `by="source"`
+        gives one RMSE per source over all selected sites and years.
+
+        Parameters
+        ----------
+        by : str or tuple of str, optional
+            Dimensions to keep among `"site"`, `"year"` and `"source"`
+            (default: all three).
+        n_jobs : int, optional
+            Number of worker threads (default: number of CPU cores).
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per group with the columns of `by`, `"Hours"`,
+            `"Mean Difference (%)"`, `"MAE (%)"` and `"RMSE (%)"`. The table is empty
+            (with the same columns) if no chunk matches the selection.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        sim_sources = [source for source in self.sources if source != MEASURED_SOURCE]
+        read_sources = [MEASURED_SOURCE] + sim_sources
+
+        def reduce_chunk(chunk, site, year):
+            measured, simulated = chunk[0], chunk[1:]
+            valid = ~np.isnan(simulated) & ~np.isnan(measured)
+            diff = np.where(valid, simulated - measured, 0.0)
+            return pd.DataFrame({
+                "site": site,
+                "year": year,
+                "source": sim_sources,
+                "n": valid.sum(axis=1),
+                "sum_diff": diff.sum(axis=1),
+                "sum_abs": np.abs(diff).sum(axis=1),
+                "sum_sq": (diff**2).sum(axis=1),
+            })
+
+        chunk_sums = list(self.map_chunks(reduce_chunk, n_jobs, sources=read_sources).values())
+        if not chunk_sums:
+            return pd.DataFrame(columns=by + ["Hours", "Mean Difference (%)", "MAE (%)", "RMSE (%)"])
+
+        partial = pd.concat(chunk_sums, ignore_index=True)
+        pooled = partial.groupby(by, sort=False)[["n", "sum_diff", "sum_abs", "sum_sq"]].sum()
+        pooled = pooled[pooled["n"] > 0]
+
+        return pd.DataFrame({
+            "Hours": pooled["n"],
+            "Mean Difference (%)": pooled["sum_diff"] / pooled["n"] * 100,
+            "MAE (%)": pooled["sum_abs"] / pooled["n"] * 100,
+            "RMSE (%)": np.sqrt(pooled["sum_sq"] / pooled["n"]) * 100,
+        }).reset_index()
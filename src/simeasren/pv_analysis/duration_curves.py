@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+from ..series_catalog import select_series
+from ..profiles import ProfileMatrix
+from ..metric_cache import series_hash
+from .metrics import _measured_pairs
+
+# ---------------------------- Duration curves shared by the plots and the metrics -----------------------------
+
+# In-memory cache of sorted profiles, keyed by the dataset (most recent last)
+_CURVE_CACHE = {}
+_CURVE_CACHE_SIZE = 16
+
+
+def _columns(profiles, positions):
+    """Values and validity mask of the columns, without a copy when all columns are selected in order."""
+    if positions == list(range(profiles.shape[1])):
+        return profiles.values, profiles.valid
+    return profiles.values[:, positions], profiles.valid[:, positions]
+
+
+def _curve_key(values, valid, columns):
+    """Cache key of sorted columns: their names and the content hash of each column (see :func:`series_hash`)."""
+    return (tuple(columns), tuple(series_hash(values[:, i], valid[:, i]) for i in range(values.shape[1])))
+
+
+def _sorted_profiles(profiles, columns, cache):
+    """(hours, columns) array of each column sorted in decreasing order, missing hours last, and the valid counts."""
+    values, valid = _columns(profiles, [profiles.position(col) for col in columns])
+    key = _curve_key(values, valid, columns) if cache else None
+    if key in _CURVE_CACHE:
+        _CURVE_CACHE[key] = _CURVE_CACHE.pop(key)
+        return _CURVE_CACHE[key]
+
+    # One sort of the negated array: decreasing values with NaN (missing hours) at the end
+    curves = -np.sort(-np.where(valid, values, np.nan), axis=0)
+    counts = valid.sum(axis=0)
+    if cache:
+        _CURVE_CACHE[key] = (curves, counts)
+        while len(_CURVE_CACHE) > _CURVE_CACHE_SIZE:
+            _CURVE_CACHE.pop(next(iter(_CURVE_CACHE)))
+    return curves, counts
+
+
+def clear_duration_curve_cache():
+    """Empty the in-memory cache used by :func:`duration_curves`."""
+    _CURVE_CACHE.clear()
+
+
+def duration_curves(data_sim_meas, columns=None, cache=True) -> pd.DataFrame:
+    """
+    Duration curves (values sorted in decreasing order) of all profiles.
+
+    All columns are sorted together with one `numpy.sort` on the 2-D array of the
+    profiles. Missing hours are placed at the end of each curve (NaN). The result is
+    cached per dataset (column names and content hash of each column), so the plots
+    and the metrics share one sort.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly profiles.
+    columns : list of str, optional
+        Profiles to use (default: all).
+    cache : bool, optional
+        If True (default), reuse and store the curves in an in-memory cache
+        (see :func:`clear_duration_curve_cache`).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One column per profile, row `k` holding the `k + 1`-th highest value.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import duration_curves
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> curves = duration_curves(data_sim_meas)
+    >>> curves.iloc[1000]  # Capacity factor exceeded during 1000 hours
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    columns = profiles.columns if columns is None else list(columns)
+    curves, _ = _sorted_profiles(profiles, columns, cache)
+    return pd.DataFrame(curves.copy(), columns=columns)
+
+
+def _on_exceedance_grid(curves, counts, n_points):
+    """Curves resampled on `n_points` exceedance fractions, so curves with different numbers of valid hours compare."""
+    fractions = (np.arange(n_points) + 0.5) / n_points
+    resampled = np.full((n_points, curves.shape[1]), np.nan)
+    for j, count in enumerate(counts):
+        if count == n_points:
+            resampled[:, j] = curves[:, j]
+        elif count > 0:
+            resampled[:, j] = np.interp(fractions, (np.arange(count) + 0.5) / count, curves[:count, j])
+    return resampled
+
+
+def calculate_duration_curve_metrics(
+    data_sim_meas,
+    location_name=None,
+    plot_palette=None,
+    exclude_non_palette=True,
+    cache=True,
+) -> pd.DataFrame:
+    """
+    Differences between the duration curves of the simulated and measured profiles.
+
+    The curves are compared on a common exceedance grid (fraction of the valid
+    hours), so profiles with a few missing hours can be compared. Unlike the hourly
+    metrics, these do not depend on the timing of the values: they tell whether a
+    source reproduces the distribution of the output, which drives the sizing of
+    the plant in the techno-economic model.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Measured and simulated PV data. Simulated columns are paired with measured
+        columns as in :func:`simeasren.calculate_error_metrics_table`.
+    location_name : str, optional
+        Only use this location (default: all locations).
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+    cache : bool, optional
+        Use the cache of :func:`duration_curves` (default True).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per simulated column with `"Location"`, `"Year"`, `"Tool"`,
+        `"Series"`, `"Measured series"` and:
+
+        - `"Duration curve area (%)"`: mean absolute gap between the curves (area
+          between the curves over the year, i.e. the Wasserstein distance between the
+          hourly distributions);
+        - `"Duration curve bias (%)"`: mean signed gap (simulated - measured);
+        - `"Max duration gap (%)"`: largest absolute gap.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import calculate_duration_curve_metrics
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> calculate_duration_curve_metrics(data_sim_meas, "Turin")[["Tool", "Duration curve area (%)"]]
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    catalog = profiles.catalog
+    palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+    pairs = _measured_pairs(catalog, select_series(catalog, location=location_name, tools=palette_tools, is_measured=False))
+    sim_columns = list(pairs)
+    # Columns in the order of the data, so the curves sorted for the plots are reused
+    needed = set(pairs.values()) | set(sim_columns)
+    columns = [col for col in profiles.columns if col in needed]
+
+    curves, counts = _sorted_profiles(profiles, columns, cache)
+    resampled = _on_exceedance_grid(curves, counts, len(profiles))
+    position = {col: j for j, col in enumerate(columns)}
+    simulated = resampled[:, [position[col] for col in sim_columns]]
+    gap = simulated - resampled[:, [position[pairs[col]] for col in sim_columns]]
+
+    with np.errstate(invalid="ignore"):
+        return pd.DataFrame(
+            {
+                "Location": catalog.loc[sim_columns, "location"].to_numpy(dtype=object),
+                "Year": catalog.loc[sim_columns, "year"].to_numpy(dtype=object),
+                "Tool": catalog.loc[sim_columns, "tool"].to_numpy(dtype=object),
+                "Series": sim_columns,
+                "Measured series": [pairs[col] for col in sim_columns],
+                "Duration curve area (%)": np.abs(gap).mean(axis=0) * 100,
+                "Duration curve bias (%)": gap.mean(axis=0) * 100,
+                "Max duration gap (%)": np.abs(gap).max(axis=0, initial=0.0) * 100,
+            }
+        )
+
+
+def duration_curve_features(data_sim_meas, columns=None, hours=(500, 1000, 2000, 4000), thresholds=(0.1, 0.5, 0.8),
+                            cache=True) -> pd.DataFrame:
+    """
+    Summary features of the duration curves, e.g. as inputs of a surrogate model of the LCOF.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly profiles.
+    columns : list of str, optional
+        Profiles to use (default: all).
+    hours : tuple of int, optional
+        Ranks at which the curve is read (default 500, 1000, 2000 and 4000 hours).
+    thresholds : tuple of float, optional
+        Capacity factors for the numbers of hours above them (default 0.1, 0.5, 0.8).
+    cache : bool, optional
+        Use the cache of :func:`duration_curves` (default True).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per profile (index) with `"Full-load hours"` (sum of the values),
+        `"Valid hours"`, `"CF at {h} h"` for each rank and `"Hours above {t}"` for
+        each threshold.
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    columns = profiles.columns if columns is None else list(columns)
+    curves, counts = _sorted_profiles(profiles, columns, cache)
+
+    features = {"Full-load hours": np.nansum(curves, axis=0), "Valid hours": counts}
+    for hour in hours:
+        features[f"CF at {hour} h"] = curves[min(hour, len(curves)) - 1] if len(curves) else np.nan
+    for threshold in thresholds:
+        features[f"Hours above {threshold:g}"] = (curves > threshold).sum(axis=0)
+    return pd.DataFrame(features, index=pd.Index(columns, name="Series"))
@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+from ..series_catalog import select_series
+from ..profiles import ProfileMatrix
+from .metrics import _measured_pairs
+from .bootstrap import BOOTSTRAP_METRICS, _metrics_from_sums
+from .sky_conditions import daily_sky_indices
+
+# ---------------------------- Error metrics grouped by calendar and sky regime -----------------------------
+
+GROUP_KEYS = ["Month", "Hour", "Season", "Sky regime"]
+
+SEASONS = ["DJF", "MAM", "JJA", "SON"]
+
+
+def build_group_index(
+    data_sim_meas,
+    location_name,
+    year=None,
+    clear_sky_bins=(0.0, 0.3, 0.6, 0.85, np.inf),
+    clear_sky_labels=("overcast", "cloudy", "mixed", "clear"),
+) -> pd.DataFrame:
+    """
+    Group keys of every hour of the profiles, computed once and reused.
+
+    The keys are built for every measured column of the location, each with the
+    calendar of its own year (months shift by a day after February in leap years)
+    and the sky regime of its own measurements.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly profiles starting on January 1st at 00:00, with a `"PV-MEAS"`
+        column per year for the location.
+    location_name : str
+        Location of the measured profiles used for the sky regime (e.g., `"Turin"`).
+    year : int or str, optional
+        Only build the keys of the measured column of this year. Defaults to all
+        years; a non-leap year is assumed for measured columns without a year.
+    clear_sky_bins : tuple of float, optional
+        Edges of the bins of the daily clear-sky index of the measured profile
+        (see :func:`simeasren.pv_analysis.daily_sky_indices`).
+    clear_sky_labels : tuple of str, optional
+        Names of the bins (one less than the edges).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per measured column and hour of the profiles (indexed by the
+        measured column name and the hour position), with the categorical columns
+        `"Month"` (1-12), `"Hour"` (0-23), `"Season"` (`"DJF"`, `"MAM"`, `"JJA"`,
+        `"SON"`) and `"Sky regime"` (missing for days without a clear-sky index).
+
+    Raises
+    ------
+    ValueError
+        If no measured column is found for the location (and year).
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    meas_columns = select_series(profiles.catalog, location=location_name, year=year, is_measured=True)
+    if not meas_columns:
+        raise ValueError(f"No measured data column found for {location_name}{year or ''}.")
+
+    n_hours = len(profiles)
+    clear_sky_index, _ = daily_sky_indices(profiles, meas_columns)
+    groups = {}
+    for meas_column in meas_columns:
+        # Profiles keep 8760 hours, also in leap years
+        column_year = profiles.catalog.at[meas_column, "year"] or 2019
+        hours = pd.date_range(f"{column_year}-01-01", periods=n_hours, freq="h")
+        month = hours.month.to_numpy()
+
+        daily_index = np.full(-(-n_hours // 24), np.nan)
+        daily_index[: len(clear_sky_index)] = clear_sky_index[meas_column].to_numpy()
+        regime = pd.cut(
+            np.repeat(daily_index, 24)[:n_hours], list(clear_sky_bins), labels=list(clear_sky_labels), right=False
+        )
+
+        groups[meas_column] = pd.DataFrame(
+            {
+                "Month": pd.Categorical(month, categories=range(1, 13)),
+                "Hour": pd.Categorical(hours.hour, categories=range(24)),
+                "Season": pd.Categorical.from_codes(month % 12 // 3, SEASONS),
+                "Sky regime": regime,
+            }
+        )
+
+    return pd.concat(groups, names=["Series", None])
+
+
+def calculate_grouped_error_metrics(
+    data_sim_meas,
+    location_name,
+    by=("Month", "Hour"),
+    group_index=None,
+    plot_palette=None,
+    exclude_non_palette=True,
+) -> pd.DataFrame:
+    """
+    Error metrics of every simulated column for every group of hours, in one pass.
+
+    The keys of `by` are combined into one integer group code per hour, and the
+    sums needed by the metrics (see `BOOTSTRAP_METRICS`) are reduced over
+    (group, column) pairs with one `numpy.bincount` per sum, for all columns at
+    once. Grouping a year by month and hour of the day for ten sources takes a few
+    milliseconds.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly measured and simulated profiles.
+    location_name : str
+        Location of the profiles (e.g., `"Turin"`).
+    by : str or tuple of str, optional
+        Keys of `GROUP_KEYS` to group by (default month and hour of the day).
+    group_index : pandas.DataFrame, optional
+        Output of :func:`build_group_index`, to reuse it between calls. Built with
+        the default bins if None. Each simulated column is grouped with the keys of
+        the measured column of its year; simulated columns whose measured column
+        is not in `group_index` are left out.
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per simulated column and group with data: `"Location"`, `"Year"`,
+        `"Tool"`, `"Series"`, the keys of `by`, `"Hours"` and the metrics of
+        `BOOTSTRAP_METRICS`.
+
+    Raises
+    ------
+    ValueError
+        If a key of `by` is unknown.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import build_group_index, calculate_grouped_error_metrics
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> groups = build_group_index(data_sim_meas, "Turin")
+    >>> table = calculate_grouped_error_metrics(data_sim_meas, "Turin", ("Month", "Hour"), groups)
+    >>> table[table["Tool"] == "PG3-SARAH3"].pivot(index="Month", columns="Hour", values="RMSE (%)")  # Heatmap
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    unknown = [key for key in by if key not in GROUP_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown group keys {unknown}, use some of {GROUP_KEYS}.")
+
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    catalog = profiles.catalog
+    if group_index is None:
+        group_index = build_group_index(profiles, location_name)
+
+    palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+    pairs = _measured_pairs(catalog, select_series(catalog, location=location_name, tools=palette_tools, is_measured=False))
+    indexed = set(group_index.index.get_level_values(0))
+    pairs = {sim_col: meas_col for sim_col, meas_col in pairs.items() if meas_col in indexed}
+    sim_columns = list(pairs)
+    n_pairs = len(sim_columns)
+
+    # One integer code per hour and pair for the combination of the keys (-1: hour
+    # without group), from the keys of the measured column of each pair
+    meas_columns = list(dict.fromkeys(pairs.values()))
+    pair_meas = [meas_columns.index(meas_col) for meas_col in pairs.values()]
+    codes = [
+        np.column_stack([group_index.loc[meas_col, key].cat.codes.to_numpy() for meas_col in meas_columns])[:, pair_meas]
+        if meas_columns else np.empty((len(profiles), 0), dtype=np.int8)
+        for key in by
+    ]
+    sizes = [len(group_index[key].cat.categories) for key in by]
+    has_group = np.logical_and.reduce([code >= 0 for code in codes])
+    group = np.where(has_group, np.ravel_multi_index([np.maximum(code, 0) for code in codes], sizes), -1)
+    n_groups = int(np.prod(sizes))
+
+    sim_positions = [profiles.position(col) for col in sim_columns]
+    meas_positions = [profiles.position(col) for col in pairs.values()]
+    simulated = profiles.values[:, sim_positions]
+    measured = profiles.values[:, meas_positions]
+    valid = profiles.valid[:, sim_positions] & profiles.valid[:, meas_positions] & has_group
+
+    # Segment sums over (group, column) with one bincount per statistic
+    flat = (group * n_pairs + np.arange(n_pairs))[valid]
+    simulated, measured = simulated[valid], measured[valid]
+    diff = simulated - measured
+    statistics = [None, simulated, measured, np.abs(diff), diff**2, simulated**2, measured**2, simulated * measured]
+    sums = np.concatenate(
+        [np.bincount(flat, weights=stat, minlength=n_groups * n_pairs).reshape(n_groups, n_pairs) for stat in statistics],
+        axis=1,
+    )
+    metrics = _metrics_from_sums(sums)
+
+    # Tidy table of the groups with data
+    count = sums[:, :n_pairs]
+    pair_columns, group_rows = np.nonzero(count.T)
+    keys = np.unravel_index(group_rows, sizes)
+    table = pd.DataFrame(
+        {
+            "Location": location_name,
+            "Year": catalog.loc[sim_columns, "year"].to_numpy(dtype=object)[pair_columns],
+            "Tool": catalog.loc[sim_columns, "tool"].to_numpy(dtype=object)[pair_columns],
+            "Series": np.array(sim_columns, dtype=object)[pair_columns],
+            **{key: group_index[key].cat.categories[code] for key, code in zip(by, keys)},
+            "Hours": count[group_rows, pair_columns].astype(np.int64),
+            **{metric: metrics[metric][group_rows, pair_columns] for metric in BOOTSTRAP_METRICS},
+        }
+    )
+    return table
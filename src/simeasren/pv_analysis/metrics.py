@@ -1,11 +1,167 @@
 import numpy as np
-from sklearn.metrics import mean_absolute_error, mean_squared_error
+import pandas as pd
+from ..series_catalog import select_series, find_measured_column
+from ..profiles import ProfileMatrix
+from ..results_db import get_results_database, fingerprint
+from ..metric_cache import get_metric_cache, series_hash
+
+METRIC_COLUMNS = ["Mean Difference (%)", "MAE (%)", "RMSE (%)"]
+
+# Version of the metrics stored in the metric cache, to change with the definition of the metrics
+METRIC_SET = "error_metrics-1"
+
+
+def masked_error_metrics(simulated, measured, valid):
+    """
+    Mean difference, MAE and RMSE (%) of every column of 2-D arrays in one pass.
+
+    Parameters
+    ----------
+    simulated, measured : numpy.ndarray
+        Arrays of shape (hours, pairs); `measured` can also have a single column.
+    valid : numpy.ndarray
+        Boolean mask of the hours used for each pair.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        `(count, mean_diff, mae, rmse)` per column, NaN where `count` is 0.
+    """
+    count = valid.sum(axis=0)
+    # Column-major arrays, so each column is reduced over contiguous memory
+    diff = np.asfortranarray(np.where(valid, simulated - measured, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_diff = diff.sum(axis=0) / count * 100
+        mae = np.abs(diff).sum(axis=0) / count * 100
+        rmse = np.sqrt((diff**2).sum(axis=0) / count) * 100
+    return count, mean_diff, mae, rmse
+
+
+def _measured_pairs(catalog, sim_columns):
+    """Measured column of each simulated column: same location and year, else the first of the location."""
+    measured = catalog[catalog["is_measured"] & (catalog["resolution"] == "hourly")]
+    by_year = {}
+    by_location = {}
+    for column, location, year in zip(measured.index, measured["location"], measured["year"]):
+        by_year.setdefault((location, year), column)
+        by_location.setdefault(location, column)
+    pairs = {}
+    for column in sim_columns:
+        location, year = catalog.at[column, "location"], catalog.at[column, "year"]
+        meas_column = by_year.get((location, year), by_location.get(location))
+        if meas_column is not None:
+            pairs[column] = meas_column
+    return pairs
+
+
+def calculate_error_metrics_table(
+    data_sim_meas,
+    location_name=None,
+    plot_palette=None,
+    exclude_non_palette=True,
+    cache=None,
+) -> pd.DataFrame:
+    """
+    Error metrics of all simulated columns in one vectorized pass, as a tidy DataFrame.
+
+    Each simulated column is paired with the measured (`"PV-MEAS"`) column of the
+    same location and year (or the first measured column of its location if there
+    is none for its year). The simulated and measured values of all pairs are laid
+    out as two (hours, pairs) arrays, and the mean difference, MAE and RMSE of every
+    pair are computed with one masked reduction, without any per-column call.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Measured and simulated PV data, possibly for several locations and years.
+    location_name : str, optional
+        Only use this location (default: all locations).
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+    cache : MetricCache, optional
+        Cache of the metrics of series pairs. Only the pairs not found in it (new or
+        changed series) are computed. Defaults to the cache set with
+        :func:`simeasren.set_metric_cache`; nothing is cached if none is set.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per simulated column with data, with the columns `"Location"`,
+        `"Year"`, `"Tool"`, `"Series"`, `"Measured series"`, `"Hours"` (number of
+        hours compared), `"Mean Difference (%)"`, `"MAE (%)"` and `"RMSE (%)"`.
+
+    Examples
+    --------
+    >>> from simeasren import calculate_error_metrics_table, prepare_pv_data_for_plots
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> table = calculate_error_metrics_table(data_sim_meas, "Turin")  # One row per simulated column
+    >>> best = table.sort_values("RMSE (%)")["Series"].iloc[0]
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    catalog = profiles.catalog
+
+    palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+    sim_columns = select_series(catalog, location=location_name, tools=palette_tools, is_measured=False)
+    pairs = _measured_pairs(catalog, sim_columns)
+    sim_columns = list(pairs)
+
+    cache = get_metric_cache(cache)
+    if cache is not None:
+        hashes = {
+            col: series_hash(profiles.column(col), profiles.valid_column(col))
+            for col in dict.fromkeys(sim_columns + list(pairs.values()))
+        }
+        keys = [(hashes[pairs[col]], hashes[col]) for col in sim_columns]
+        cached = cache.get_many(keys, METRIC_SET)
+        to_compute = [col for col, key in zip(sim_columns, keys) if key not in cached]
+    else:
+        to_compute = sim_columns
+
+    sim_positions = [profiles.position(col) for col in to_compute]
+    meas_positions = [profiles.position(pairs[col]) for col in to_compute]
+    valid = profiles.valid[:, sim_positions] & profiles.valid[:, meas_positions]
+    count, mean_diff, mae, rmse = masked_error_metrics(
+        profiles.values[:, sim_positions], profiles.values[:, meas_positions], valid
+    )
+
+    if cache is not None:
+        computed = {
+            key: {"Hours": int(n), "Mean Difference (%)": float(md), "MAE (%)": float(ae), "RMSE (%)": float(se)}
+            for key, n, md, ae, se in zip(
+                [(hashes[pairs[col]], hashes[col]) for col in to_compute], count, mean_diff, mae, rmse
+            )
+        }
+        if computed:
+            cache.put_many(computed, METRIC_SET)
+        stored = [cached.get(key) or computed[key] for key in keys]
+        count = np.array([entry["Hours"] for entry in stored], dtype=np.int64)
+        mean_diff, mae, rmse = (np.array([entry[col] for entry in stored], dtype=np.float64) for col in METRIC_COLUMNS)
+
+    table = pd.DataFrame(
+        {
+            "Location": catalog.loc[sim_columns, "location"].to_numpy(dtype=object),
+            "Year": catalog.loc[sim_columns, "year"].to_numpy(dtype=object),
+            "Tool": catalog.loc[sim_columns, "tool"].to_numpy(dtype=object),
+            "Series": sim_columns,
+            "Measured series": [pairs[col] for col in sim_columns],
+            "Hours": count,
+            "Mean Difference (%)": mean_diff,
+            "MAE (%)": mae,
+            "RMSE (%)": rmse,
+        }
+    )
+    return table[table["Hours"] > 0].reset_index(drop=True)
+
 
 def calculate_error_metrics(
     data_sim_meas,
     location_name,
     plot_palette=None,
     exclude_non_palette=True,
+    results_db=None,
+    cache=None,
 ):
     """
     Calculate PV simulation error metrics relative to measured data.
@@ -18,10 +174,12 @@ def calculate_error_metrics(
 
     Parameters
     ----------
-    data_sim_meas : pandas.DataFrame
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
         DataFrame containing measured and simulated PV data for a given location.
         Columns should include one `"PV-MEAS"` column for measured data and 
         one or more simulation tool columns (e.g., `"Turin PV-SIM1"`).
+        A :class:`simeasren.ProfileMatrix` shared with other stages can be passed
+        instead, so the data and its NaN mask are not rebuilt.
     location_name : str
         Name of the location (e.g., `"Turin"`) used to filter relevant columns 
         and label outputs.
@@ -31,6 +189,13 @@ def calculate_error_metrics(
     exclude_non_palette : bool, optional (default=True)
         If True, only simulation tools listed in `plot_palette` are included.
         If False, all simulation columns are processed regardless of the palette.
+    results_db : ResultsDatabase, optional
+        Database where the metrics are recorded with the run parameters and a
+        fingerprint of the input series. Defaults to the database set with
+        :func:`simeasren.set_results_database`; nothing is recorded if none is set.
+    cache : MetricCache, optional
+        Cache of the metrics of series pairs, see
+        :func:`simeasren.calculate_error_metrics_table`.
 
     Returns
     -------
@@ -50,9 +215,20 @@ def calculate_error_metrics(
     Notes
     -----
     - Metrics are calculated in **percent (%)** by multiplying the raw value by 100.
-    - The function aligns indices of simulated and measured data to handle missing values.
-    - Tool names are extracted from column names by splitting at whitespace and
-      using the second part if available.
+    - Hours where the simulated or the measured value is NaN are left out, using the
+      validity mask of the :class:`simeasren.ProfileMatrix` (no per-column copies
+      of the input frame).
+    - All columns are computed at once by :func:`calculate_error_metrics_table`,
+      which returns the same metrics as a tidy DataFrame.
+    - Simulated columns are compared with the measured column of their own year
+      when there is one, else with the first measured column of the location.
+      Earlier versions compared every simulated column with the first measured
+      column of the location, so the metrics of data with several years of
+      measurements differ from those versions for all years but the first.
+      Single-year results are unchanged. The chunked, per-sky-condition,
+      alignment and bootstrap functions use the same pairing.
+    - Columns are looked up with :func:`simeasren.build_series_catalog`: the location
+      must match exactly and tool names come from the parsed column names.
 
     Examples
     --------
@@ -70,52 +246,13 @@ def calculate_error_metrics(
     mae_results = []
     rmse_results = []
 
-    # Filter columns for the given location
-    loc_data = data_sim_meas[
-        [col for col in data_sim_meas.columns if col.startswith(location_name)]
-    ]
-
-    # Identify measured column
-    meas_column = next((col for col in loc_data.columns if "PV-MEAS" in col), None)
-    if meas_column is None:
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    if find_measured_column(profiles.catalog, location=location_name) is None:
         print(f"'PV-MEAS' column missing for {location_name}")
         return mean_diff_results, mae_results, rmse_results
 
-    valid_columns = loc_data.columns.tolist()
-
-    for sim_col in valid_columns:
-        # Skip measured column
-        if sim_col == meas_column:
-            continue
-
-        # Conditionally exclude non-palette tools
-        if (
-            exclude_non_palette
-            and plot_palette is not None
-            and not any(tool in sim_col for tool in plot_palette.keys())
-        ):
-            continue
-
-        # Drop NaNs and align
-        simulated_data = loc_data[sim_col].dropna()
-        measured_data = loc_data[meas_column].dropna()
-
-        common_index = simulated_data.index.intersection(measured_data.index)
-        simulated_data = simulated_data.loc[common_index]
-        measured_data = measured_data.loc[common_index]
-
-        if simulated_data.empty or measured_data.empty:
-            continue
-
-        # Calculate metrics (%)
-        mean_diff = (simulated_data.mean() - measured_data.mean()) * 100
-        mae = mean_absolute_error(measured_data, simulated_data) * 100
-        rmse = np.sqrt(mean_squared_error(measured_data, simulated_data)) * 100
-
-        # Try to extract tool name
-        parts = sim_col.split()
-        tool_name = parts[1] if len(parts) > 1 else sim_col
-
+    table = calculate_error_metrics_table(profiles, location_name, plot_palette, exclude_non_palette, cache)
+    for tool_name, mean_diff, mae, rmse in zip(table["Tool"], *(table[col].to_numpy() for col in METRIC_COLUMNS)):
         mean_diff_results.append({
             "Location": location_name,
             "Tool": tool_name,
@@ -132,4 +269,19 @@ def calculate_error_metrics(
             "RMSE (%)": rmse,
         })
 
+    # Record the run in the results database
+    results_db = get_results_database(results_db)
+    if results_db is not None and mean_diff_results:
+        used_columns = list(dict.fromkeys(table["Measured series"].tolist() + table["Series"].tolist()))
+        run_id = results_db.start_run(
+            "error_metrics",
+            location=location_name,
+            parameters={
+                "tools": sorted(plot_palette.keys()) if exclude_non_palette and plot_palette is not None else None,
+                "exclude_non_palette": exclude_non_palette,
+            },
+            input_fingerprint=fingerprint(*(profiles.column(col) for col in used_columns)),
+        )
+        results_db.record_error_metrics(run_id, table)
+
     return mean_diff_results, mae_results, rmse_results
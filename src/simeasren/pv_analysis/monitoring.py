@@ -0,0 +1,439 @@
+import numpy as np
+import pandas as pd
+from ..series_catalog import select_series
+from ..profiles import ProfileMatrix
+from .bootstrap import BOOTSTRAP_METRICS, _metrics_from_sums
+from .streaming import MetricAccumulator
+
+# ---------------------------- Continuous monitoring of measured samples -----------------------------
+
+WINDOWS = {"24h": pd.Timedelta(hours=24), "7d": pd.Timedelta(days=7), "30d": pd.Timedelta(days=30)}
+
+
+def _sample_sums(simulated, measured):
+    """Statistics of each sample in the layout of :func:`_metrics_from_sums`, shape (samples, 8 * pairs)."""
+    valid = ~np.isnan(simulated) & ~np.isnan(measured)[:, None]
+    simulated = np.where(valid, simulated, 0.0)
+    measured = np.where(valid, measured[:, None], 0.0)
+    diff = simulated - measured
+    return np.concatenate(
+        [valid, simulated, measured, np.abs(diff), diff**2, simulated**2, measured**2, simulated * measured], axis=1
+    )
+
+
+class SiteMonitor:
+    """
+    Error metrics of a site kept up to date while new measured samples arrive (e.g., from a SCADA feed).
+
+    Each measured sample is compared with the hour of the year it falls in of every
+    simulated profile of the site. The samples are kept in a ring buffer of fixed
+    size, and every rolling window (by default the last 24 hours, 7 days and 30 days)
+    keeps the running sums behind the metrics of `BOOTSTRAP_METRICS` and the
+    histograms of :class:`MetricAccumulator`: adding a sample adds its statistics
+    to every window, and the samples leaving a window are subtracted from it. The
+    cost of a sample does not depend on the length of the windows, and the metrics
+    of any window can be read at any time. The sums are
+    recomputed from the buffer once per buffer length, so rounding errors of the
+    subtractions do not build up.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly profiles of a year, starting on January 1st at 00:00 UTC. The
+        simulated columns of the location are monitored; the same hour of the year
+        is used for samples of any year.
+    location_name : str
+        Name of the site (e.g., `"Turin"`).
+    year : str or int, optional
+        Year of the simulated columns to monitor. Needed if the profiles hold
+        several years of the location, as each sample is compared with one profile
+        per source.
+    windows : dict, optional
+        Rolling windows `{name: length}`, lengths as `pandas.Timedelta` or strings
+        (default `WINDOWS`: 24 hours, 7 days and 30 days).
+    capacity : int, optional
+        Number of samples kept in the ring buffer. By default, the longest window
+        at one sample every `step_seconds`. Older samples are dropped from the
+        windows when the buffer is full.
+    step_seconds : int, optional
+        Expected sampling step of the feed, used for the default capacity
+        (default 60).
+    utc_offset_hours : float, optional
+        Offset from UTC of timestamps without a time zone (default 0), e.g. 1 for a
+        feed in Central European Time. Timestamps with a time zone are converted to
+        UTC.
+    thresholds : dict, optional
+        Drift alert thresholds `{metric: upper}` or `{metric: (lower, upper)}` (None
+        for no bound), checked on every window after each update. Metrics are the
+        columns of :meth:`metrics` (e.g., `"RMSE (%)"`, `"nMBE (%)"`, `"KS distance"`).
+    min_samples : int, optional
+        Samples needed in a window before its alerts are checked (default 60).
+    extended_check_samples : int, optional
+        Thresholds on metrics other than `BOOTSTRAP_METRICS` (e.g., `"KS distance"`,
+        percentiles) need the full :meth:`metrics` of every window, which reads the
+        histograms (tens of milliseconds). They are checked once every
+        `extended_check_samples` samples (default 60, hourly at one sample per
+        minute) instead of after every update; the other thresholds are checked
+        after every update from the running sums.
+    on_alert : callable, optional
+        Called with the dict of every alert raised or cleared.
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+    **accumulator_options
+        Histogram settings of :class:`MetricAccumulator`.
+
+    Raises
+    ------
+    ValueError
+        If the location has no simulated column, if its simulated columns cover
+        several years and `year` is not given, or if a threshold metric is unknown.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import SiteMonitor
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> monitor = SiteMonitor(data_sim_meas, "Turin", thresholds={"RMSE (%)": 15, "nMBE (%)": (-10, 10)})
+    >>> monitor.update(timestamps, values)  # New samples of the feed, in time order
+    >>> monitor.metrics("7d")[["Tool", "Samples", "RMSE (%)", "KS distance"]]
+    >>> monitor.alert_log()
+    """
+
+    def __init__(
+        self,
+        data_sim_meas,
+        location_name,
+        year=None,
+        windows=None,
+        capacity=None,
+        step_seconds=60,
+        utc_offset_hours=0,
+        thresholds=None,
+        min_samples=60,
+        extended_check_samples=60,
+        on_alert=None,
+        plot_palette=None,
+        exclude_non_palette=True,
+        **accumulator_options,
+    ):
+        profiles = ProfileMatrix.from_frame(data_sim_meas)
+        catalog = profiles.catalog
+        palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+        self.series = list(select_series(catalog, location=location_name, year=year, tools=palette_tools, is_measured=False))
+        if not self.series:
+            raise ValueError(f"No simulated data column found for {location_name}.")
+        years = list(dict.fromkeys(catalog.loc[self.series, "year"]))
+        if len(years) > 1:
+            raise ValueError(f"Simulated data of several years {years} for {location_name}, choose one with year=.")
+        positions = [profiles.position(col) for col in self.series]
+        self.location_name = location_name
+        self.tools = catalog.loc[self.series, "tool"].tolist()
+        self.years = catalog.loc[self.series, "year"].tolist()
+        self.simulated = np.where(profiles.valid[:, positions], profiles.values[:, positions], np.nan)
+
+        windows = WINDOWS if windows is None else windows
+        self.windows = {name: pd.Timedelta(length) for name, length in windows.items()}
+        longest = max(self.windows.values())
+        self.capacity = capacity or int(longest.total_seconds() // step_seconds)
+        self.utc_offset_hours = utc_offset_hours
+        self.thresholds = {
+            metric: bound if isinstance(bound, (tuple, list)) else (None, bound)
+            for metric, bound in (thresholds or {}).items()
+        }
+        known = set(BOOTSTRAP_METRICS) | set(MetricAccumulator([]).result().columns)
+        unknown = [metric for metric in self.thresholds if metric not in known]
+        if unknown:
+            raise ValueError(f"Unknown metrics {unknown} in the thresholds.")
+        self.min_samples = min_samples
+        self.extended_check_samples = extended_check_samples
+        self.on_alert = on_alert
+        self.alerts = []
+        self._accumulator_options = accumulator_options
+
+        # Ring buffer of the samples (absolute sample i is stored at i % capacity)
+        n_pairs = len(self.series)
+        self._time = np.zeros(self.capacity, dtype=np.int64)
+        self._simulated = np.zeros((self.capacity, n_pairs))
+        self._measured = np.zeros(self.capacity)
+        self._bins_buffer = np.zeros((self.capacity, 3, n_pairs), dtype=np.int32)
+        self._written = 0
+        self._since_refresh = 0
+
+        # Running sums, histograms and first sample of each window
+        template = MetricAccumulator(self.series, **accumulator_options)
+        self._value_bins = (template.value_range[0], template.value_bin_width, template._n_value_bins)
+        self._error_bins = (template.error_range[0], template.error_bin_width, template._n_error_bins)
+        self._sums = {name: np.zeros(8 * n_pairs) for name in self.windows}
+        self._hist_sim = {name: np.zeros_like(template.hist_sim) for name in self.windows}
+        self._hist_meas = {name: np.zeros_like(template.hist_meas) for name in self.windows}
+        self._hist_error = {name: np.zeros_like(template.hist_error) for name in self.windows}
+        self._start = {name: 0 for name in self.windows}
+        self._alert_state = {}
+        self._extended_checked = 0
+
+    def __repr__(self):
+        return f"<SiteMonitor '{self.location_name}' series={len(self.series)} samples={self._written}>"
+
+    @property
+    def last_time(self):
+        """Timestamp of the last sample in UTC (None before the first update)."""
+        return pd.Timestamp(self._time[(self._written - 1) % self.capacity]) if self._written else None
+
+    def _bins(self, simulated, measured):
+        """Histogram bins (sim, meas, error) of samples, shape (samples, 3, pairs), -1 for invalid pairs."""
+        measured = np.broadcast_to(measured[:, None], simulated.shape)
+        valid = ~np.isnan(simulated) & ~np.isnan(measured)
+        bins = np.full((len(simulated), 3, simulated.shape[1]), -1, dtype=np.int32)
+        for k, (values, (lower, width, n_bins)) in enumerate(
+            [(simulated, self._value_bins), (measured, self._value_bins), (simulated - measured, self._error_bins)]
+        ):
+            index = np.floor((np.where(valid, values, 0.0) - lower) / width + 0.5)
+            bins[:, k] = np.where(valid, np.clip(index, 0, n_bins - 1), -1)
+        return bins
+
+    def _apply(self, name, slots, sign, sums=None):
+        """Add (sign 1) or remove (sign -1) the samples of buffer `slots` from a window."""
+        if sums is None:
+            sums = _sample_sums(self._simulated[slots], self._measured[slots]).sum(axis=0)
+        self._sums[name] += sign * sums
+        bins = self._bins_buffer[slots]
+        for k, hist in enumerate([self._hist_sim[name], self._hist_meas[name], self._hist_error[name]]):
+            # Only the bins of the samples are touched, not the whole histograms
+            rows, pairs = np.nonzero(bins[:, k] >= 0)
+            np.add.at(hist, (pairs, bins[rows, k, pairs]), sign)
+
+    def _evict(self, name, new_start):
+        """Remove the samples before the absolute sample `new_start` from a window."""
+        if new_start > self._start[name]:
+            self._apply(name, np.arange(self._start[name], new_start) % self.capacity, -1)
+            self._start[name] = new_start
+
+    def _first_after(self, name, cutoff):
+        """First absolute sample of a window later than `cutoff` (binary search over the ring buffer)."""
+        low, high = self._start[name], self._written
+        while low < high:
+            middle = (low + high) // 2
+            if self._time[middle % self.capacity] > cutoff:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _refresh(self):
+        """Recompute the running sums of every window from the buffer."""
+        for name in self.windows:
+            slots = np.arange(self._start[name], self._written) % self.capacity
+            self._sums[name] = _sample_sums(self._simulated[slots], self._measured[slots]).sum(axis=0)
+        self._since_refresh = 0
+
+    def update(self, timestamps, values):
+        """
+        Add measured samples and update every window, then check the drift thresholds.
+
+        Parameters
+        ----------
+        timestamps : datetime-like or array of datetime-like
+            Time of each sample, later than the previous samples and in increasing
+            order. Timestamps with a time zone are converted to UTC, the others are
+            shifted by `utc_offset_hours`, as the profiles are in UTC.
+        values : float or array of float
+            Measured capacity factors (NaN for missing samples).
+
+        Returns
+        -------
+        list of dict
+            Alerts raised or cleared by these samples (see :meth:`alert_log`).
+
+        Raises
+        ------
+        ValueError
+            If the samples are not in time order, or if the timestamps and values
+            have different lengths.
+        """
+        timestamps = np.atleast_1d(np.asarray([timestamps] if np.ndim(timestamps) == 0 else timestamps))
+        naive = True
+        if timestamps.dtype.kind != "M":
+            parsed = pd.DatetimeIndex(pd.to_datetime(timestamps))
+            naive = parsed.tz is None
+            timestamps = (parsed if naive else parsed.tz_convert("UTC").tz_localize(None)).to_numpy()
+        timestamps = timestamps.astype("datetime64[ns]")
+        if naive and self.utc_offset_hours:
+            timestamps = timestamps - np.timedelta64(int(round(self.utc_offset_hours * 3600)), "s")
+        times = timestamps.astype(np.int64)
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        if len(times) != len(values):
+            raise ValueError(f"{len(times)} timestamps for {len(values)} values.")
+        if len(times) == 0:
+            return []
+        if np.any(np.diff(times) <= 0) or (self._written and times[0] <= self._time[(self._written - 1) % self.capacity]):
+            raise ValueError("Samples must be added in increasing time order.")
+
+        # Hour of the year of each sample: row of the hourly profiles
+        rows = (timestamps - timestamps.astype("datetime64[Y]")) // np.timedelta64(1, "h")
+        simulated = self.simulated[np.minimum(rows, len(self.simulated) - 1)]
+
+        for begin in range(0, len(times), self.capacity):
+            end = min(begin + self.capacity, len(times))
+            # Samples about to be overwritten leave every window
+            overwritten = self._written + (end - begin) - self.capacity
+            for name in self.windows:
+                self._evict(name, min(overwritten, self._written))
+
+            slots = np.arange(self._written, self._written + end - begin) % self.capacity
+            self._time[slots] = times[begin:end]
+            self._simulated[slots] = simulated[begin:end]
+            self._measured[slots] = values[begin:end]
+            self._bins_buffer[slots] = self._bins(simulated[begin:end], values[begin:end])
+            self._written += end - begin
+            self._since_refresh += end - begin
+
+            added = _sample_sums(simulated[begin:end], values[begin:end]).sum(axis=0)
+            for name, length in self.windows.items():
+                self._apply(name, slots, 1, added)
+                self._evict(name, self._first_after(name, times[end - 1] - length.value))
+
+        if self._since_refresh >= self.capacity:
+            self._refresh()
+        return self._check_alerts()
+
+    def accumulator(self, window="24h") -> MetricAccumulator:
+        """
+        The statistics of a window as a :class:`MetricAccumulator` (e.g., to merge windows of several sites).
+
+        Raises
+        ------
+        ValueError
+            If the window is unknown.
+        """
+        if window not in self.windows:
+            raise ValueError(f"Unknown window '{window}', use one of {list(self.windows)}.")
+        count, s_sim, s_meas, s_abs, s_sq, s_sim2, s_meas2, s_cross = np.split(self._sums[window], 8)
+        accumulator = MetricAccumulator(self.series, **self._accumulator_options)
+        accumulator.count = np.rint(count).astype(np.int64)
+        safe_count = np.maximum(accumulator.count, 1)
+        accumulator.mean_sim = s_sim / safe_count
+        accumulator.mean_meas = s_meas / safe_count
+        accumulator.m2_sim = np.maximum(s_sim2 - s_sim * accumulator.mean_sim, 0.0)
+        accumulator.m2_meas = np.maximum(s_meas2 - s_meas * accumulator.mean_meas, 0.0)
+        accumulator.comoment = s_cross - s_sim * accumulator.mean_meas
+        accumulator.sum_abs = s_abs
+        accumulator.sum_sq = s_sq
+        accumulator.hist_sim = self._hist_sim[window].copy()
+        accumulator.hist_meas = self._hist_meas[window].copy()
+        accumulator.hist_error = self._hist_error[window].copy()
+        return accumulator
+
+    def _describe(self, window):
+        return pd.DataFrame(
+            {
+                "Location": self.location_name,
+                "Year": self.years,
+                "Tool": self.tools,
+                "Series": self.series,
+                "Window": window,
+            }
+        )
+
+    def metrics(self, window="24h", percentiles=(5, 50, 95)) -> pd.DataFrame:
+        """
+        Extended metrics of a window (see :meth:`MetricAccumulator.result`).
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per simulated column with `"Location"`, `"Year"`, `"Tool"`,
+            `"Series"`, `"Window"`, `"Samples"` (samples compared) and the metrics.
+        """
+        table = self.accumulator(window).result(percentiles).rename(columns={"Hours": "Samples"})
+        return pd.concat([self._describe(window), table.reset_index(drop=True)], axis=1)
+
+    def error_metrics(self, window="24h"):
+        """
+        Metrics of a window in the format of :func:`simeasren.calculate_error_metrics`.
+
+        Returns
+        -------
+        tuple of lists
+            `(mean_diff_results, mae_results, rmse_results)`, lists of dicts with
+            `"Location"`, `"Tool"` and the metric, e.g. for
+            :func:`simeasren.plot_error_metrics`.
+        """
+        if window not in self.windows:
+            raise ValueError(f"Unknown window '{window}', use one of {list(self.windows)}.")
+        metrics = _metrics_from_sums(self._sums[window])
+        return tuple(
+            [{"Location": self.location_name, "Tool": tool, name: value} for tool, value in zip(self.tools, metrics[name])]
+            for name in ("Mean Difference (%)", "MAE (%)", "RMSE (%)")
+        )
+
+    def snapshot(self) -> pd.DataFrame:
+        """Metrics of `BOOTSTRAP_METRICS` of every window and simulated column, as one tidy DataFrame."""
+        tables = []
+        for window in self.windows:
+            metrics = _metrics_from_sums(self._sums[window])
+            table = self._describe(window)
+            table["Samples"] = np.rint(self._sums[window][: len(self.series)]).astype(np.int64)
+            for name in BOOTSTRAP_METRICS:
+                table[name] = metrics[name]
+            tables.append(table)
+        return pd.concat(tables, ignore_index=True)
+
+    def _check_alerts(self):
+        """Raise or clear the alerts of every (window, series, metric) whose threshold state changed."""
+        if not self.thresholds:
+            return []
+        now = self.last_time
+        extended = [metric for metric in self.thresholds if metric not in BOOTSTRAP_METRICS]
+        # Extended metrics need the histograms of the windows: only checked every extended_check_samples samples
+        check_extended = bool(extended) and self._written - self._extended_checked >= self.extended_check_samples
+        if check_extended:
+            self._extended_checked = self._written
+        fired = []
+        for window in self.windows:
+            count = self._sums[window][: len(self.series)]
+            values = _metrics_from_sums(self._sums[window])
+            if check_extended:
+                table = self.metrics(window)
+                values.update({metric: table[metric].to_numpy() for metric in extended})
+            for metric, (lower, upper) in self.thresholds.items():
+                if metric not in values:
+                    continue
+                for j, series in enumerate(self.series):
+                    value = values[metric][j]
+                    if count[j] < self.min_samples or np.isnan(value):
+                        continue
+                    outside = (lower is not None and value < lower) or (upper is not None and value > upper)
+                    key = (window, series, metric)
+                    if outside == self._alert_state.get(key, False):
+                        continue
+                    self._alert_state[key] = outside
+                    alert = {
+                        "Time": now,
+                        "Location": self.location_name,
+                        "Tool": self.tools[j],
+                        "Series": series,
+                        "Window": window,
+                        "Metric": metric,
+                        "Value": float(value),
+                        "Lower": lower,
+                        "Upper": upper,
+                        "State": "raised" if outside else "cleared",
+                    }
+                    fired.append(alert)
+                    print(
+                        f"Drift alert {alert['State']} for {series} ({window}): {metric} = {value:.2f} "
+                        f"(bounds {lower}, {upper}) at {now}"
+                    )
+                    if self.on_alert is not None:
+                        self.on_alert(alert)
+        self.alerts.extend(fired)
+        return fired
+
+    def alert_log(self) -> pd.DataFrame:
+        """All alerts raised or cleared so far, one row per alert."""
+        return pd.DataFrame(
+            self.alerts,
+            columns=["Time", "Location", "Tool", "Series", "Window", "Metric", "Value", "Lower", "Upper", "State"],
+        )
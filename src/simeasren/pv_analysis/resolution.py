@@ -0,0 +1,310 @@
+import numpy as np
+import pandas as pd
+from ..series_catalog import select_series, find_measured_column
+from ..profiles import ProfileMatrix
+
+# ---------------------------- Intra-hour variability lost by hourly profiles -----------------------------
+
+
+def _hour_grid(highres, year, n_hours, step_seconds=None):
+    """
+    High-resolution samples placed on an (hours, samples per hour) array starting on January 1st of `year`.
+
+    Hour `h` of the array is the hour of row `h` of the hourly profiles (the hour
+    `h + 1` of the year of the measured data files). Missing samples are NaN.
+    """
+    timestamps = highres.index.values.astype("datetime64[s]")
+    if step_seconds is None:
+        spacing = np.diff(np.sort(timestamps)).astype(np.int64)
+        step_seconds = max(int(np.median(spacing)), 1) if len(spacing) else 3600
+    steps_per_hour = max(3600 // step_seconds, 1)
+
+    start = np.datetime64(f"{year}-01-01T00:00:00", "s")
+    position = (timestamps - start).astype(np.int64) // step_seconds
+    inside = (position >= 0) & (position < n_hours * steps_per_hour)
+
+    grid = np.full(n_hours * steps_per_hour, np.nan)
+    grid[position[inside]] = highres.to_numpy(dtype=np.float64)[inside]
+    return grid.reshape(n_hours, steps_per_hour), step_seconds
+
+
+def _ramps(values, minutes):
+    """Absolute ramps (% of capacity per minute) along axis 0, NaN at night (both ends zero) and for missing values."""
+    step = np.diff(values, axis=0, prepend=np.nan)
+    previous = np.concatenate([np.full((1,) + values.shape[1:], np.nan), values[:-1]])
+    with np.errstate(invalid="ignore"):
+        daylight = np.fmax(previous, values) > 0
+    return np.where(daylight, np.abs(step) * 100 / minutes, np.nan)
+
+
+def _by_day(values, n_days, fill=np.nan):
+    """Rows of `values` (one per hour or per sample) grouped per day: (days, rows per day, ...), padded with `fill`."""
+    rows_per_day = -(-len(values) // n_days)
+    padded = np.full((n_days * rows_per_day,) + values.shape[1:], fill)
+    padded[: len(values)] = values
+    return padded.reshape((n_days, rows_per_day) + values.shape[1:])
+
+
+def _nan_percentiles(values, percentiles):
+    """Percentiles along axis 1 ignoring NaN (linear interpolation), with one sort for all rows and percentiles."""
+    ordered = np.sort(values, axis=1)  # NaN last
+    count = (~np.isnan(values)).sum(axis=1)
+    last = np.maximum(count - 1, 0)
+    results = []
+    for percentile in percentiles:
+        position = percentile / 100 * last
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, last)
+        low_value = np.take_along_axis(ordered, low[:, None], axis=1)[:, 0]
+        high_value = np.take_along_axis(ordered, high[:, None], axis=1)[:, 0]
+        result = low_value + (position - low) * (high_value - low_value)
+        results.append(np.where(count > 0, result, np.nan))
+    return results
+
+
+def _hourly_sources(profiles, location_name, plot_palette, exclude_non_palette):
+    """Hourly measured column of the location followed by the simulated columns."""
+    catalog = profiles.catalog
+    meas_column = find_measured_column(catalog, location=location_name)
+    if meas_column is None:
+        raise ValueError(f"No measured data column found for {location_name}.")
+    palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+    sim_columns = select_series(catalog, location=location_name, tools=palette_tools, is_measured=False)
+    return meas_column, [meas_column] + list(sim_columns)
+
+
+def calculate_resolution_metrics(
+    data_sim_meas,
+    highres,
+    location_name,
+    year=None,
+    plot_palette=None,
+    exclude_non_palette=True,
+    min_coverage=0.5,
+    ramp_percentiles=(50, 95),
+) -> pd.DataFrame:
+    """
+    Daily metrics of the intra-hour variability lost by the hourly profiles.
+
+    The high-resolution measurements are placed on an (hours, samples per hour)
+    array aligned with the hourly profiles, so every statistic is a reduction along
+    one axis of this array or of its (days, samples per day) view, for all days and
+    all sources at once. A full year of 1-minute data takes well under a second.
+
+    For every hourly source (the hourly measured column and the simulated columns)
+    and every day, the hourly values are compared with the mean of the
+    high-resolution samples of the same hour (the hourly integral of the measured
+    output). The error against every high-resolution sample splits exactly into the
+    error on the hourly means and the within-hour variance of the measured output:
+    `RMSE vs high-res**2 = Hourly RMSE**2 + Within-hour std**2` (the hours being
+    weighted by their number of samples), so the within-hour standard deviation is
+    the lowest error an hourly profile can reach against high-resolution data.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly profiles of one year, starting on January 1st at 00:00 (e.g., the
+        first output of :func:`simeasren.prepare_pv_data_for_plots`).
+    highres : pandas.Series
+        High-resolution measured capacity factors on a regular time grid (e.g., the
+        output of :func:`simeasren.pv_measured.load_highres_measurements`).
+    location_name : str
+        Location of the profiles (e.g., `"Turin"`).
+    year : int or str, optional
+        Year of the profiles (default: the year of the hourly measured column).
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+    min_coverage : float, optional
+        Minimum share of valid high-resolution samples for an hour to be compared
+        (default 0.5).
+    ramp_percentiles : tuple of float, optional
+        Percentiles of the daylight ramp rates reported for each day (default the
+        median and the 95th percentile).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per source and day with data: `"Location"`, `"Year"`, `"Tool"`,
+        `"Series"`, `"Day"`, `"Hours"` (hours compared) and:
+
+        - `"Energy error (%)"`: error of the daily energy over the compared hours,
+          relative to the high-resolution energy;
+        - `"Hourly MAE (%)"`, `"Hourly RMSE (%)"`: errors of the hourly values
+          against the hourly means of the high-resolution samples;
+        - `"RMSE vs high-res (%)"`: error of the hourly values held over the hour
+          against every high-resolution sample;
+        - `"Within-hour std (%)"`: standard deviation of the high-resolution samples
+          around their hourly means;
+        - `"Max ramp (%/min)"` and `"Ramp P{q} (%/min)"`: largest and percentiles of
+          the absolute daylight ramp rates of the source.
+
+        The high-resolution series has its own rows, with its sample ramp rates and
+        within-hour standard deviation (its errors are NaN). All values are in % of
+        the capacity.
+
+    Raises
+    ------
+    ValueError
+        If no hourly measured column is found for the location.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_measured import load_highres_measurements
+    >>> from simeasren.pv_analysis import calculate_resolution_metrics
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> highres = load_highres_measurements("Turin", 2019)
+    >>> table = calculate_resolution_metrics(data_sim_meas, highres, "Turin")
+    >>> table.groupby("Tool")[["RMSE vs high-res (%)", "Within-hour std (%)", "Max ramp (%/min)"]].mean()
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    meas_column, sources = _hourly_sources(profiles, location_name, plot_palette, exclude_non_palette)
+    if year is None:
+        year = profiles.catalog.at[meas_column, "year"] or highres.index[0].year
+
+    n_hours = len(profiles)
+    n_days = -(-n_hours // 24)
+    grid, step_seconds = _hour_grid(highres, year, n_hours)
+    minutes = step_seconds / 60
+
+    # Hourly means and within-hour variances of the high-resolution samples
+    sample_valid = ~np.isnan(grid)
+    samples = sample_valid.sum(axis=1)
+    covered = samples >= max(min_coverage * grid.shape[1], 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hour_mean = np.where(covered, np.sum(grid, axis=1, where=sample_valid) / samples, np.nan)
+        deviation = np.where(sample_valid, grid - hour_mean[:, None], 0.0)
+        hour_var = np.where(covered, np.sum(deviation**2, axis=1) / samples, np.nan)
+
+    # Errors of the hourly sources on the compared hours, reduced per day
+    positions = [profiles.position(col) for col in sources]
+    hourly = np.where(profiles.valid[:, positions], profiles.values[:, positions], np.nan)
+    compared = ~np.isnan(hourly) & covered[:, None]
+    diff = np.where(compared, hourly - hour_mean[:, None], 0.0)
+    weights = np.where(compared, samples[:, None], 0)
+
+    hours = _by_day(compared, n_days, False).sum(axis=1)
+    sample_count = _by_day(weights, n_days, 0).sum(axis=1)
+    energy = _by_day(np.where(compared, hour_mean[:, None], 0.0), n_days, 0.0).sum(axis=1)
+    error_sum = _by_day(diff, n_days, 0.0).sum(axis=1)
+    abs_sum = _by_day(np.abs(diff), n_days, 0.0).sum(axis=1)
+    sq_sum = _by_day(diff**2, n_days, 0.0).sum(axis=1)
+    weighted_sq = _by_day(weights * diff**2, n_days, 0.0).sum(axis=1)
+    weighted_var = _by_day(weights * np.where(compared, hour_var[:, None], 0.0), n_days, 0.0).sum(axis=1)
+
+    # The high-resolution series itself: every covered hour
+    hr_hours = _by_day(covered, n_days, False).sum(axis=1)
+    hr_samples = _by_day(np.where(covered, samples, 0), n_days, 0).sum(axis=1)
+    hr_var = _by_day(np.where(covered, samples * hour_var, 0.0), n_days, 0.0).sum(axis=1)
+
+    # Daylight ramp rates per day: samples of the grid, hourly steps of the sources
+    percentiles = [100, *ramp_percentiles]
+    hr_ramps = _nan_percentiles(_by_day(_ramps(grid.ravel(), minutes), n_days), percentiles)
+    ramps = _nan_percentiles(_by_day(_ramps(hourly, 60), n_days), percentiles)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        metrics = {
+            "Energy error (%)": np.append(error_sum / energy, np.full((n_days, 1), np.nan), axis=1),
+            "Hourly MAE (%)": np.append(abs_sum / hours, np.full((n_days, 1), np.nan), axis=1),
+            "Hourly RMSE (%)": np.append(np.sqrt(sq_sum / hours), np.full((n_days, 1), np.nan), axis=1),
+            "RMSE vs high-res (%)": np.append(
+                np.sqrt((weighted_sq + weighted_var) / sample_count), np.full((n_days, 1), np.nan), axis=1
+            ),
+            "Within-hour std (%)": np.append(
+                np.sqrt(weighted_var / sample_count), np.sqrt(hr_var / hr_samples)[:, None], axis=1
+            ),
+        }
+    metrics = {name: values * 100 for name, values in metrics.items()}
+    for percentile, source_ramps, sample_ramps in zip(percentiles, ramps, hr_ramps):
+        name = "Max ramp (%/min)" if percentile == 100 else f"Ramp P{percentile:g} (%/min)"
+        metrics[name] = np.append(source_ramps, sample_ramps[:, None], axis=1)
+
+    # Tidy table of the (day, source) pairs with data
+    series = sources + [highres.name or f"{location_name}{year} PV-MEAS_high_resolution"]
+    count = np.append(hours, hr_hours[:, None], axis=1)
+    source_index, day_index = np.nonzero(count.T)
+    tools = [profiles.catalog.at[col, "tool"] for col in sources] + ["PV-MEAS_high_resolution"]
+    return pd.DataFrame(
+        {
+            "Location": location_name,
+            "Year": str(year),
+            "Tool": np.array(tools, dtype=object)[source_index],
+            "Series": np.array(series, dtype=object)[source_index],
+            "Day": pd.date_range(f"{year}-01-01", periods=n_days, freq="D")[day_index],
+            "Hours": count[day_index, source_index].astype(np.int64),
+            **{name: values[day_index, source_index] for name, values in metrics.items()},
+        }
+    )
+
+
+def ramp_rate_distributions(
+    data_sim_meas,
+    highres,
+    location_name,
+    year=None,
+    bin_width=0.1,
+    plot_palette=None,
+    exclude_non_palette=True,
+) -> pd.DataFrame:
+    """
+    Distributions of the absolute daylight ramp rates of the high-resolution series and of the hourly sources.
+
+    All ramps are expressed in % of the capacity per minute, so the hourly steps of
+    the simulated profiles and the sample-to-sample steps of the high-resolution
+    measurements share the same bins. The histograms of all sources are counted
+    with one `numpy.bincount`.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly profiles of one year, starting on January 1st at 00:00.
+    highres : pandas.Series
+        High-resolution measured capacity factors on a regular time grid.
+    location_name : str
+        Location of the profiles (e.g., `"Turin"`).
+    year : int or str, optional
+        Year of the profiles (default: the year of the hourly measured column).
+    bin_width : float, optional
+        Width of the bins in %/min (default 0.1).
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Share of the daylight steps of each series (columns) in each bin, indexed
+        by the lower edge of the bins (`"Ramp (%/min)"`). Each column sums to 1.
+
+    Examples
+    --------
+    >>> from simeasren.pv_analysis import ramp_rate_distributions
+    >>> shares = ramp_rate_distributions(data_sim_meas, highres, "Turin", bin_width=0.5)
+    >>> 1 - shares.cumsum()  # Exceedance of the ramp rates
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    meas_column, sources = _hourly_sources(profiles, location_name, plot_palette, exclude_non_palette)
+    if year is None:
+        year = profiles.catalog.at[meas_column, "year"] or highres.index[0].year
+
+    grid, step_seconds = _hour_grid(highres, year, len(profiles))
+    positions = [profiles.position(col) for col in sources]
+    hourly = np.where(profiles.valid[:, positions], profiles.values[:, positions], np.nan)
+    series = sources + [highres.name or f"{location_name}{year} PV-MEAS_high_resolution"]
+
+    # (ramp, series code) of every daylight step of every series
+    ramps = [_ramps(hourly, 60), _ramps(grid.ravel(), step_seconds / 60)[:, None]]
+    codes = [np.broadcast_to(np.arange(len(sources)), ramps[0].shape), np.full(ramps[1].shape, len(sources))]
+    ramps = np.concatenate([values.ravel() for values in ramps])
+    codes = np.concatenate([values.ravel() for values in codes])
+    keep = ~np.isnan(ramps)
+    bins = np.floor(ramps[keep] / bin_width).astype(np.int64)
+    n_bins = int(bins.max()) + 1 if len(bins) else 0
+
+    counts = np.bincount(bins * len(series) + codes[keep], minlength=n_bins * len(series)).reshape(n_bins, len(series))
+    with np.errstate(invalid="ignore"):
+        shares = counts / counts.sum(axis=0)
+    return pd.DataFrame(shares, columns=series, index=pd.Index(np.arange(n_bins) * bin_width, name="Ramp (%/min)"))
@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.spatial.distance import squareform
+from ..series_catalog import build_series_catalog, select_series
+from ..profiles import ProfileMatrix
+
+# ---------------------------- Pairwise similarity of the profiles -----------------------------
+
+SIMILARITY_METRICS = ["Correlation", "RMSE (%)", "Max abs difference (%)"]
+
+
+def _max_abs_differences(values, valid, max_memory_mb):
+    """Largest absolute difference of every pair of columns over their common hours, in blocks of columns."""
+    n_hours, n_columns = values.shape
+    block = max(1, int(max_memory_mb * 2**20 // (8 * max(n_hours, 1))))
+    result = np.zeros((n_columns, n_columns))
+    for i in range(n_columns):
+        for start in range(i + 1, n_columns, block):
+            end = min(start + block, n_columns)
+            diff = np.abs(values[:, start:end] - values[:, [i]])
+            both = valid[:, start:end] & valid[:, [i]]
+            result[i, start:end] = np.max(diff, axis=0, where=both, initial=0.0)
+    return result + result.T
+
+
+def similarity_matrices(
+    data_sim_meas,
+    columns=None,
+    location_name=None,
+    max_abs=True,
+    min_overlap=24,
+    max_memory_mb=256,
+) -> dict:
+    """
+    Pairwise correlation, RMSE and largest absolute difference of every pair of profiles.
+
+    The statistics are computed over the hours where both profiles are available,
+    from the masked 2-D array of the profiles: with `X` the values (0 where
+    missing) and `M` the validity mask, the products `X.T @ X`, `X.T @ M`,
+    `(X**2).T @ M` and `M.T @ M` give the cross sums, sums, sums of squares and
+    overlaps of all pairs at once. Without missing values only `X.T @ X` is needed.
+    The largest absolute difference is not a sum: it is computed by blocks of
+    columns (about `n_columns**2 * n_hours / 2` operations, set `max_abs=False` for
+    thousands of columns).
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly profiles, e.g. the merged data of several sites and years.
+    columns : list of str, optional
+        Profiles to compare (default: all hourly series of `location_name`,
+        measured and simulated).
+    location_name : str, optional
+        Only use the series of this location (default: all locations).
+    max_abs : bool, optional
+        Compute the largest absolute differences (default True).
+    min_overlap : int, optional
+        Pairs with fewer common hours are NaN (default 24).
+    max_memory_mb : float, optional
+        Memory of the blocks used for the largest absolute differences (default 256).
+
+    Returns
+    -------
+    dict of pandas.DataFrame
+        Square matrices indexed by the series: `"Correlation"` (Pearson),
+        `"RMSE (%)"`, `"Max abs difference (%)"` (if `max_abs`) and `"Overlap"`
+        (common hours).
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import similarity_matrices
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> matrices = similarity_matrices(data_sim_meas, location_name="Turin")
+    >>> matrices["RMSE (%)"].round(2)
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    if columns is None:
+        columns = select_series(profiles.catalog, location=location_name)
+    columns = list(columns)
+    positions = [profiles.position(col) for col in columns]
+    valid = profiles.valid[:, positions]
+    values = np.where(valid, profiles.values[:, positions], 0.0)
+
+    cross = values.T @ values
+    if valid.all():
+        n_hours = len(values)
+        overlap = np.full(cross.shape, n_hours)
+        sums = np.broadcast_to(values.sum(axis=0)[:, None], cross.shape)
+        squares = np.broadcast_to((values**2).sum(axis=0)[:, None], cross.shape)
+    else:
+        mask = valid.astype(np.float64)
+        overlap = np.rint(mask.T @ mask).astype(np.int64)
+        sums = values.T @ mask  # sums[i, j]: sum of column i over the hours common with column j
+        squares = (values**2).T @ mask
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        count = np.where(overlap >= max(min_overlap, 1), overlap, np.nan)
+        mean = sums / count
+        variance = squares / count - mean**2
+        covariance = cross / count - mean * mean.T
+        correlation = covariance / np.sqrt(np.maximum(variance, 0.0) * np.maximum(variance, 0.0).T)
+        rmse = np.sqrt(np.maximum(squares + squares.T - 2 * cross, 0.0) / count)
+    np.fill_diagonal(correlation, np.where(np.isnan(np.diag(count)), np.nan, 1.0))
+    np.fill_diagonal(rmse, np.where(np.isnan(np.diag(count)), np.nan, 0.0))
+
+    index = pd.Index(columns, name="Series")
+    matrices = {
+        "Correlation": pd.DataFrame(correlation, index=index, columns=columns),
+        "RMSE (%)": pd.DataFrame(rmse * 100, index=index, columns=columns),
+    }
+    if max_abs:
+        max_diff = _max_abs_differences(values, valid, max_memory_mb) * 100
+        matrices["Max abs difference (%)"] = pd.DataFrame(
+            np.where(np.isnan(count), np.nan, max_diff), index=index, columns=columns
+        )
+    matrices["Overlap"] = pd.DataFrame(overlap, index=index, columns=columns)
+    return matrices
+
+
+def cluster_sources(matrices, metric="RMSE (%)", threshold=1.0, n_clusters=None, method="average"):
+    """
+    Hierarchical clustering of the profiles, to find near-duplicate sources.
+
+    Parameters
+    ----------
+    matrices : dict of pandas.DataFrame
+        Output of :func:`similarity_matrices`.
+    metric : str, optional
+        Distance between profiles: `"RMSE (%)"` (default), `"Max abs difference (%)"`
+        or `"Correlation"` (distance `1 - r`). Pairs without enough common hours are
+        put at twice the largest distance.
+    threshold : float, optional
+        Profiles closer than this distance end up in the same cluster (default 1 %
+        RMSE). Not used if `n_clusters` is given.
+    n_clusters : int, optional
+        Number of clusters to form instead of a distance threshold.
+    method : str, optional
+        Linkage method of :func:`scipy.cluster.hierarchy.linkage` (default
+        `"average"`; `"complete"` keeps every pair of a cluster within the
+        threshold).
+
+    Returns
+    -------
+    tuple
+        `(clusters, linkage_matrix)`: a DataFrame with one row per profile
+        (`"Series"`, `"Location"`, `"Year"`, `"Tool"`, `"Cluster"`,
+        `"Representative"`, True for the profile of each cluster closest to the
+        others), sorted by cluster, and the linkage matrix (e.g., for
+        :func:`scipy.cluster.hierarchy.dendrogram`).
+
+    Raises
+    ------
+    ValueError
+        If the metric is not in `matrices`.
+
+    Examples
+    --------
+    >>> from simeasren.pv_analysis import similarity_matrices, cluster_sources
+    >>> matrices = similarity_matrices(data_sim_meas, location_name="Turin", max_abs=False)
+    >>> clusters, _ = cluster_sources(matrices, "RMSE (%)", threshold=2.0)
+    >>> clusters[clusters["Representative"]]  # One profile per cluster for the LP solves
+    """
+    if metric not in matrices or metric == "Overlap":
+        raise ValueError(f"Unknown metric '{metric}', use one of {[key for key in matrices if key != 'Overlap']}.")
+    matrix = matrices[metric]
+    series = matrix.index.tolist()
+    distance = 1 - matrix.to_numpy() if metric == "Correlation" else matrix.to_numpy().copy()
+    distance = np.maximum((distance + distance.T) / 2, 0.0)
+    largest = np.nanmax(distance, initial=0.0)
+    distance = np.where(np.isnan(distance), 2 * largest if largest > 0 else 1.0, distance)
+    np.fill_diagonal(distance, 0.0)
+
+    if len(series) < 2:
+        labels = np.ones(len(series), dtype=np.int64)
+        linkage_matrix = np.empty((0, 4))
+    else:
+        linkage_matrix = linkage(squareform(distance, checks=False), method=method)
+        if n_clusters is not None:
+            labels = fcluster(linkage_matrix, n_clusters, criterion="maxclust")
+        else:
+            labels = fcluster(linkage_matrix, threshold, criterion="distance")
+
+    # Representative: smallest total distance to the other members of its cluster
+    same = labels[:, None] == labels[None, :]
+    spread = np.where(same, distance, 0.0).sum(axis=1)
+    representative = np.zeros(len(series), dtype=bool)
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        representative[members[np.argmin(spread[members])]] = True
+
+    catalog = build_series_catalog(series)
+    clusters = pd.DataFrame(
+        {
+            "Series": series,
+            "Location": catalog["location"].to_numpy(dtype=object),
+            "Year": catalog["year"].to_numpy(dtype=object),
+            "Tool": catalog["tool"].to_numpy(dtype=object),
+            "Cluster": labels,
+            "Representative": representative,
+        }
+    )
+    return clusters.sort_values(["Cluster", "Series"], kind="stable", ignore_index=True), linkage_matrix
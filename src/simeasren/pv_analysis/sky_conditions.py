@@ -0,0 +1,274 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from ..series_catalog import select_series, find_measured_column
+from ..profiles import ProfileMatrix
+from .metrics import masked_error_metrics, _measured_pairs
+
+# ---------------------------- Daily sky conditions (clear / intermediate / cloudy days) -----------------------------
+
+SKY_CONDITIONS = ["clear", "intermediate", "cloudy"]
+
+
+def _day_index(profiles, columns, n_days):
+    """Dates of the days if the year of the series is known, else the day of the year (1-based)."""
+    years = profiles.catalog.loc[columns, "year"].dropna().unique()
+    if len(years) == 1 and years[0]:
+        return pd.date_range(f"{years[0]}-01-01", periods=n_days, freq="D", name="Day")
+    return pd.RangeIndex(1, n_days + 1, name="Day")
+
+
+def daily_sky_indices(data_sim_meas, columns=None, window_days=15, min_coverage=0.9):
+    """
+    Daily clear-sky index and variability score of every profile.
+
+    The clear-sky reference of each profile is its own upper envelope: for every
+    hour of the day, the highest value over a window of `window_days` days around
+    the day (the year wraps around). It follows the orientation, clipping and time
+    reference of each source without needing the site coordinates. For each day:
+
+    - the clear-sky index is the daily energy divided by the energy of the envelope
+      (close to 1 on clear days, close to 0 on overcast days);
+    - the variability score is the sum of the hour-to-hour changes of the profile
+      minus the scaled envelope, divided by the energy of the envelope (close to 0
+      when the day follows the clear-sky shape, high with broken clouds).
+
+    All days and profiles are computed at once on a (day, hour, series) array, in a
+    few milliseconds per site-year.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly profiles starting on January 1st at 00:00.
+    columns : list of str, optional
+        Profiles to use (default: all).
+    window_days : int, optional
+        Width of the window of the clear-sky envelope (default 15 days).
+    min_coverage : float, optional
+        Days with less than this share of their daylight hours available (default
+        0.9) get NaN indices.
+
+    Returns
+    -------
+    tuple of pandas.DataFrame
+        `(clear_sky_index, variability)`, each with one row per day (dates if the
+        year of the profiles is known) and one column per profile.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import daily_sky_indices
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> clear_sky_index, variability = daily_sky_indices(data_sim_meas)
+    >>> clear_sky_index.shape
+    (365, 8)
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    columns = profiles.columns if columns is None else list(columns)
+    n_days = len(profiles) // 24
+    positions = [profiles.position(col) for col in columns]
+    hourly = profiles.values[: n_days * 24, positions].reshape(n_days, 24, len(columns))
+    valid = ~np.isnan(hourly)
+
+    # Upper envelope per hour of the day over a window of days (NaN never wins the max)
+    half = window_days // 2
+    padded = np.concatenate([hourly[n_days - half:], hourly, hourly[:half]]) if half else hourly
+    envelope = sliding_window_view(np.where(np.isnan(padded), -np.inf, padded), 2 * half + 1, axis=0).max(axis=-1)
+    envelope[np.isinf(envelope)] = 0.0
+
+    daylight = envelope > 0
+    energy = np.where(valid, hourly, 0.0).sum(axis=1)
+    clear_energy = np.where(valid, envelope, 0.0).sum(axis=1)
+    coverage = (valid & daylight).sum(axis=1) / np.maximum(daylight.sum(axis=1), 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        index = energy / clear_energy
+        index[(coverage < min_coverage) | (clear_energy <= 0)] = np.nan
+        residual = np.where(valid, hourly - index[:, None, :] * envelope, 0.0)
+        variability = np.abs(np.diff(residual, axis=1)).sum(axis=1) / clear_energy
+    variability[np.isnan(index)] = np.nan
+
+    days = _day_index(profiles, columns, n_days)
+    return (
+        pd.DataFrame(index, index=days, columns=columns),
+        pd.DataFrame(variability, index=days, columns=columns),
+    )
+
+
+def classify_days(clear_sky_index, variability, clear_index=0.85, max_clear_variability=0.05, cloudy_index=0.3):
+    """
+    Label days as `"clear"`, `"intermediate"` or `"cloudy"`.
+
+    Parameters
+    ----------
+    clear_sky_index, variability : pandas.DataFrame or pandas.Series
+        Outputs of :func:`daily_sky_indices`.
+    clear_index : float, optional
+        Minimum clear-sky index of a clear day (default 0.85).
+    max_clear_variability : float, optional
+        Maximum variability score of a clear day (default 0.05).
+    cloudy_index : float, optional
+        Maximum clear-sky index of a cloudy day (default 0.3).
+
+    Returns
+    -------
+    pandas.DataFrame or pandas.Series
+        Labels with the same shape as the inputs (None for days without indices).
+    """
+    labels = np.select(
+        [
+            clear_sky_index.isna().to_numpy(),
+            ((clear_sky_index >= clear_index) & (variability <= max_clear_variability)).to_numpy(),
+            (clear_sky_index <= cloudy_index).to_numpy(),
+        ],
+        [None, "clear", "cloudy"],
+        default="intermediate",
+    )
+    if isinstance(clear_sky_index, pd.Series):
+        return pd.Series(labels, index=clear_sky_index.index, name=clear_sky_index.name)
+    return pd.DataFrame(labels, index=clear_sky_index.index, columns=clear_sky_index.columns)
+
+
+def rank_days(data_sim_meas, location_name, condition="clear", n_days=5, **index_options):
+    """
+    Rank the days of the measured profile from the clearest or from the cloudiest.
+
+    Clear days are ranked by clear-sky index minus variability score, cloudy days by
+    increasing clear-sky index.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly profiles with one `"PV-MEAS"` column for the location.
+    location_name : str
+        Location of the measured profile (e.g., `"Turin"`).
+    condition : {"clear", "cloudy"}, optional
+        Which end of the ranking to return (default `"clear"`).
+    n_days : int, optional
+        Number of days returned (default 5).
+    **index_options
+        Options of :func:`daily_sky_indices`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The `n_days` best days (index) with their `"Clear-sky index"` and
+        `"Variability"`.
+
+    Raises
+    ------
+    ValueError
+        If no measured column is found, or `condition` is unknown.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import rank_days
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> cloudiest_days = rank_days(data_sim_meas, "Turin", "cloudy", n_days=3)
+    """
+    if condition not in ("clear", "cloudy"):
+        raise ValueError(f"condition must be 'clear' or 'cloudy', got '{condition}'")
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    meas_column = find_measured_column(profiles.catalog, location=location_name)
+    if meas_column is None:
+        raise ValueError(f"No measured data column found for {location_name}.")
+
+    clear_sky_index, variability = daily_sky_indices(profiles, [meas_column], **index_options)
+    days = pd.DataFrame(
+        {"Clear-sky index": clear_sky_index[meas_column], "Variability": variability[meas_column]}
+    ).dropna()
+    score = days["Clear-sky index"] - days["Variability"] if condition == "clear" else -days["Clear-sky index"]
+    return days.loc[score.sort_values(ascending=False, kind="stable").index[:n_days]]
+
+
+def calculate_error_metrics_by_sky_condition(
+    data_sim_meas,
+    location_name,
+    plot_palette=None,
+    exclude_non_palette=True,
+    **classify_options,
+):
+    """
+    Error metrics of :func:`simeasren.calculate_error_metrics` per sky condition.
+
+    Days are classified from the measured profile of each simulated profile's year
+    (see :func:`classify_days`) and the mean difference, MAE and RMSE of every
+    simulated profile are computed over the hours of the clear, intermediate and
+    cloudy days with
+    :func:`simeasren.pv_analysis.metrics.masked_error_metrics` (one masked pass per
+    condition).
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly measured and simulated profiles.
+    location_name : str
+        Location of the profiles (e.g., `"Turin"`).
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+    **classify_options
+        Thresholds passed to :func:`classify_days`.
+
+    Returns
+    -------
+    tuple of lists
+        `(mean_diff_results, mae_results, rmse_results)` as returned by
+        :func:`simeasren.calculate_error_metrics`, each dictionary having an extra
+        `"Sky condition"` key and `"Days"` (number of days of the condition).
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import calculate_error_metrics_by_sky_condition
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> mean_diff, mae, rmse = calculate_error_metrics_by_sky_condition(data_sim_meas, "Turin")
+    """
+    mean_diff_results, mae_results, rmse_results = [], [], []
+
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    catalog = profiles.catalog
+    if find_measured_column(catalog, location=location_name) is None:
+        print(f"'PV-MEAS' column missing for {location_name}")
+        return mean_diff_results, mae_results, rmse_results
+
+    palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+    pairs = _measured_pairs(catalog, select_series(catalog, location=location_name, tools=palette_tools, is_measured=False))
+    sim_columns = list(pairs)
+    meas_columns = list(dict.fromkeys(pairs.values()))
+
+    # Days classified from each measured column, applied to the simulated columns of its year
+    clear_sky_index, variability = daily_sky_indices(profiles, meas_columns)
+    day_labels = {
+        col: classify_days(clear_sky_index[col], variability[col], **classify_options).to_numpy() for col in meas_columns
+    }
+    # Condition of every hour as an index in SKY_CONDITIONS (-1: not classified), one column per measured column
+    hour_codes = np.full((len(profiles), len(meas_columns)), -1, dtype=np.int8)
+    for j, col in enumerate(meas_columns):
+        labels = day_labels[col]
+        codes = np.select([labels == condition for condition in SKY_CONDITIONS], range(len(SKY_CONDITIONS)), -1)
+        hour_codes[: len(labels) * 24, j] = np.repeat(codes, 24)
+    hour_codes = hour_codes[:, [meas_columns.index(pairs[col]) for col in sim_columns]]
+
+    positions = [profiles.position(col) for col in sim_columns]
+    meas_positions = [profiles.position(pairs[col]) for col in sim_columns]
+    simulated = profiles.values[:, positions]
+    measured = profiles.values[:, meas_positions]
+    valid = profiles.valid[:, positions] & profiles.valid[:, meas_positions]
+
+    for code, condition in enumerate(SKY_CONDITIONS):
+        count, mean_diff, mae, rmse = masked_error_metrics(simulated, measured, valid & (hour_codes == code))
+
+        for i, sim_col in enumerate(sim_columns):
+            if count[i] == 0:
+                continue
+            n_condition_days = int((day_labels[pairs[sim_col]] == condition).sum())
+            entry = {"Location": location_name, "Tool": catalog.at[sim_col, "tool"], "Sky condition": condition,
+                     "Days": n_condition_days}
+            mean_diff_results.append({**entry, "Mean Difference (%)": mean_diff[i]})
+            mae_results.append({**entry, "MAE (%)": mae[i]})
+            rmse_results.append({**entry, "RMSE (%)": rmse[i]})
+
+    return mean_diff_results, mae_results, rmse_results
@@ -0,0 +1,379 @@
+import numpy as np
+import pandas as pd
+from ..series_catalog import build_series_catalog, select_series
+from ..profiles import ProfileMatrix
+from .metrics import _measured_pairs
+from .chunked import _chunk_rows, _read_blocks, _memory_trace
+
+# ---------------------------- Single-pass extended error metrics -----------------------------
+
+
+class MetricAccumulator:
+    """
+    Running statistics of (simulated, measured) pairs, updated block by block.
+
+    One pass over the data gives the full metric suite of :meth:`result`. Moments
+    are combined with the pairwise update of Chan et al. (the block version of
+    Welford's algorithm), so they stay accurate over long series. Distributions are
+    kept as fixed-bin histograms of the errors and of the values, which are exact
+    mergeable sketches: percentiles and the Kolmogorov-Smirnov distance are read from
+    them with an error of at most half a bin width (about 260 kB per pair with the
+    default bins). Accumulators of different blocks, files
+    or worker processes are combined with :meth:`merge` (they can be pickled).
+
+    Parameters
+    ----------
+    labels : list of str
+        Name of each pair (e.g., the simulated column names).
+    value_range : tuple of float, optional
+        Range of the value histograms (default `(0, 1.5)`, normalized power).
+        Values outside the range are counted in the first or last bin.
+    error_range : tuple of float, optional
+        Range of the error histogram (default `(-1.5, 1.5)`).
+    value_bin_width : float, optional
+        Width of the bins of the value histograms (default 1e-4), used for the
+        Kolmogorov-Smirnov distance.
+    error_bin_width : float, optional
+        Width of the bins of the error histogram (default 0.001, i.e. 0.1 % error
+        percentiles).
+
+    Examples
+    --------
+    >>> from simeasren.pv_analysis import MetricAccumulator
+    >>> accumulator = MetricAccumulator(["PG3-SARAH3"])
+    >>> for simulated, measured in blocks:  # Arrays of shape (hours, 1)
+    ...     accumulator.update(simulated, measured)
+    >>> accumulator.result()["RMSE (%)"]
+    """
+
+    def __init__(
+        self, labels, value_range=(0.0, 1.5), error_range=(-1.5, 1.5), value_bin_width=1e-4, error_bin_width=1e-3
+    ):
+        self.labels = list(labels)
+        self.value_range = tuple(value_range)
+        self.error_range = tuple(error_range)
+        self.value_bin_width = value_bin_width
+        self.error_bin_width = error_bin_width
+
+        n_pairs = len(self.labels)
+        self.count = np.zeros(n_pairs, dtype=np.int64)
+        self.mean_sim = np.zeros(n_pairs)
+        self.mean_meas = np.zeros(n_pairs)
+        self.m2_sim = np.zeros(n_pairs)
+        self.m2_meas = np.zeros(n_pairs)
+        self.comoment = np.zeros(n_pairs)
+        self.sum_abs = np.zeros(n_pairs)
+        self.sum_sq = np.zeros(n_pairs)
+
+        # Bins centred on multiples of the bin width, so exact zeros (night hours) sit in the middle of a bin
+        self._n_value_bins = int(round((value_range[1] - value_range[0]) / value_bin_width)) + 1
+        self._n_error_bins = int(round((error_range[1] - error_range[0]) / error_bin_width)) + 1
+        self.hist_sim = np.zeros((n_pairs, self._n_value_bins), dtype=np.int64)
+        self.hist_meas = np.zeros((n_pairs, self._n_value_bins), dtype=np.int64)
+        self.hist_error = np.zeros((n_pairs, self._n_error_bins), dtype=np.int64)
+
+    def __repr__(self):
+        return f"<MetricAccumulator pairs={len(self.labels)} hours={int(self.count.sum())}>"
+
+    @staticmethod
+    def _histogram(values, valid, lower, width, n_bins):
+        """Counts per (pair, bin) with one bincount over all pairs."""
+        bins = np.clip(np.floor((values - lower) / width + 0.5).astype(np.int64), 0, n_bins - 1)
+        flat = (bins + np.arange(values.shape[1]) * n_bins)[valid]
+        return np.bincount(flat, minlength=values.shape[1] * n_bins).reshape(values.shape[1], n_bins)
+
+    def update(self, simulated, measured, valid=None):
+        """
+        Add a block of hours.
+
+        Parameters
+        ----------
+        simulated : numpy.ndarray
+            Array of shape (hours, pairs).
+        measured : numpy.ndarray
+            Array of shape (hours, pairs) or (hours, 1).
+        valid : numpy.ndarray, optional
+            Boolean mask of the hours to use. By default the hours where both
+            values are available.
+        """
+        simulated = np.asarray(simulated, dtype=np.float64)
+        measured = np.broadcast_to(np.asarray(measured, dtype=np.float64), simulated.shape)
+        if valid is None:
+            valid = ~np.isnan(simulated) & ~np.isnan(measured)
+        simulated = np.where(valid, simulated, 0.0)
+        measured = np.where(valid, measured, 0.0)
+
+        # Moments of the block
+        n_block = valid.sum(axis=0)
+        safe_n = np.maximum(n_block, 1)
+        mean_sim = simulated.sum(axis=0) / safe_n
+        mean_meas = measured.sum(axis=0) / safe_n
+        dev_sim = np.where(valid, simulated - mean_sim, 0.0)
+        dev_meas = np.where(valid, measured - mean_meas, 0.0)
+        diff = simulated - measured
+
+        # Combine with the running moments (Chan et al.)
+        total = self.count + n_block
+        safe_total = np.maximum(total, 1)
+        delta_sim = mean_sim - self.mean_sim
+        delta_meas = mean_meas - self.mean_meas
+        weight = self.count * n_block / safe_total
+        self.mean_sim += delta_sim * n_block / safe_total
+        self.mean_meas += delta_meas * n_block / safe_total
+        self.m2_sim += (dev_sim**2).sum(axis=0) + delta_sim**2 * weight
+        self.m2_meas += (dev_meas**2).sum(axis=0) + delta_meas**2 * weight
+        self.comoment += (dev_sim * dev_meas).sum(axis=0) + delta_sim * delta_meas * weight
+        self.sum_abs += np.abs(diff).sum(axis=0)
+        self.sum_sq += (diff**2).sum(axis=0)
+        self.count = total
+
+        value_bins = (self.value_range[0], self.value_bin_width, self._n_value_bins)
+        self.hist_sim += self._histogram(simulated, valid, *value_bins)
+        self.hist_meas += self._histogram(measured, valid, *value_bins)
+        self.hist_error += self._histogram(diff, valid, self.error_range[0], self.error_bin_width, self._n_error_bins)
+        return self
+
+    def merge(self, other):
+        """
+        Add the statistics of another accumulator over the same pairs (e.g., another
+        file or worker). Returns this accumulator.
+
+        Raises
+        ------
+        ValueError
+            If the pairs or histogram settings differ.
+        """
+        if (
+            other.labels != self.labels
+            or other.value_range != self.value_range
+            or other.error_range != self.error_range
+            or other.value_bin_width != self.value_bin_width
+            or other.error_bin_width != self.error_bin_width
+        ):
+            raise ValueError("Only accumulators with the same pairs and histogram settings can be merged.")
+
+        total = self.count + other.count
+        safe_total = np.maximum(total, 1)
+        delta_sim = other.mean_sim - self.mean_sim
+        delta_meas = other.mean_meas - self.mean_meas
+        weight = self.count * other.count / safe_total
+        self.mean_sim += delta_sim * other.count / safe_total
+        self.mean_meas += delta_meas * other.count / safe_total
+        self.m2_sim += other.m2_sim + delta_sim**2 * weight
+        self.m2_meas += other.m2_meas + delta_meas**2 * weight
+        self.comoment += other.comoment + delta_sim * delta_meas * weight
+        self.sum_abs += other.sum_abs
+        self.sum_sq += other.sum_sq
+        self.count = total
+        self.hist_sim += other.hist_sim
+        self.hist_meas += other.hist_meas
+        self.hist_error += other.hist_error
+        return self
+
+    def _percentiles(self, percentiles):
+        """Error percentiles from the histogram (centre of the bin holding each percentile)."""
+        cumulative = np.cumsum(self.hist_error, axis=1)
+        targets = np.asarray(percentiles, dtype=np.float64)[None, :] / 100 * self.count[:, None]
+        bins = np.empty(targets.shape, dtype=np.int64)
+        for i in range(len(self.labels)):
+            bins[i] = np.searchsorted(cumulative[i], targets[i], side="left")
+        results = self.error_range[0] + np.minimum(bins, self._n_error_bins - 1) * self.error_bin_width
+        results[self.count == 0] = np.nan
+        return results
+
+    def result(self, percentiles=(5, 50, 95)) -> pd.DataFrame:
+        """
+        Metric suite of every pair.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per pair (index: the labels) with the columns:
+
+            - `"Hours"`: number of hours compared;
+            - `"Mean Difference (%)"`, `"MAE (%)"`, `"RMSE (%)"`: as in
+              :func:`simeasren.calculate_error_metrics`;
+            - `"nMBE (%)"`, `"nRMSE (%)"`: mean difference and RMSE relative to the mean
+              measured value;
+            - `"R2"`: coefficient of determination of the simulated values as
+              predictions of the measured ones;
+            - `"Pearson r"`: correlation coefficient;
+            - `"KS distance"`: largest gap between the distributions of the simulated
+              and measured values;
+            - `"Energy yield ratio"`: simulated over measured energy;
+            - `"Error P5 (%)"`, ...: percentiles of the hourly error (simulated - measured).
+        """
+        count = self.count.astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_diff = self.mean_sim - self.mean_meas
+            rmse = np.sqrt(self.sum_sq / count)
+            cdf_sim = np.cumsum(self.hist_sim, axis=1) / count[:, None]
+            cdf_meas = np.cumsum(self.hist_meas, axis=1) / count[:, None]
+            table = pd.DataFrame(
+                {
+                    "Hours": self.count,
+                    "Mean Difference (%)": mean_diff * 100,
+                    "MAE (%)": self.sum_abs / count * 100,
+                    "RMSE (%)": rmse * 100,
+                    "nMBE (%)": mean_diff / self.mean_meas * 100,
+                    "nRMSE (%)": rmse / self.mean_meas * 100,
+                    "R2": 1 - self.sum_sq / self.m2_meas,
+                    "Pearson r": self.comoment / np.sqrt(self.m2_sim * self.m2_meas),
+                    "KS distance": np.abs(cdf_sim - cdf_meas).max(axis=1),
+                    "Energy yield ratio": self.mean_sim / self.mean_meas,
+                },
+                index=pd.Index(self.labels, name="Series"),
+            )
+        for j, value in enumerate(self._percentiles(percentiles).T):
+            table[f"Error P{percentiles[j]:g} (%)"] = value * 100
+        table.loc[table["Hours"] == 0, table.columns[1:]] = np.nan
+        return table
+
+
+def _describe_pairs(catalog, pairs, table):
+    """Add the location, year, tool and measured series of each pair in front of the metrics."""
+    series = table.index.tolist()
+    described = pd.DataFrame(
+        {
+            "Location": catalog.loc[series, "location"].to_numpy(dtype=object),
+            "Year": catalog.loc[series, "year"].to_numpy(dtype=object),
+            "Tool": catalog.loc[series, "tool"].to_numpy(dtype=object),
+            "Series": series,
+            "Measured series": [pairs[col] for col in series],
+        }
+    )
+    return pd.concat([described, table.reset_index(drop=True)], axis=1)
+
+
+def calculate_extended_metrics(
+    data_sim_meas,
+    location_name=None,
+    plot_palette=None,
+    exclude_non_palette=True,
+    percentiles=(5, 50, 95),
+    **accumulator_options,
+) -> pd.DataFrame:
+    """
+    Extended error metrics of all simulated columns, in one pass over the data.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Measured and simulated PV data. Simulated columns are paired with measured
+        columns as in :func:`simeasren.calculate_error_metrics_table`.
+    location_name : str, optional
+        Only use this location (default: all locations).
+    plot_palette : dict, optional
+        Dictionary mapping simulation tool names to colors.
+    exclude_non_palette : bool, optional (default=True)
+        If True, only simulation tools listed in `plot_palette` are included.
+    percentiles : tuple of float, optional
+        Percentiles of the hourly error to report (default 5, 50 and 95).
+    **accumulator_options
+        Histogram settings of :class:`MetricAccumulator`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per simulated column with `"Location"`, `"Year"`, `"Tool"`,
+        `"Series"`, `"Measured series"` and the metrics of
+        :meth:`MetricAccumulator.result`.
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots
+    >>> from simeasren.pv_analysis import calculate_extended_metrics
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> calculate_extended_metrics(data_sim_meas, "Turin")[["Tool", "nRMSE (%)", "R2", "KS distance"]]
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    catalog = profiles.catalog
+    palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+    pairs = _measured_pairs(catalog, select_series(catalog, location=location_name, tools=palette_tools, is_measured=False))
+
+    accumulator = MetricAccumulator(list(pairs), **accumulator_options)
+    sim_positions = [profiles.position(col) for col in pairs]
+    meas_positions = [profiles.position(col) for col in pairs.values()]
+    accumulator.update(
+        profiles.values[:, sim_positions],
+        profiles.values[:, meas_positions],
+        profiles.valid[:, sim_positions] & profiles.valid[:, meas_positions],
+    )
+    return _describe_pairs(catalog, pairs, accumulator.result(percentiles))
+
+
+def calculate_extended_metrics_chunked(
+    file_path,
+    location_name=None,
+    year=None,
+    plot_palette=None,
+    exclude_non_palette=True,
+    percentiles=(5, 50, 95),
+    max_rows=None,
+    max_memory_mb=256,
+    chunksize=None,
+    return_accumulator=False,
+    **accumulator_options,
+):
+    """
+    Extended error metrics of :func:`calculate_extended_metrics`, read block by block from a CSV file.
+
+    Only the accumulator (a few histograms per pair) is kept between blocks, so
+    files larger than memory can be processed. With `return_accumulator=True` the
+    accumulator is returned as well, to be merged with the ones of other files or
+    workers (:meth:`MetricAccumulator.merge`).
+
+    Parameters
+    ----------
+    file_path : str
+        CSV file with measured and simulated series, e.g. the file written by
+        :func:`simeasren.merge_sim_with_measured`.
+    location_name : str, optional
+        Only use this location (default: all locations).
+    year : str, optional
+        Only use series of this year.
+    plot_palette, exclude_non_palette, percentiles, **accumulator_options
+        See :func:`calculate_extended_metrics`.
+    max_rows, max_memory_mb, chunksize
+        See :func:`simeasren.pv_analysis.chunked.calculate_error_metrics_chunked`.
+    return_accumulator : bool, optional
+        If True, return `(table, accumulator, report)` instead of `(table, report)`.
+
+    Returns
+    -------
+    tuple
+        `(table, report)`: the metrics as in :func:`calculate_extended_metrics`, and a
+        dict with the keys `"rows"`, `"blocks"`, `"chunksize"` and `"peak_memory_mb"`.
+
+    Examples
+    --------
+    >>> from simeasren.pv_analysis import calculate_extended_metrics_chunked
+    >>> table, report = calculate_extended_metrics_chunked(
+    ...     "results/Turin/simulated_PV/Turin_meas_sim.csv", "Turin", year="2019", chunksize=1000
+    ... )
+    """
+    catalog = build_series_catalog(pd.read_csv(file_path, nrows=0).columns)
+    palette_tools = plot_palette.keys() if exclude_non_palette and plot_palette is not None else None
+    pairs = _measured_pairs(
+        catalog, select_series(catalog, location=location_name, year=year, tools=palette_tools, is_measured=False)
+    )
+    sim_columns = list(pairs)
+    meas_columns = list(pairs.values())
+    used_columns = list(dict.fromkeys(sim_columns + meas_columns))
+
+    accumulator = MetricAccumulator(sim_columns, **accumulator_options)
+    chunk_rows = _chunk_rows(len(used_columns), max_memory_mb, chunksize)
+    n_rows = 0
+    n_blocks = 0
+
+    with _memory_trace() as trace:
+        for block in _read_blocks(file_path, used_columns, chunk_rows, max_rows):
+            n_rows += len(block)
+            n_blocks += 1
+            block = block.apply(pd.to_numeric, errors="coerce")
+            accumulator.update(block[sim_columns].to_numpy(np.float64), block[meas_columns].to_numpy(np.float64))
+
+    report = {"rows": n_rows, "blocks": n_blocks, "chunksize": chunk_rows, **trace}
+    print(f"Extended metrics computed over {n_rows} rows in {n_blocks} blocks of {chunk_rows} rows (peak memory: {report['peak_memory_mb']} MB)")
+    table = _describe_pairs(catalog, pairs, accumulator.result(percentiles))
+    return (table, accumulator, report) if return_accumulator else (table, report)
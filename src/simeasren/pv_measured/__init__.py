@@ -0,0 +1,10 @@
+from .readers import read_measured_sheet, clear_sheet_cache
+from .highres import ingest_highres_measurements, load_highres_measurements, aggregate_to_hourly, highres_day
+from .quality import (solar_elevation, flag_measured_series, fill_gaps, clean_measured_series, clean_measured_profiles,
+                      QUALITY_FLAGS)
+from .inverters import normalize_inverter_data, measured_columns
+
+__all__ = ["read_measured_sheet", "clear_sheet_cache", "ingest_highres_measurements", "load_highres_measurements",
+           "aggregate_to_hourly", "highres_day", "solar_elevation", "flag_measured_series", "fill_gaps",
+           "clean_measured_series", "clean_measured_profiles", "QUALITY_FLAGS",
+           "normalize_inverter_data", "measured_columns"]
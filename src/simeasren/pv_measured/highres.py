@@ -0,0 +1,262 @@
+import os
+import numpy as np
+import pandas as pd
+
+# ---------------------------- Full-year high-resolution measured data -----------------------------
+
+
+def _highres_path(location_name, year, output_dir):
+    return os.path.join(output_dir, location_name, "measured_PV", f"{location_name}{year}_high_resolution.npz")
+
+
+def ingest_highres_measurements(
+    location_name: str,
+    year,
+    timestamps,
+    values,
+    step_seconds: int = 60,
+    output_dir="results",
+):
+    """
+    Store a full year of high-resolution measured PV data in a compact file.
+
+    The samples are placed on a regular grid starting on January 1st of `year`
+    (one slot per `step_seconds`), missing slots are kept as NaN, and only the
+    float32 values plus the grid start and step are written. A year of 1-minute data
+    (525,600 samples) takes about 2 MB.
+
+    Parameters
+    ----------
+    location_name : str
+        Name of the location/site (e.g., `"Turin"`).
+    year : str or int
+        Year of the measurements (e.g., `"2019"`). Samples outside this year are ignored.
+    timestamps : array-like of datetime
+        Timestamp of each sample (e.g., the `"DATE_TIME"` or `"Time UTC"` column).
+        Each sample is assigned to the grid slot that contains it; several samples
+        in the same slot are averaged (NaN samples are ignored).
+    values : array-like of float
+        Normalized PV power of each sample (0-1).
+    step_seconds : int, optional
+        Resolution of the grid in seconds (default 60, i.e. 1-minute data).
+    output_dir : str, optional
+        Root directory of the results (default `"results"`).
+
+    Returns
+    -------
+    str
+        Path of the written file:
+        ```
+        {output_dir}/{location_name}/measured_PV/{location_name}{year}_high_resolution.npz
+        ```
+
+    Raises
+    ------
+    ValueError
+        If `timestamps` and `values` do not have the same length.
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> from simeasren.pv_measured import ingest_highres_measurements
+    >>> raw = pd.read_csv("Turin2019_inverter_1min.csv", parse_dates=["DATE_TIME"])
+    >>> ingest_highres_measurements("Turin", 2019, raw["DATE_TIME"], raw["Normalized power"])
+    'results/Turin/measured_PV/Turin2019_high_resolution.npz'
+    """
+    timestamps = pd.to_datetime(np.asarray(timestamps)).values.astype("datetime64[s]")
+    values = np.asarray(values, dtype=np.float32)
+    if len(timestamps) != len(values):
+        raise ValueError("timestamps and values must have the same length.")
+
+    start = np.datetime64(f"{int(year)}-01-01T00:00:00", "s")
+    end = np.datetime64(f"{int(year) + 1}-01-01T00:00:00", "s")
+    n_steps = int((end - start) // np.timedelta64(step_seconds, "s"))
+
+    # Grid slot of each sample, samples outside the year or without a value are dropped
+    slots = (timestamps - start) // np.timedelta64(step_seconds, "s")
+    kept = (slots >= 0) & (slots < n_steps) & np.isfinite(values)
+    slots = slots[kept].astype(np.int64)
+
+    # Average the samples that fall in the same slot
+    sums = np.bincount(slots, weights=values[kept], minlength=n_steps)
+    counts = np.bincount(slots, minlength=n_steps)
+    grid = np.full(n_steps, np.nan, dtype=np.float32)
+    filled = counts > 0
+    grid[filled] = sums[filled] / counts[filled]
+
+    out_path = _highres_path(location_name, year, output_dir)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    np.savez_compressed(out_path, values=grid, start=str(start), step_seconds=step_seconds)
+
+    print(f"High-resolution data for {location_name}{year} saved at '{out_path}'")
+    return out_path
+
+
+def load_highres_measurements(location_name: str, year, output_dir="results") -> pd.Series:
+    """
+    Load a high-resolution measured series stored by :func:`ingest_highres_measurements`.
+
+    Parameters
+    ----------
+    location_name : str
+        Name of the location/site (e.g., `"Turin"`).
+    year : str or int
+        Year of the measurements.
+    output_dir : str, optional
+        Root directory of the results (default `"results"`).
+
+    Returns
+    -------
+    pandas.Series
+        float32 series named `"{location_name}{year} PV-MEAS_high_resolution"`, indexed
+        by the regular timestamps of the grid, with NaN where no sample was measured.
+
+    Raises
+    ------
+    FileNotFoundError
+        If no high-resolution data was ingested for this location and year.
+    """
+    path = _highres_path(location_name, year, output_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"High-resolution measured data not found: {path}")
+
+    with np.load(path) as stored:
+        values = stored["values"]
+        start = pd.Timestamp(str(stored["start"]))
+        step_seconds = int(stored["step_seconds"])
+
+    index = pd.date_range(start, periods=len(values), freq=pd.Timedelta(seconds=step_seconds))
+    return pd.Series(values, index=index, name=f"{location_name}{year} PV-MEAS_high_resolution")
+
+
+def aggregate_to_hourly(highres: pd.Series, min_coverage: float = 0.5, step_seconds=None) -> pd.Series:
+    """
+    Average a high-resolution series to hourly values.
+
+    Samples are binned per clock hour with a single ``np.add.reduceat`` over the
+    sorted timestamps, so missing rows and NaN samples are handled without any
+    per-hour Python loop.
+
+    Parameters
+    ----------
+    highres : pandas.Series
+        High-resolution values indexed by timestamps (e.g., the output of
+        :func:`load_highres_measurements`). Gaps can be missing rows or NaN values.
+    min_coverage : float, optional
+        Minimum share of valid samples in an hour (default 0.5). Hours below this
+        coverage are set to NaN instead of being averaged over too few samples.
+    step_seconds : int, optional
+        Nominal sampling step used to count the expected samples per hour. By
+        default it is taken as the median spacing of the timestamps.
+
+    Returns
+    -------
+    pandas.Series
+        Hourly mean values indexed by the start of each hour, covering every hour
+        between the first and the last sample.
+
+    Examples
+    --------
+    >>> from simeasren.pv_measured import load_highres_measurements, aggregate_to_hourly
+    >>> highres = load_highres_measurements("Turin", 2019)
+    >>> aggregate_to_hourly(highres).shape
+    (8760,)
+    """
+    if not highres.index.is_monotonic_increasing:
+        highres = highres.sort_index()
+    if highres.empty:
+        return highres.astype(float)
+
+    if step_seconds is None:
+        spacing = np.diff(highres.index.values).astype("timedelta64[s]").astype(np.int64)
+        step_seconds = max(int(np.median(spacing)), 1) if len(spacing) else 3600
+
+    bin_hours, sums, counts = hourly_sums(highres.index.values, highres.to_numpy(dtype=np.float64)[:, None])
+    hourly = hourly_means(bin_hours, sums, counts, step_seconds, min_coverage)
+    return hourly.iloc[:, 0].rename(highres.name)
+
+
+def hourly_sums(timestamps, values):
+    """
+    Sum and count the valid samples of each clock hour.
+
+    Parameters
+    ----------
+    timestamps : numpy.ndarray of datetime64
+        Sorted sample timestamps.
+    values : numpy.ndarray
+        2-D array of shape (samples, series), NaN for missing samples.
+
+    Returns
+    -------
+    tuple
+        `(bin_hours, sums, counts)`: the datetime64[h] of each hour present in
+        `timestamps`, and the per-hour sums and counts of valid samples for every series.
+    """
+    valid = ~np.isnan(values)
+    hours = timestamps.astype("datetime64[h]")
+
+    # First sample of each clock hour, then one reduceat per quantity
+    bin_starts = np.flatnonzero(np.r_[True, hours[1:] != hours[:-1]])
+    sums = np.add.reduceat(np.where(valid, values, 0.0), bin_starts, axis=0)
+    counts = np.add.reduceat(valid.astype(np.int64), bin_starts, axis=0)
+    return hours[bin_starts], sums, counts
+
+
+def hourly_means(bin_hours, sums, counts, step_seconds, min_coverage=0.5) -> pd.DataFrame:
+    """
+    Turn per-hour sums and counts (see :func:`hourly_sums`) into hourly means on a complete hourly axis.
+
+    Hours with less than `min_coverage` of the expected samples, or without any
+    sample at all, are NaN.
+    """
+    expected_per_hour = max(3600 // step_seconds, 1)
+
+    means = np.full(sums.shape, np.nan)
+    covered = counts >= min_coverage * expected_per_hour
+    means[covered] = sums[covered] / counts[covered]
+
+    # Place the bins on a complete hourly axis (hours without any row stay NaN)
+    n_hours = int((bin_hours[-1] - bin_hours[0]) // np.timedelta64(1, "h")) + 1
+    result = np.full((n_hours, sums.shape[1]), np.nan)
+    result[((bin_hours - bin_hours[0]) // np.timedelta64(1, "h")).astype(np.int64)] = means
+
+    index = pd.date_range(pd.Timestamp(bin_hours[0]), periods=n_hours, freq="h")
+    return pd.DataFrame(result, index=index)
+
+
+def highres_day(highres: pd.Series, day) -> pd.DataFrame:
+    """
+    Slice one day out of a full-year high-resolution series.
+
+    The result has the same layout as the `"Clear sky day"` and `"Cloudy sky day"`
+    sheets of the measured data files, so it can replace them in
+    :func:`simeasren.prepare_pv_data_for_plots` and the high-resolution plots.
+
+    Parameters
+    ----------
+    highres : pandas.Series
+        High-resolution series from :func:`load_highres_measurements`.
+    day : str or datetime-like
+        Day to extract (e.g., `"2019-03-30"`).
+
+    Returns
+    -------
+    pandas.DataFrame
+        Columns `"Timeserie"`, `"Time"`, `"Hour of the year"` (1-based, as in the
+        measured data files) and the high-resolution series column.
+    """
+    day = pd.Timestamp(day).normalize()
+    day_values = highres.loc[day: day + pd.Timedelta(days=1) - pd.Timedelta(1, "ns")]
+
+    year_start = pd.Timestamp(year=day.year, month=1, day=1)
+    hour_of_year = (day_values.index - year_start) // pd.Timedelta(hours=1) + 1
+
+    return pd.DataFrame(
+        {
+            "Timeserie": np.arange(1, len(day_values) + 1),
+            "Time": day_values.index,
+            "Hour of the year": np.asarray(hour_of_year, dtype=np.int64),
+            highres.name: day_values.to_numpy(),
+        }
+    )
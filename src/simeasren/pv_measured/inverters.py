@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+from .highres import hourly_sums, hourly_means
+
+# ---------------------------- Raw inverter exports to normalized hourly PV power -----------------------------
+
+NORMALIZED_COLUMN = "Normalized PV power corrected"
+
+
+def _inverter_grid(raw, time_column, power_columns, inverter_column, power_column):
+    """Sorted timestamps and a (timestamps, inverters) power array from a wide or long export."""
+    timestamps = pd.to_datetime(raw.index if time_column is None else raw[time_column]).values
+
+    if inverter_column is None:
+        if power_columns is None:
+            power_columns = [col for col in raw.columns if col != time_column]
+        names = list(power_columns)
+        values = np.empty((len(raw), len(names)), order="F")
+        for j, col in enumerate(names):
+            values[:, j] = pd.to_numeric(raw[col], errors="coerce")
+        if len(timestamps) > 1 and (np.diff(timestamps) < np.timedelta64(0)).any():
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, values = timestamps[order], values[order]
+        return timestamps, values, names
+
+    if power_column is None:
+        raise ValueError("power_column is required with inverter_column (long export).")
+
+    # One row per inverter and timestamp: place each row in the grid with integer codes
+    time_codes, unique_times = pd.factorize(timestamps, sort=True)
+    inverter_codes, inverters = pd.factorize(raw[inverter_column], sort=True)
+    values = np.full((len(unique_times), len(inverters)), np.nan, order="F")
+    values[time_codes, inverter_codes] = pd.to_numeric(raw[power_column], errors="coerce").to_numpy(np.float64)
+    return np.asarray(unique_times, dtype="datetime64[ns]"), values, [str(name) for name in inverters]
+
+
+def _capacities(capacity_kw, names, hourly_power):
+    """Capacity of each inverter: given for all, per inverter, or estimated from the data."""
+    if capacity_kw is None:
+        # Highest hourly output, robust to isolated outliers
+        with np.errstate(all="ignore"):
+            capacities = np.nanquantile(hourly_power, 0.999, axis=0)
+        print(f"Inverter capacities estimated from the data (kW): {dict(zip(names, np.round(capacities, 3).tolist()))}")
+        return capacities
+    if isinstance(capacity_kw, dict):
+        missing = [name for name in names if name not in capacity_kw]
+        if missing:
+            raise ValueError(f"No capacity given for inverters {missing}.")
+        return np.array([capacity_kw[name] for name in names], dtype=np.float64)
+    if np.ndim(capacity_kw) == 0:
+        return np.full(len(names), float(capacity_kw) / len(names))
+    capacities = np.asarray(capacity_kw, dtype=np.float64)
+    if len(capacities) != len(names):
+        raise ValueError(f"{len(capacities)} capacities given for {len(names)} inverters.")
+    return capacities
+
+
+def normalize_inverter_data(
+    raw: pd.DataFrame,
+    time_column=None,
+    power_columns=None,
+    inverter_column=None,
+    power_column=None,
+    capacity_kw=None,
+    clip_max=1.0,
+    min_coverage=0.5,
+    min_available_capacity=0.5,
+    step_seconds=None,
+) -> pd.Series:
+    """
+    Turn raw inverter power exports into the normalized hourly PV power of the plant.
+
+    This reproduces the `"Normalized PV power corrected"` column of the measured
+    data files from the raw measurements:
+
+    1. the samples of each inverter are averaged per clock hour (hours with less than
+       `min_coverage` of the expected samples are missing for that inverter);
+    2. the plant output of each hour is the power of the inverters with data divided
+       by their capacity, so a missing inverter does not lower the plant output;
+       hours where the inverters with data have less than `min_available_capacity`
+       of the plant capacity are NaN;
+    3. values are clipped to `[0, clip_max]` (night-time consumption, sensor offsets).
+
+    All steps work on 2-D arrays (one column per inverter), without loops over the
+    rows, so exports of millions of rows per site are processed in seconds. For files
+    too large for memory, average them to hourly values first with
+    :func:`simeasren.pv_analysis.chunked.aggregate_file_to_hourly` and pass the result.
+
+    Parameters
+    ----------
+    raw : pandas.DataFrame
+        Inverter export in kW. Either wide (one power column per inverter) or long
+        (one row per inverter and timestamp, see `inverter_column`).
+    time_column : str, optional
+        Column with the timestamps. None uses the index of `raw`.
+    power_columns : list of str, optional
+        Wide export: the inverter power columns (default: all columns but the time).
+    inverter_column, power_column : str, optional
+        Long export: the columns with the inverter identifier and its power.
+    capacity_kw : float, list or dict, optional
+        Nominal capacity: a float for the whole plant (split evenly between the
+        inverters), one value per inverter (list in the order of the inverters, or
+        dict by inverter name). If None, the capacity of each inverter is estimated
+        as the 99.9th percentile of its hourly output.
+    clip_max : float, optional
+        Upper limit of the normalized power (default 1.0).
+    min_coverage : float, optional
+        Minimum share of valid samples of an inverter in an hour (default 0.5).
+    min_available_capacity : float, optional
+        Minimum share of the plant capacity with data in an hour (default 0.5).
+    step_seconds : int, optional
+        Sampling step of the export. By default the median spacing of the timestamps.
+
+    Returns
+    -------
+    pandas.Series
+        Normalized hourly PV power (0 to `clip_max`), named
+        `"Normalized PV power corrected"` and indexed by the start of each hour,
+        covering every hour between the first and the last sample.
+
+    Raises
+    ------
+    ValueError
+        If a long export is given without `power_column`, or if `capacity_kw` does
+        not give one capacity per inverter.
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> from simeasren.pv_measured import normalize_inverter_data
+    >>> raw = pd.read_csv("Turin2019_inverters_1min.csv")  # DATE_TIME, INV1 ... INV8 in kW
+    >>> hourly = normalize_inverter_data(raw, time_column="DATE_TIME", capacity_kw=635)
+    """
+    timestamps, values, names = _inverter_grid(raw, time_column, power_columns, inverter_column, power_column)
+    if len(timestamps) == 0:
+        return pd.Series(dtype=np.float64, name=NORMALIZED_COLUMN)
+
+    if step_seconds is None:
+        spacing = np.diff(timestamps).astype("timedelta64[s]").astype(np.int64)
+        step_seconds = max(int(np.median(spacing)), 1) if len(spacing) else 3600
+
+    # Hourly mean power of each inverter
+    bin_hours, sums, counts = hourly_sums(timestamps, values)
+    hourly_power = hourly_means(bin_hours, sums, counts, step_seconds, min_coverage).to_numpy()
+
+    # Capacity-weighted normalization over the inverters with data
+    capacities = _capacities(capacity_kw, names, hourly_power)
+    available = ~np.isnan(hourly_power)
+    available_capacity = available @ capacities
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = np.where(available, hourly_power, 0.0).sum(axis=1) / available_capacity
+    normalized[available_capacity < min_available_capacity * capacities.sum()] = np.nan
+    normalized = np.clip(normalized, 0.0, clip_max)
+
+    index = pd.date_range(pd.Timestamp(bin_hours[0]), periods=len(normalized), freq="h")
+    return pd.Series(normalized, index=index, name=NORMALIZED_COLUMN)
+
+
+def measured_columns(location_name: str, hourly: pd.Series) -> dict:
+    """
+    Split an hourly measured series into one full-year column per year.
+
+    Parameters
+    ----------
+    location_name : str
+        Name of the location (e.g., `"Turin"`).
+    hourly : pandas.Series
+        Hourly series indexed by the start of each hour (e.g., the output of
+        :func:`normalize_inverter_data`).
+
+    Returns
+    -------
+    dict
+        `{"{location_name}{year} PV-MEAS": numpy.ndarray}` with all the hours of each
+        year present in `hourly` (NaN for hours without data), as in the yearly sheets
+        of the measured data files.
+    """
+    columns = {}
+    for year in np.unique(hourly.index.year):
+        hours = pd.date_range(f"{year}-01-01", f"{year + 1}-01-01", freq="h", inclusive="left")
+        columns[f"{location_name}{year} PV-MEAS"] = hourly.reindex(hours).to_numpy(dtype=np.float64)
+    return columns
@@ -0,0 +1,390 @@
+import numpy as np
+import pandas as pd
+from ..series_catalog import select_series
+from ..profiles import ProfileMatrix
+
+# ---------------------------- Data quality of measured series -----------------------------
+
+QUALITY_FLAGS = ["gap", "flatline", "spike", "out_of_range", "night_nonzero"]
+
+
+def solar_elevation(timestamps, latitude, longitude) -> np.ndarray:
+    """
+    Solar elevation angle in degrees (NOAA approximation, without refraction).
+
+    Parameters
+    ----------
+    timestamps : array-like of datetime
+        UTC timestamps.
+    latitude, longitude : float
+        Site coordinates in degrees (east positive).
+
+    Returns
+    -------
+    numpy.ndarray
+        Elevation of the sun above the horizon for each timestamp (negative at night).
+    """
+    timestamps = pd.to_datetime(np.asarray(timestamps)).values.astype("datetime64[s]")
+    days = timestamps.astype("datetime64[D]")
+    day_of_year = (days - timestamps.astype("datetime64[Y]")).astype(np.int64)
+    minutes = (timestamps - days).astype(np.int64) / 60.0
+
+    # Fractional year (radians), equation of time (minutes) and declination (radians)
+    gamma = 2 * np.pi / 365 * (day_of_year + (minutes / 60 - 12) / 24)
+    eqtime = 229.18 * (
+        0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+        - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma)
+    )
+    declination = (
+        0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+        - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+        - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma)
+    )
+
+    hour_angle = np.radians((minutes + eqtime + 4 * longitude) / 4 - 180)
+    lat = np.radians(latitude)
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+    return 90 - np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+
+
+def _run_lengths(mask):
+    """Length of the run of True values each element belongs to (0 where False)."""
+    starts = np.flatnonzero(mask & ~np.r_[False, mask[:-1]])
+    ends = np.flatnonzero(mask & ~np.r_[mask[1:], False]) + 1
+    lengths = np.zeros(len(mask), dtype=np.int64)
+    run_lengths = ends - starts
+    lengths[mask] = np.repeat(run_lengths, run_lengths)
+    return lengths
+
+
+def _step_seconds(index):
+    """Median spacing of a DatetimeIndex in seconds (3600 if it cannot be measured)."""
+    if len(index) < 2:
+        return 3600
+    spacing = np.diff(index.values).astype("timedelta64[s]").astype(np.int64)
+    return max(int(np.median(spacing)), 1)
+
+
+def _utc_timestamps(index, utc_offset_hours):
+    return index.values.astype("datetime64[s]") - np.timedelta64(int(round(utc_offset_hours * 3600)), "s")
+
+
+def flag_measured_series(
+    series: pd.Series,
+    latitude=None,
+    longitude=None,
+    flatline_hours=4,
+    spike_threshold=0.5,
+    max_value=1.2,
+    night_elevation=-5.0,
+    night_tolerance=0.01,
+    utc_offset_hours=0,
+    step_seconds=None,
+) -> pd.DataFrame:
+    """
+    Flag suspicious samples of a measured PV series.
+
+    All checks are vectorized over the whole series (run lengths from cumulative
+    sums, neighbour differences, one solar position per sample), so multi-year
+    1-minute series are flagged in a few seconds.
+
+    Parameters
+    ----------
+    series : pandas.Series
+        Normalized PV power (0-1) indexed by the start of each time step on a
+        regular grid (e.g., the output of :func:`load_highres_measurements` or
+        :func:`aggregate_to_hourly`).
+    latitude, longitude : float, optional
+        Site coordinates (e.g., from :func:`simeasren.load_pv_setup_from_meas_file`).
+        Night-time values are only checked if both are given.
+    flatline_hours : float, optional
+        Minimum duration of a run of identical non-zero values to be flagged as a
+        flatline (default 4 hours). Long clipping plateaus at the inverter limit
+        are flagged as well.
+    spike_threshold : float, optional
+        Minimum jump, above or below both neighbours, of an isolated sample to be
+        flagged as a spike (default 0.5).
+    max_value : float, optional
+        Values below 0 or above `max_value` (default 1.2) are out of range.
+    night_elevation : float, optional
+        A time step is night if the solar elevation stays below this angle (degrees)
+        over the whole step (default -5, leaving a margin for time stamping conventions).
+    night_tolerance : float, optional
+        Night-time values up to this level are not flagged (default 0.01).
+    utc_offset_hours : float, optional
+        Offset of the timestamps from UTC (default 0). Measured files are often in
+        local standard time, e.g. 1 for Central European Time.
+    step_seconds : int, optional
+        Time step of the series. By default the median spacing of the index.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Boolean columns `"gap"` (NaN), `"flatline"`, `"spike"`, `"out_of_range"`
+        and `"night_nonzero"`, on the index of `series`.
+
+    Examples
+    --------
+    >>> from simeasren import load_pv_setup_from_meas_file
+    >>> from simeasren.pv_measured import load_highres_measurements, flag_measured_series
+    >>> setup = load_pv_setup_from_meas_file("Turin")
+    >>> flags = flag_measured_series(load_highres_measurements("Turin", 2019), setup["Latitude"], setup["Longitude"])
+    >>> flags.sum()
+    """
+    values = series.to_numpy(dtype=np.float64)
+    if step_seconds is None:
+        step_seconds = _step_seconds(series.index)
+    gap = np.isnan(values)
+
+    # Runs of identical consecutive values (NaN never equals its neighbours)
+    run_ids = np.cumsum(np.r_[True, values[1:] != values[:-1]]) - 1
+    flatline = (np.bincount(run_ids)[run_ids] >= flatline_hours * 3600 / step_seconds) & (values != 0) & ~gap
+
+    # Isolated samples jumping away from both neighbours in the same direction
+    before = np.r_[np.nan, np.diff(values)]
+    after = np.r_[np.diff(values), np.nan]
+    with np.errstate(invalid="ignore"):
+        spike = ((before > spike_threshold) & (after < -spike_threshold)) | (
+            (before < -spike_threshold) & (after > spike_threshold)
+        )
+        out_of_range = (values < 0) | (values > max_value)
+
+    night_nonzero = np.zeros(len(values), dtype=bool)
+    if latitude is not None and longitude is not None:
+        start = _utc_timestamps(series.index, utc_offset_hours)
+        highest = np.maximum(
+            solar_elevation(start, latitude, longitude),
+            solar_elevation(start + np.timedelta64(step_seconds, "s"), latitude, longitude),
+        )
+        with np.errstate(invalid="ignore"):
+            night_nonzero = (highest < night_elevation) & (values > night_tolerance)
+
+    return pd.DataFrame(
+        {
+            "gap": gap,
+            "flatline": flatline,
+            "spike": spike,
+            "out_of_range": out_of_range,
+            "night_nonzero": night_nonzero,
+        },
+        index=series.index,
+    )
+
+
+def fill_gaps(values, max_gap_steps=None, method="linear", clear_sky=None):
+    """
+    Fill NaN runs of a series.
+
+    Parameters
+    ----------
+    values : array-like of float
+        Series with NaN for missing samples.
+    max_gap_steps : int, optional
+        Only runs of at most `max_gap_steps` missing samples with valid samples on
+        both sides are filled. None (default) fills every gap, the first and last
+        valid values being extended to the ends of the series.
+    method : {"linear", "clear_sky"}, optional
+        `"linear"` interpolates the values across the gap. `"clear_sky"`
+        interpolates the clear-sky index (value / `clear_sky`) and multiplies it by
+        the clear-sky profile, so a gap over sunrise or sunset follows the shape of
+        the day and night-time samples are filled with 0.
+    clear_sky : array-like of float, optional
+        Clear-sky profile, required by `method="clear_sky"` (e.g., the positive part
+        of the sine of :func:`solar_elevation`).
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        `(filled, filled_mask)`: the filled values (a new array) and the mask of the
+        samples that were filled.
+
+    Raises
+    ------
+    ValueError
+        If `method` is unknown, or `"clear_sky"` is used without a profile.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values)
+    filled = values.copy()
+    if not missing.any() or missing.all():
+        return filled, np.zeros(len(values), dtype=bool)
+
+    to_fill = missing.copy()
+    if max_gap_steps is not None:
+        # Leading and trailing gaps are not bounded by valid samples
+        valid_positions = np.flatnonzero(~missing)
+        interior = np.zeros(len(values), dtype=bool)
+        interior[valid_positions[0]:valid_positions[-1] + 1] = True
+        to_fill &= interior & (_run_lengths(missing) <= max_gap_steps)
+
+    positions = np.arange(len(values))
+    if method == "linear":
+        anchors = ~missing
+        filled[to_fill] = np.interp(positions[to_fill], positions[anchors], values[anchors])
+    elif method == "clear_sky":
+        if clear_sky is None:
+            raise ValueError("method='clear_sky' needs a clear_sky profile.")
+        clear_sky = np.asarray(clear_sky, dtype=np.float64)
+        # Clear-sky index is only defined where the sun is up
+        anchors = ~missing & (clear_sky > 0.05)
+        if not anchors.any():
+            anchors = ~missing
+        with np.errstate(divide="ignore", invalid="ignore"):
+            index = values[anchors] / np.where(clear_sky[anchors] > 0, clear_sky[anchors], 1)
+        filled[to_fill] = np.interp(positions[to_fill], positions[anchors], index) * clear_sky[to_fill]
+    else:
+        raise ValueError(f"Unknown gap filling method: {method}")
+
+    return filled, to_fill
+
+
+def clean_measured_series(
+    series: pd.Series,
+    latitude=None,
+    longitude=None,
+    max_gap_hours=3,
+    method=None,
+    utc_offset_hours=0,
+    **flag_options,
+):
+    """
+    Flag and repair a measured PV series, keeping its full length.
+
+    Flagged samples (see :func:`flag_measured_series`) are removed, night-time
+    non-zero values are set to 0, and gaps of at most `max_gap_hours` are filled
+    (see :func:`fill_gaps`). Longer gaps stay NaN. The series keeps its index, so
+    it stays aligned with the simulated profiles hour by hour.
+
+    Parameters
+    ----------
+    series : pandas.Series
+        Normalized PV power indexed by the start of each time step on a regular grid.
+    latitude, longitude : float, optional
+        Site coordinates. Needed for the night-time check and the clear-sky fill.
+    max_gap_hours : float, optional
+        Longest gap that is filled (default 3 hours). None fills all gaps.
+    method : {"linear", "clear_sky"}, optional
+        Gap filling method. Defaults to `"clear_sky"` if the coordinates are given,
+        else `"linear"`.
+    utc_offset_hours : float, optional
+        Offset of the timestamps from UTC (default 0), see :func:`flag_measured_series`.
+    **flag_options
+        Thresholds passed to :func:`flag_measured_series`.
+
+    Returns
+    -------
+    tuple
+        `(cleaned, flags)`: the cleaned series, and a DataFrame with the quality
+        flags plus the columns `"filled"` (samples filled in) and `"valid"` (samples
+        usable downstream, i.e. not NaN in `cleaned`).
+
+    Examples
+    --------
+    >>> from simeasren.pv_measured import load_highres_measurements, clean_measured_series
+    >>> cleaned, flags = clean_measured_series(load_highres_measurements("Turin", 2019), 45.065, 7.659)
+    >>> flags[["gap", "filled"]].sum()
+    """
+    step_seconds = flag_options.pop("step_seconds", None) or _step_seconds(series.index)
+    flags = flag_measured_series(
+        series, latitude, longitude, utc_offset_hours=utc_offset_hours, step_seconds=step_seconds, **flag_options
+    )
+
+    values = series.to_numpy(dtype=np.float64).copy()
+    values[flags["flatline"].to_numpy() | flags["spike"].to_numpy() | flags["out_of_range"].to_numpy()] = np.nan
+    values[flags["night_nonzero"].to_numpy()] = 0.0
+
+    has_coordinates = latitude is not None and longitude is not None
+    method = method or ("clear_sky" if has_coordinates else "linear")
+    clear_sky = None
+    if method == "clear_sky":
+        if not has_coordinates:
+            raise ValueError("method='clear_sky' needs the latitude and longitude of the site.")
+        middle = _utc_timestamps(series.index, utc_offset_hours) + np.timedelta64(step_seconds // 2, "s")
+        clear_sky = np.clip(np.sin(np.radians(solar_elevation(middle, latitude, longitude))), 0, None)
+
+    max_gap_steps = None if max_gap_hours is None else int(max_gap_hours * 3600 // step_seconds)
+    filled, filled_mask = fill_gaps(values, max_gap_steps, method, clear_sky)
+
+    flags["filled"] = filled_mask
+    flags["valid"] = ~np.isnan(filled)
+    return pd.Series(filled, index=series.index, name=series.name), flags
+
+
+def clean_measured_profiles(
+    data_sim_meas,
+    location_name,
+    latitude=None,
+    longitude=None,
+    max_gap_hours=3,
+    method=None,
+    utc_offset_hours=0,
+    year=None,
+    **flag_options,
+):
+    """
+    Clean the measured columns of hourly measured/simulated profiles.
+
+    Every measured column of the location is cleaned on its own. Its rows are taken
+    as the hours of its own year, starting on January 1st at 00:00 (as in
+    :func:`simeasren.prepare_pv_data_for_plots`), in the time zone given by
+    `utc_offset_hours`, so the night-time check and the clear-sky fill follow the
+    calendar of that year. The simulated columns are left unchanged.
+
+    Parameters
+    ----------
+    data_sim_meas : pandas.DataFrame or ProfileMatrix
+        Hourly profiles with one `"PV-MEAS"` column per year for the location.
+    location_name : str
+        Location of the measured columns (e.g., `"Turin"`).
+    latitude, longitude, max_gap_hours, method, utc_offset_hours, **flag_options
+        See :func:`clean_measured_series`.
+    year : str, optional
+        Only clean the measured column of this year. Defaults to all years.
+
+    Returns
+    -------
+    tuple
+        `(profiles, flags)`: a new :class:`simeasren.ProfileMatrix` with the cleaned
+        measured columns and their updated validity masks, and the flags of the
+        measured columns (see :func:`clean_measured_series`), indexed by the measured
+        column name and the timestamp.
+
+    Raises
+    ------
+    ValueError
+        If no measured column is found for the location (and year).
+
+    Examples
+    --------
+    >>> from simeasren import prepare_pv_data_for_plots, calculate_error_metrics, calculate_all_LCOF_diff
+    >>> from simeasren.pv_measured import clean_measured_profiles
+    >>> data_sim_meas, _, _ = prepare_pv_data_for_plots("Turin", "2019")
+    >>> profiles, flags = clean_measured_profiles(data_sim_meas, "Turin", 45.065, 7.659, utc_offset_hours=1)
+    >>> mean_diff, mae, rmse = calculate_error_metrics(profiles, "Turin")
+    """
+    profiles = ProfileMatrix.from_frame(data_sim_meas)
+    meas_columns = select_series(profiles.catalog, location=location_name, year=year, is_measured=True)
+    if not meas_columns:
+        raise ValueError(f"No measured data column found for {location_name}{year or ''}.")
+
+    # New array, the input profiles may be views of the caller's frame
+    values = np.array(profiles.values, order="F")
+    flags = {}
+    for meas_column in meas_columns:
+        column_year = profiles.catalog.at[meas_column, "year"]
+        start = f"{column_year}-01-01" if pd.notna(column_year) and column_year else "2001-01-01"
+        index = pd.date_range(start, periods=len(profiles), freq="h")
+
+        cleaned, flags[meas_column] = clean_measured_series(
+            pd.Series(profiles.column(meas_column), index=index, name=meas_column),
+            latitude,
+            longitude,
+            max_gap_hours=max_gap_hours,
+            method=method,
+            utc_offset_hours=utc_offset_hours,
+            step_seconds=3600,
+            **flag_options,
+        )
+        values[:, profiles.position(meas_column)] = cleaned.to_numpy()
+
+    return ProfileMatrix(values, profiles.columns), pd.concat(flags, names=["Series", None])
@@ -0,0 +1,129 @@
+import os
+import hashlib
+from pathlib import Path
+import pandas as pd
+from ..series_catalog import build_series_catalog
+
+# In-memory cache of typed sheets, keyed by file, modification time and reader options
+# (least recently used first, at most _SHEET_CACHE_SIZE sheets)
+_SHEET_CACHE = {}
+_SHEET_CACHE_SIZE = 8
+
+
+def _cache_key(file_path, sheet_name, decimal, thousands, schema):
+    stat = os.stat(file_path)
+    schema_key = tuple(sorted((str(k), str(v)) for k, v in (schema or {}).items()))
+    return (str(Path(file_path).resolve()), stat.st_mtime_ns, stat.st_size, sheet_name, decimal, thousands, schema_key)
+
+
+def read_measured_sheet(
+    file_path,
+    sheet_name=0,
+    decimal=",",
+    thousands=None,
+    schema=None,
+    sep=";",
+    cache=True,
+    cache_dir=None,
+):
+    """
+    Read a measured PV sheet and parse comma-decimal numbers while loading.
+
+    Numbers stored as text with a comma as decimal separator (e.g., ``"0,53"``) are
+    converted by the pandas parser itself, so the sheet comes out numeric without a
+    separate string replacement pass over each column. The typed result is cached
+    and reused as long as the source file is unchanged.
+
+    Parameters
+    ----------
+    file_path : str or pathlib.Path
+        Path to the measured data file. Excel workbooks (``.xlsx``) and delimited
+        text files (``.csv``/``.txt``) are supported.
+    sheet_name : str or int, optional
+        Excel sheet to read (ignored for text files). Defaults to the first sheet.
+    decimal : str, optional
+        Character recognised as decimal point in text cells (default `","`).
+    thousands : str, optional
+        Thousands separator in text cells, if any.
+    schema : dict, optional
+        Per-column dtypes, e.g. ``{"Hour of the year": "int64",
+        "Turin2019 PV-MEAS_high_resolution": "float32"}``. Columns not listed are
+        inferred by pandas.
+    sep : str, optional
+        Field separator for text files (default `";"`, usual with comma decimals).
+    cache : bool, optional
+        If True (default), keep the typed DataFrame in memory and return a copy on
+        the next call with the same file and options. The last 8 sheets read are
+        kept; :func:`clear_sheet_cache` frees them.
+    cache_dir : str, optional
+        If given, also store the typed DataFrame as a pickle in this directory so
+        later sessions skip the Excel parsing.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The typed sheet.
+
+    Raises
+    ------
+    FileNotFoundError
+        If `file_path` does not exist.
+    ValueError
+        If a series column (e.g., `"Turin2019 PV-MEAS_high_resolution"`) cannot be
+        parsed as numeric, or if a column does not match its `schema` dtype.
+
+    Examples
+    --------
+    >>> from simeasren.pv_measured import read_measured_sheet
+    >>> clear_sky_df = read_measured_sheet("Turin.xlsx", sheet_name="Clear sky day")
+    >>> clear_sky_df["Turin2019 PV-MEAS_high_resolution"].dtype
+    dtype('float64')
+    """
+    file_path = Path(file_path)
+    if not file_path.exists():
+        raise FileNotFoundError(f"Measured PV file not found: {file_path}")
+
+    key = _cache_key(file_path, sheet_name, decimal, thousands, schema)
+    if cache and key in _SHEET_CACHE:
+        _SHEET_CACHE[key] = _SHEET_CACHE.pop(key)
+        return _SHEET_CACHE[key].copy()
+
+    pickle_path = None
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        pickle_path = Path(cache_dir) / f"{file_path.stem}_{digest}.pkl"
+
+    if pickle_path is not None and pickle_path.exists():
+        df = pd.read_pickle(pickle_path)
+    else:
+        if file_path.suffix.lower() in (".csv", ".txt"):
+            df = pd.read_csv(file_path, sep=sep, decimal=decimal, thousands=thousands, dtype=schema)
+        else:
+            df = pd.read_excel(file_path, sheet_name=sheet_name, decimal=decimal, thousands=thousands, dtype=schema)
+
+        # Series columns must come out numeric, do not silently keep them as text
+        series_columns = build_series_catalog(df.columns).index
+        non_numeric = [col for col in series_columns if not pd.api.types.is_numeric_dtype(df[col])]
+        if non_numeric:
+            raise ValueError(
+                f"Columns {non_numeric} in {file_path.name} could not be parsed as numbers with decimal='{decimal}'."
+            )
+
+        if pickle_path is not None:
+            df.to_pickle(pickle_path)
+
+    if cache:
+        # Drop the sheets of older versions of the file, then the least recently used ones
+        for old_key in [k for k in _SHEET_CACHE if k[0] == key[0] and k[1:3] != key[1:3]]:
+            del _SHEET_CACHE[old_key]
+        _SHEET_CACHE[key] = df
+        while len(_SHEET_CACHE) > _SHEET_CACHE_SIZE:
+            _SHEET_CACHE.pop(next(iter(_SHEET_CACHE)))
+        return df.copy()
+    return df
+
+
+def clear_sheet_cache():
+    """Empty the in-memory cache used by :func:`read_measured_sheet`."""
+    _SHEET_CACHE.clear()
@@ -2,11 +2,15 @@ import os
 import io
 import pandas as pd
 import requests
+from ..storage import get_storage
 
 
 def download_pvgis_data(
     location_name: str,
-    pv_parameters
+    pv_parameters,
+    file_format="csv",
+    output_dir="results",
+    storage=None
 ):
     """
     Download simulated PV power output data from PVGIS for a specified location.
@@ -36,6 +40,16 @@ def download_pvgis_data(
             - "Start year" : int — first year of simulation  
             - "End year" : int — last year of simulation  
 
+    file_format : {"csv", "pvz"}, optional
+        `"csv"` (default) saves each downloaded series as a CSV file. `"pvz"` saves a
+        quantized, compressed archive instead (numeric columns only, see
+        :func:`simeasren.archive.write_profile_archive`).
+    output_dir : str, optional
+        Root directory of the results (default `"results"`).
+    storage : LocalStorage, MemoryStorage or WriteBehindStorage, optional
+        Where the files are written (default: the storage set with
+        :func:`simeasren.set_storage`, the local disk unless changed).
+
     Returns
     -------
     dict
@@ -62,7 +76,7 @@ def download_pvgis_data(
     -----
     - Output CSV files are saved to:
 
-        results/{location_name}/simulated_PV/PVGIS/
+        {output_dir}/{location_name}/simulated_PV/PVGIS/
 
     - PVGIS API versions used:
         - v5_2 : "PVGIS-SARAH", "PVGIS-SARAH2", "PVGIS-ERA5"
@@ -92,9 +106,13 @@ def download_pvgis_data(
     (8760,)
     """
     
+    if file_format not in ("csv", "pvz"):
+        raise ValueError(f"file_format must be 'csv' or 'pvz', got '{file_format}'")
+
     # -------------------- Create output directory --------------------
-    output_dir_simulated_pv = os.path.join("results", location_name, "simulated_PV/PVGIS")
-    os.makedirs(output_dir_simulated_pv, exist_ok=True)
+    storage = get_storage(storage)
+    output_dir_simulated_pv = os.path.join(output_dir, location_name, "simulated_PV/PVGIS")
+    storage.makedirs(output_dir_simulated_pv)
 
     # PVGIS API setup
     pvgis_versions = ["v5_2", "v5_3"]
@@ -139,8 +157,11 @@ def download_pvgis_data(
 
                     # Save to CSV
                     
-                    file_path = os.path.join(output_dir_simulated_pv, f"{identifier}.csv")
-                    data.to_csv(file_path, index=False)
+                    file_path = os.path.join(output_dir_simulated_pv, f"{identifier}.{file_format}")
+                    if file_format == "pvz":
+                        storage.write_archive(file_path, data.apply(pd.to_numeric, errors="coerce").dropna(axis=1, how="all"))
+                    else:
+                        storage.write_frame(file_path, data)
                     print(f"Saved PVGIS data to: {file_path}")
 
                 else:
@@ -3,12 +3,16 @@ import io
 import time
 import requests
 import pandas as pd
+from ..storage import get_storage
 
 
 def download_rn_data(
     location_name: str,
     pv_parameters, 
-    rn_token: str
+    rn_token: str,
+    file_format="csv",
+    output_dir="results",
+    storage=None
 ):
     """
     Download simulated PV power output data from Renewables.ninja for a specified location.
@@ -39,6 +43,16 @@ def download_rn_data(
     rn_token : str
         API token for Renewables.ninja.
 
+    file_format : {"csv", "pvz"}, optional
+        `"csv"` (default) saves each downloaded series as a CSV file. `"pvz"` saves a
+        quantized, compressed archive instead (numeric columns only, see
+        :func:`simeasren.archive.write_profile_archive`).
+    output_dir : str, optional
+        Root directory of the results (default `"results"`).
+    storage : LocalStorage, MemoryStorage or WriteBehindStorage, optional
+        Where the files are written (default: the storage set with
+        :func:`simeasren.set_storage`, the local disk unless changed).
+
     Returns
     -------
     dict
@@ -65,7 +79,7 @@ def download_rn_data(
     -----
     - Output CSV files are saved to:
 
-        results/{location_name}/simulated_PV/Renewables_ninja/
+        {output_dir}/{location_name}/simulated_PV/Renewables_ninja/
 
     - The function handles API rate limiting (HTTP 429) by pausing before retrying.  
     - Power output is returned as a NumPy array in kW.  
@@ -94,9 +108,13 @@ def download_rn_data(
     """
 
 
+    if file_format not in ("csv", "pvz"):
+        raise ValueError(f"file_format must be 'csv' or 'pvz', got '{file_format}'")
+
     # -------------------- Create output directory --------------------
-    output_dir_simulated_pv = os.path.join("results", location_name, "simulated_PV/Renewables_ninja")
-    os.makedirs(output_dir_simulated_pv, exist_ok=True)
+    storage = get_storage(storage)
+    output_dir_simulated_pv = os.path.join(output_dir, location_name, "simulated_PV/Renewables_ninja")
+    storage.makedirs(output_dir_simulated_pv)
 
     rn_session = requests.Session()
     rn_session.headers = {"Authorization": f"Token {rn_token}"}
@@ -137,8 +155,11 @@ def download_rn_data(
                         productions[identifier] = data["electricity"].astype(float).values
 
                         # Save CSV
-                        file_path = os.path.join(output_dir_simulated_pv, f"{identifier}.csv")
-                        data.to_csv(file_path, index=False)
+                        file_path = os.path.join(output_dir_simulated_pv, f"{identifier}.{file_format}")
+                        if file_format == "pvz":
+                            storage.write_archive(file_path, data.apply(pd.to_numeric, errors="coerce").dropna(axis=1, how="all"))
+                        else:
+                            storage.write_frame(file_path, data)
                         print(f" Saved Renewables Ninja data to: {file_path}")
 
                         success = True
@@ -0,0 +1,271 @@
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+# ---------------------------- Embedded results catalog (SQLite) -----------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    location TEXT,
+    parameters TEXT,
+    input_fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS lcof (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    location TEXT,
+    year TEXT,
+    series TEXT,
+    tool TEXT,
+    is_measured INTEGER,
+    fuel_cost REAL,
+    lcof_difference REAL,
+    profile_fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS unit_results (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    series TEXT,
+    unit TEXT,
+    quantity TEXT,
+    value REAL
+);
+CREATE TABLE IF NOT EXISTS error_metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    location TEXT,
+    year TEXT,
+    tool TEXT,
+    metric TEXT,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_kind_location ON runs(kind, location);
+CREATE INDEX IF NOT EXISTS idx_lcof_location_tool ON lcof(location, tool, year);
+CREATE INDEX IF NOT EXISTS idx_lcof_run ON lcof(run_id);
+CREATE INDEX IF NOT EXISTS idx_unit_results_run ON unit_results(run_id, series);
+CREATE INDEX IF NOT EXISTS idx_error_metrics_location_tool ON error_metrics(location, tool, year, metric);
+CREATE INDEX IF NOT EXISTS idx_error_metrics_run ON error_metrics(run_id);
+"""
+
+
+def fingerprint(*parts):
+    """
+    SHA-1 fingerprint of arrays, strings or bytes (e.g., the profiles used by a run).
+
+    Arrays are hashed with their dtype and shape, so equal fingerprints mean
+    identical inputs.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(f"{part.dtype}{part.shape}".encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        elif isinstance(part, bytes):
+            digest.update(part)
+        else:
+            digest.update(str(part).encode())
+    return digest.hexdigest()
+
+
+class ResultsDatabase:
+    """
+    Catalog of the results of all runs in one SQLite file.
+
+    Every LCOF assessment (:func:`simeasren.calculate_all_LCOF_diff`) and error
+    metrics calculation (:func:`simeasren.calculate_error_metrics`) records its
+    parameters, a fingerprint of its inputs and its outputs (LCOF per series, the
+    system size and cost tables, the error metrics). Runs can then be compared
+    across sites and scenarios with one indexed query instead of reading the CSV
+    result files.
+
+    Parameters
+    ----------
+    path : str, optional
+        Database file (default `"results/simeasren_results.sqlite"`), created if
+        needed. `":memory:"` keeps the database in memory.
+
+    Examples
+    --------
+    >>> from simeasren import ResultsDatabase, set_results_database, calculate_all_LCOF_diff
+    >>> db = ResultsDatabase()
+    >>> set_results_database(db)  # Every run now records its results
+    >>> results = calculate_all_LCOF_diff(data_sim_meas, "Turin", 0.3, "GUROBI_CMD")
+    >>> db.lcof(tool="PG3-SARAH3", H2_end_user_min_load=0.3)
+    >>> db.query("SELECT location, tool, AVG(lcof_difference) FROM lcof GROUP BY location, tool")
+    """
+
+    def __init__(self, path="results/simeasren_results.sqlite"):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(_SCHEMA)
+
+    def __repr__(self):
+        return f"<ResultsDatabase '{self.path}'>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    # -------------------- Recording --------------------
+
+    def start_run(self, kind, location=None, parameters=None, input_fingerprint=None):
+        """
+        Register a new run and return its `run_id`.
+
+        Parameters
+        ----------
+        kind : str
+            Type of run, e.g. `"LCOF"` or `"error_metrics"`.
+        location : str, optional
+            Location of the run.
+        parameters : dict, optional
+            Run parameters, stored as JSON (queried with `json_extract`).
+        input_fingerprint : str, optional
+            Fingerprint of the inputs (see :func:`fingerprint`).
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (created, kind, location, parameters, input_fingerprint) VALUES (?, ?, ?, ?, ?)",
+                (
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    kind,
+                    location,
+                    json.dumps(parameters or {}, default=str),
+                    input_fingerprint,
+                ),
+            )
+        return cursor.lastrowid
+
+    def record_lcof(self, run_id, rows):
+        """
+        Store LCOF values of a run.
+
+        `rows` are dicts with the keys `"location"`, `"year"`, `"series"`, `"tool"`,
+        `"is_measured"`, `"fuel_cost"`, `"lcof_difference"` and `"profile_fingerprint"`.
+        """
+        columns = ["location", "year", "series", "tool", "is_measured", "fuel_cost", "lcof_difference", "profile_fingerprint"]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO lcof (run_id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})",
+                [(run_id, *(row.get(col) for col in columns)) for row in rows],
+            )
+
+    def record_unit_results(self, run_id, series, df_results):
+        """Store the system size and cost table returned by :func:`simeasren.solve_optiplant` in long format."""
+        long = df_results.melt(id_vars=df_results.columns[0], var_name="quantity", value_name="value")
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO unit_results (run_id, series, unit, quantity, value) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, series, str(unit), quantity, float(v)) for unit, quantity, v in long.itertuples(index=False)],
+            )
+
+    def record_error_metrics(self, run_id, table):
+        """
+        Store error metrics of a run, one row per series and metric.
+
+        `table` is the tidy table of :func:`simeasren.calculate_error_metrics_table`:
+        the location, year and tool of every row are stored with its
+        `"Mean Difference (%)"`, `"MAE (%)"` and `"RMSE (%)"` values.
+        """
+        metrics = ["Mean Difference (%)", "MAE (%)", "RMSE (%)"]
+        rows = [
+            (run_id, location, None if pd.isna(year) else str(year), tool, metric, float(value))
+            for location, year, tool, *values in table[["Location", "Year", "Tool", *metrics]].itertuples(index=False)
+            for metric, value in zip(metrics, values)
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO error_metrics (run_id, location, year, tool, metric, value) VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+    # -------------------- Query API --------------------
+
+    def query(self, sql, params=()):
+        """Run any SQL query on the catalog and return the result as a DataFrame."""
+        return pd.read_sql_query(sql, self.connection, params=params)
+
+    def _select(self, table, filters, parameters):
+        clauses, params = [], []
+        for column, value in filters.items():
+            if value is None:
+                continue
+            values = [value] if isinstance(value, (str, int, float)) else list(value)
+            clauses.append(f"t.{column} IN ({', '.join('?' * len(values))})")
+            params.extend(str(v) if column == "year" else v for v in values)
+        for name, value in parameters.items():
+            clauses.append(f"json_extract(r.parameters, '$.{name}') = ?")
+            params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.query(
+            f"SELECT t.*, r.created, r.parameters FROM {table} t JOIN runs r USING (run_id) {where} ORDER BY t.run_id",
+            params,
+        )
+
+    def runs(self, kind=None, location=None):
+        """Registered runs, optionally filtered by kind and location."""
+        return self.query(
+            "SELECT * FROM runs WHERE (? IS NULL OR kind = ?) AND (? IS NULL OR location = ?) ORDER BY run_id",
+            (kind, kind, location, location),
+        )
+
+    def lcof(self, location=None, tool=None, year=None, run_id=None, **parameters):
+        """
+        LCOF results, filtered by location, tool, year, run and run parameters.
+
+        Each filter accepts one value or a list of values. Run parameters are given
+        as keyword arguments, e.g. `H2_end_user_min_load=0.3` or `solver_name="GUROBI_CMD"`.
+        """
+        return self._select("lcof", {"location": location, "tool": tool, "year": year, "run_id": run_id}, parameters)
+
+    def unit_results(self, series=None, unit=None, quantity=None, run_id=None, **parameters):
+        """System size and cost tables (long format), filtered like :meth:`lcof`."""
+        return self._select(
+            "unit_results", {"series": series, "unit": unit, "quantity": quantity, "run_id": run_id}, parameters
+        )
+
+    def error_metrics(self, location=None, tool=None, year=None, metric=None, run_id=None, **parameters):
+        """Error metrics, filtered like :meth:`lcof` (and by `metric`, e.g. `"RMSE (%)"`)."""
+        return self._select(
+            "error_metrics",
+            {"location": location, "tool": tool, "year": year, "metric": metric, "run_id": run_id},
+            parameters,
+        )
+
+
+_default_database = None
+
+
+def get_results_database(results_db=None):
+    """Return `results_db` if given, else the database set with :func:`set_results_database` (None if not set)."""
+    return results_db if results_db is not None else _default_database
+
+
+def set_results_database(results_db=None):
+    """
+    Set the database where all runs record their results.
+
+    Parameters
+    ----------
+    results_db : ResultsDatabase or str, optional
+        Database, or path of a database file. None stops recording.
+
+    Returns
+    -------
+    ResultsDatabase or None
+        The previous database.
+    """
+    global _default_database
+    previous = _default_database
+    _default_database = ResultsDatabase(results_db) if isinstance(results_db, str) else results_db
+    return previous
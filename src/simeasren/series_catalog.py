@@ -0,0 +1,179 @@
+import re
+from functools import lru_cache
+import pandas as pd
+
+# ---------------------------- Parse series names once into a lookup table -----------------------------
+
+# "{Location}{Year} {Provider}{Version}-{Database}[_{resolution}]", e.g. "Turin2019 PG2-SARAH2"
+_COLUMN_PATTERN = re.compile(r"^(?P<location>\S+?)(?P<year>[0-9]{4})? (?P<tool>\S+)$")
+_TOOL_PATTERN = re.compile(
+    r"^(?P<provider>[A-Za-z]+?)(?P<version>[0-9]*)-(?P<database>[^_]+)(?:_(?P<resolution>.+))?$"
+)
+
+CATALOG_FIELDS = [
+    "location",
+    "year",
+    "tool",
+    "provider",
+    "version",
+    "database",
+    "is_measured",
+    "resolution",
+    "position",
+]
+
+
+@lru_cache(maxsize=None)
+def parse_series_name(column):
+    """
+    Split a series column name into its components.
+
+    Parameters
+    ----------
+    column : str
+        Column name following the package convention
+        ``"{location}{year} {provider}{version}-{database}[_{resolution}]"``
+        (e.g., ``"Turin2019 PG2-SARAH2"`` or ``"Turin2019 PV-MEAS_high_resolution"``).
+
+    Returns
+    -------
+    dict or None
+        Dictionary with the keys ``"location"``, ``"year"``, ``"tool"``, ``"provider"``,
+        ``"version"``, ``"database"``, ``"is_measured"`` and ``"resolution"``, or None
+        if the name does not follow the convention (e.g., ``"Hour of the year"`` or
+        ``"Time UTC"``).
+
+    Examples
+    --------
+    >>> from simeasren.series_catalog import parse_series_name
+    >>> parse_series_name("Turin2019 PG2-SARAH2")["database"]
+    'SARAH2'
+    >>> parse_series_name("Time UTC") is None
+    True
+    """
+    match = _COLUMN_PATTERN.match(str(column))
+    tool_match = _TOOL_PATTERN.match(match.group("tool")) if match else None
+    if tool_match is None:
+        return None
+
+    database = tool_match.group("database")
+
+    return {
+        "location": match.group("location"),
+        "year": match.group("year"),
+        "tool": match.group("tool"),
+        "provider": tool_match.group("provider"),
+        "version": tool_match.group("version") or None,
+        "database": database,
+        "is_measured": database == "MEAS",
+        "resolution": tool_match.group("resolution") or "hourly",
+    }
+
+
+@lru_cache(maxsize=128)
+def _build_catalog(columns):
+    records = {}
+    for position, column in enumerate(columns):
+        parsed = parse_series_name(column)
+        if parsed is not None:
+            records[column] = {**parsed, "position": position}
+
+    catalog = pd.DataFrame.from_dict(records, orient="index", columns=CATALOG_FIELDS)
+    catalog["is_measured"] = catalog["is_measured"].astype(bool)
+    catalog["position"] = catalog["position"].astype(int)
+    catalog.index.name = "column"
+    return catalog
+
+
+def build_series_catalog(columns) -> pd.DataFrame:
+    """
+    Build a lookup table describing every series column of a dataset.
+
+    Each column name is parsed once (results are cached per name and per set of
+    columns), so the different analysis stages can look up series with vectorized
+    boolean selections instead of re-parsing strings.
+
+    Parameters
+    ----------
+    columns : iterable of str or pandas.DataFrame
+        Column names to parse. A DataFrame can be passed directly, in which case its
+        columns are used.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per recognised column, indexed by the column name, with the columns
+        ``"location"``, ``"year"``, ``"tool"``, ``"provider"``, ``"version"``,
+        ``"database"``, ``"is_measured"``, ``"resolution"`` and ``"position"``
+        (integer position of the column in the original dataset).
+        Columns that do not follow the naming convention are left out.
+
+    Notes
+    -----
+    - Locations are matched exactly, so `"Turin"` no longer matches `"Turin2"`.
+    - `"resolution"` is `"hourly"` unless the tool carries a suffix
+      (e.g., `"PV-MEAS_high_resolution"` gives `"high_resolution"`).
+
+    Examples
+    --------
+    >>> from simeasren import build_series_catalog
+    >>> catalog = build_series_catalog(["Turin2019 PG2-SARAH2", "Turin2019 PV-MEAS"])
+    >>> catalog.loc["Turin2019 PG2-SARAH2", ["provider", "version", "database"]].tolist()
+    ['PG', '2', 'SARAH2']
+    """
+    if isinstance(columns, pd.DataFrame):
+        columns = columns.columns
+    return _build_catalog(tuple(columns)).copy()
+
+
+def select_series(
+    catalog,
+    location=None,
+    year=None,
+    tools=None,
+    is_measured=None,
+    resolution="hourly",
+):
+    """
+    Select column names from a series catalog.
+
+    Parameters
+    ----------
+    catalog : pandas.DataFrame
+        Catalog returned by :func:`build_series_catalog`.
+    location : str, optional
+        Exact location name (e.g., `"Turin"`).
+    year : str or int, optional
+        Year of the series (e.g., `"2019"`).
+    tools : iterable of str, optional
+        Tool names to keep (e.g., the keys of ``style_config.PLOT_PALETTE``).
+    is_measured : bool, optional
+        True for measured series only, False for simulated series only.
+    resolution : str or None, optional
+        Time resolution to keep (default `"hourly"`). None keeps all resolutions.
+
+    Returns
+    -------
+    list of str
+        Selected column names, in the order of the original dataset.
+    """
+    mask = pd.Series(True, index=catalog.index)
+    if location is not None:
+        mask &= catalog["location"] == location
+    if year is not None:
+        mask &= catalog["year"] == str(year)
+    if tools is not None:
+        mask &= catalog["tool"].isin(list(tools))
+    if is_measured is not None:
+        mask &= catalog["is_measured"] == is_measured
+    if resolution is not None:
+        mask &= catalog["resolution"] == resolution
+    return catalog.index[mask.to_numpy()].tolist()
+
+
+def find_measured_column(catalog, location=None, year=None, resolution="hourly"):
+    """
+    Return the first measured (`"PV-MEAS"`) column matching the selection, or None.
+    """
+    columns = select_series(catalog, location=location, year=year, is_measured=True, resolution=resolution)
+    return columns[0] if columns else None
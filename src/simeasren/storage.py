@@ -0,0 +1,286 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from .archive import ARCHIVE_EXTENSION, write_profile_archive, read_profiles
+
+# ---------------------------- Output storage backends -----------------------------
+#
+# All result writers (downloads, merge, LCOF assessment, plots) save through a
+# storage object instead of writing files directly. Keys are the paths the writers
+# have always used (e.g. "results/Turin/simulated_PV/Turin_meas_sim.csv").
+
+
+class LocalStorage:
+    """
+    Store results as files on the local disk (default backend).
+
+    Parameters
+    ----------
+    root : str, optional
+        Directory prepended to every relative key. None (default) writes to the
+        keys as they are, relative to the working directory. A directory on a
+        memory file system (e.g., `"/dev/shm/simeasren"` on Linux) keeps the files
+        off the disk.
+
+    Examples
+    --------
+    >>> from simeasren import LocalStorage, set_storage
+    >>> set_storage(LocalStorage("/dev/shm/simeasren"))
+    """
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def __repr__(self):
+        return f"<LocalStorage root={self.root!r}>"
+
+    def path(self, key):
+        """File path of `key`."""
+        key = str(key)
+        return key if self.root is None or os.path.isabs(key) else os.path.join(self.root, key)
+
+    def makedirs(self, directory):
+        """Create a directory (and its parents) if needed."""
+        os.makedirs(self.path(directory), exist_ok=True)
+
+    def _prepare(self, key):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return path
+
+    def write_frame(self, key, data: pd.DataFrame, index=False):
+        """Write a DataFrame as a CSV file."""
+        data.to_csv(self._prepare(key), index=index)
+
+    def write_archive(self, key, data: pd.DataFrame):
+        """Write numeric profiles as a ``.pvz`` archive (see :func:`simeasren.archive.write_profile_archive`)."""
+        write_profile_archive(data, self._prepare(key))
+
+    def write_bytes(self, key, content: bytes):
+        """Write raw bytes (e.g., a rendered figure)."""
+        with open(self._prepare(key), "wb") as f:
+            f.write(content)
+
+    def write_figure(self, key, figure, **savefig_kwargs):
+        """Save a matplotlib figure (keyword arguments are passed to `savefig`)."""
+        figure.savefig(self._prepare(key), **savefig_kwargs)
+
+    def read_frame(self, key, columns=None, max_rows=None) -> pd.DataFrame:
+        """Read profiles written with :meth:`write_frame` or :meth:`write_archive` (see :func:`simeasren.read_profiles`)."""
+        return read_profiles(self.path(key), columns=columns, max_rows=max_rows)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def flush(self):
+        """Nothing to wait for, files are written immediately."""
+
+
+class MemoryStorage:
+    """
+    Keep results in memory instead of writing files.
+
+    Meant for batch runs and parameter sweeps where the intermediate files (e.g.,
+    one CSV per LP solve) are never needed. DataFrames are stored by reference and
+    can be read back by the loaders (e.g., :func:`simeasren.prepare_pv_data_for_plots`
+    after :func:`simeasren.merge_sim_with_measured`).
+
+    Parameters
+    ----------
+    keep_figures : bool, optional
+        If True, figures are rendered and kept as PNG bytes. If False (default),
+        figures are not rendered at all, only their key is recorded.
+
+    Examples
+    --------
+    >>> from simeasren import MemoryStorage, set_storage
+    >>> storage = MemoryStorage()
+    >>> set_storage(storage)
+    >>> # ... run the analysis ...
+    >>> storage.get("results/Turin/simulated_PV/Turin_meas_sim.csv").shape
+    (8760, 8)
+    """
+
+    def __init__(self, keep_figures=False):
+        self.keep_figures = keep_figures
+        self.items = {}
+
+    def __repr__(self):
+        return f"<MemoryStorage items={len(self.items)}>"
+
+    @staticmethod
+    def _key(key):
+        return os.path.normpath(str(key))
+
+    def path(self, key):
+        return self._key(key)
+
+    def makedirs(self, directory):
+        pass
+
+    def write_frame(self, key, data: pd.DataFrame, index=False):
+        self.items[self._key(key)] = data
+
+    def write_archive(self, key, data: pd.DataFrame):
+        if not str(key).endswith(ARCHIVE_EXTENSION):
+            key = f"{key}{ARCHIVE_EXTENSION}"
+        self.items[self._key(key)] = data.select_dtypes(include="number")
+
+    def write_bytes(self, key, content: bytes):
+        self.items[self._key(key)] = content
+
+    def write_figure(self, key, figure, **savefig_kwargs):
+        content = None
+        if self.keep_figures:
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format=os.path.splitext(str(key))[1][1:] or "png", **savefig_kwargs)
+            content = buffer.getvalue()
+        self.items[self._key(key)] = content
+
+    def get(self, key):
+        """Stored object of `key` (DataFrame, bytes, or None for unrendered figures)."""
+        return self.items[self._key(key)]
+
+    def keys(self):
+        return list(self.items)
+
+    def read_frame(self, key, columns=None, max_rows=None) -> pd.DataFrame:
+        key = self._key(key)
+        if key not in self.items:
+            key = os.path.splitext(key)[0] + ARCHIVE_EXTENSION
+        if key not in self.items:
+            raise FileNotFoundError(f"Profile file not found in memory storage: {key}")
+        data = self.items[key]
+        if columns is not None:
+            wanted = set(columns)
+            data = data[[col for col in data.columns if col in wanted]]
+        return data if max_rows is None else data.iloc[:max_rows]
+
+    def exists(self, key):
+        return self._key(key) in self.items
+
+    def flush(self):
+        pass
+
+
+class WriteBehindStorage:
+    """
+    Write results in background threads through another backend.
+
+    Writers return as soon as the data is queued, so the analysis (e.g., the next
+    LP solve) goes on while the files are written. Figures are rendered right away
+    (matplotlib figures are not thread safe) and only the file writing is deferred.
+    DataFrames are copied when they are queued, so the caller can keep modifying
+    them while they are written.
+    Call :meth:`flush` (or use the storage as a context manager) to wait for all
+    pending writes; reading a key also waits for them.
+
+    Parameters
+    ----------
+    backend : LocalStorage or MemoryStorage, optional
+        Storage doing the actual writes (default: :class:`LocalStorage`).
+    max_workers : int, optional
+        Number of writer threads (default 1).
+
+    Examples
+    --------
+    >>> from simeasren import WriteBehindStorage, calculate_all_LCOF_diff
+    >>> with WriteBehindStorage() as storage:
+    ...     results = calculate_all_LCOF_diff(data_sim_meas, "Turin", 0.3, "GUROBI_CMD", storage=storage)
+    """
+
+    def __init__(self, backend=None, max_workers=1):
+        self.backend = backend if backend is not None else LocalStorage()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = []
+
+    def __repr__(self):
+        return f"<WriteBehindStorage pending={len(self._pending)} backend={self.backend!r}>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _submit(self, func, *args, **kwargs):
+        self._pending = [future for future in self._pending if not future.done() or future.exception()]
+        self._pending.append(self._executor.submit(func, *args, **kwargs))
+
+    def path(self, key):
+        return self.backend.path(key)
+
+    def makedirs(self, directory):
+        self.backend.makedirs(directory)
+
+    def write_frame(self, key, data: pd.DataFrame, index=False):
+        self._submit(self.backend.write_frame, key, data.copy(), index=index)
+
+    def write_archive(self, key, data: pd.DataFrame):
+        self._submit(self.backend.write_archive, key, data.copy())
+
+    def write_bytes(self, key, content: bytes):
+        self._submit(self.backend.write_bytes, key, content)
+
+    def write_figure(self, key, figure, **savefig_kwargs):
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format=os.path.splitext(str(key))[1][1:] or "png", **savefig_kwargs)
+        self.write_bytes(key, buffer.getvalue())
+
+    def read_frame(self, key, columns=None, max_rows=None) -> pd.DataFrame:
+        self.flush()
+        return self.backend.read_frame(key, columns=columns, max_rows=max_rows)
+
+    def exists(self, key):
+        self.flush()
+        return self.backend.exists(key)
+
+    def flush(self):
+        """
+        Wait until all queued writes are done.
+
+        Raises
+        ------
+        Exception
+            The first error raised by a background write, if any.
+        """
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+        self.backend.flush()
+
+    def close(self):
+        """Flush the pending writes and stop the writer threads."""
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+_default_storage = LocalStorage()
+
+
+def get_storage(storage=None):
+    """Return `storage` if given, else the default storage set with :func:`set_storage`."""
+    return storage if storage is not None else _default_storage
+
+
+def set_storage(storage=None):
+    """
+    Set the storage used by all writers when no `storage` argument is passed.
+
+    Parameters
+    ----------
+    storage : LocalStorage, MemoryStorage or WriteBehindStorage, optional
+        New default storage. None restores the local disk storage.
+
+    Returns
+    -------
+    object
+        The previous default storage.
+    """
+    global _default_storage
+    previous = _default_storage
+    _default_storage = storage if storage is not None else LocalStorage()
+    return previous
@@ -1,10 +1,19 @@
 import os
 import pandas as pd
 from pathlib import Path
+from .storage import get_storage
+from .pv_measured.inverters import NORMALIZED_COLUMN, measured_columns
 
 # ---------------------------- Merge simulated with measured data in one file & Save -----------------------------
 
-def merge_sim_with_measured(location_name: str, *simulated_sources, output_dir="results"):
+def merge_sim_with_measured(
+    location_name: str,
+    *simulated_sources,
+    output_dir="results",
+    file_format="csv",
+    storage=None,
+    measured=None,
+):
     """
     Merge measured PV data with multiple simulation sources and save as a CSV file.
 
@@ -24,6 +33,19 @@ def merge_sim_with_measured(location_name: str, *simulated_sources, output_dir="
         - Values : numpy.ndarray — hourly PV power output in kW.
     output_dir : str, optional
         Root directory where the merged CSV will be saved (default is `"results"`).
+    file_format : {"csv", "pvz"}, optional
+        `"csv"` (default) writes a CSV file. `"pvz"` writes a quantized, compressed
+        archive instead (see :func:`simeasren.archive.write_profile_archive`), which
+        the loaders read transparently.
+    storage : LocalStorage, MemoryStorage or WriteBehindStorage, optional
+        Where the file is written (default: the storage set with
+        :func:`simeasren.set_storage`, the local disk unless changed).
+    measured : pandas.Series, optional
+        Hourly measured series indexed by timestamps, e.g. produced from raw inverter
+        exports by :func:`simeasren.pv_measured.normalize_inverter_data`. It replaces
+        the measured Excel data: one `{location_name}{year} PV-MEAS` column is
+        written for each year of the series. If None (default), the measured data
+        is read from the Excel file.
 
     Returns
     -------
@@ -37,7 +59,9 @@ def merge_sim_with_measured(location_name: str, *simulated_sources, output_dir="
     Raises
     ------
     FileNotFoundError
-        If the measured PV Excel file cannot be found.
+        If the measured PV Excel file cannot be found (when `measured` is None).
+    ValueError
+        If `file_format` is not `"csv"` or `"pvz"`.
 
     Notes
     -----
@@ -56,26 +80,13 @@ def merge_sim_with_measured(location_name: str, *simulated_sources, output_dir="
 
     Simulations completed and merged with measured data for Almeria. CSV file saved in the 'results' folder
     """
+    if file_format not in ("csv", "pvz"):
+        raise ValueError(f"file_format must be 'csv' or 'pvz', got '{file_format}'")
+
     # -------------------- Create output directory --------------------
+    storage = get_storage(storage)
     output_dir_sim_and_meas = os.path.join(output_dir, location_name, "simulated_PV")
-    os.makedirs(output_dir_sim_and_meas, exist_ok=True)
-
-    # Get package root (two levels up from this file)
-    package_root = Path(__file__).resolve().parent
-    measured_dir = package_root / "data" / "measured_PV"
-
-    # Build full path to the Excel file
-    file_path = measured_dir / f"{location_name}.xlsx"
-
-    if not file_path.exists():
-        raise FileNotFoundError(f"Measured PV file not found: {file_path}")
-    
-    df_setup = pd.read_excel(file_path, sheet_name="PV_plant_setup", index_col="Parameter")
-
-    parameters = df_setup["Value"]
-
-    start_year = int(parameters["Start year"])
-    end_year = int(parameters["End year"])
+    storage.makedirs(output_dir_sim_and_meas)
 
     productions = {}
     
@@ -84,16 +95,39 @@ def merge_sim_with_measured(location_name: str, *simulated_sources, output_dir="
         productions.update(source)
 
     # Merge measured data
-    for year in range(start_year, end_year + 1):
-        sheet_measured = f"{location_name}{year}"
-        df_measured = pd.read_excel(file_path, sheet_name=sheet_measured)
-        productions[f"{location_name}{year} PV-MEAS"] = df_measured["Normalized PV power corrected"].values
+    if measured is not None:
+        productions.update(measured_columns(location_name, measured))
+    else:
+        # Get package root (two levels up from this file)
+        package_root = Path(__file__).resolve().parent
+        measured_dir = package_root / "data" / "measured_PV"
+
+        # Build full path to the Excel file
+        file_path = measured_dir / f"{location_name}.xlsx"
+
+        if not file_path.exists():
+            raise FileNotFoundError(f"Measured PV file not found: {file_path}")
+
+        df_setup = pd.read_excel(file_path, sheet_name="PV_plant_setup", index_col="Parameter")
+
+        parameters = df_setup["Value"]
+
+        start_year = int(parameters["Start year"])
+        end_year = int(parameters["End year"])
+
+        for year in range(start_year, end_year + 1):
+            sheet_measured = f"{location_name}{year}"
+            df_measured = pd.read_excel(file_path, sheet_name=sheet_measured)
+            productions[f"{location_name}{year} PV-MEAS"] = df_measured[NORMALIZED_COLUMN].values
 
     output_df = pd.DataFrame({k: pd.Series(v) for k, v in productions.items()})
     output_df = output_df.iloc[:8760]  # One year hourly
 
-    out_path = os.path.join(output_dir_sim_and_meas, f"{location_name}_meas_sim.csv")
-    output_df.to_csv(out_path, index=False)
+    out_path = os.path.join(output_dir_sim_and_meas, f"{location_name}_meas_sim.{file_format}")
+    if file_format == "pvz":
+        storage.write_archive(out_path, output_df)
+    else:
+        storage.write_frame(out_path, output_df)
 
-    print(f"Simulations completed and merged with measured data for {location_name}. CSV file saved in the '{output_dir}' folder")
+    print(f"Simulations completed and merged with measured data for {location_name}. {file_format.upper()} file saved in the '{output_dir}' folder")
     return
\ No newline at end of file
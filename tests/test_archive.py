@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from simeasren import write_profile_archive, read_profile_archive, read_profiles, archive_csv_profiles
+from simeasren.archive import read_archive_header
+
+
+def synthetic_profiles(seed=0):
+    """Hourly profiles with missing values, a constant column and a wider range."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        "Turin2019 PV-MEAS": rng.uniform(0, 1, 8760),
+        "Turin2019 PG3-SARAH3": rng.uniform(0, 1, 8760),
+        "Turin2019 RN-MERRA2": np.zeros(8760),
+        "Load (kW)": rng.uniform(-50, 300, 8760),
+    })
+    data.iloc[100:110, 0] = np.nan
+    data.iloc[[0, 8759], 1] = np.nan
+    return data
+
+
+def test_archive_round_trip_within_error_bound(tmp_path):
+    data = synthetic_profiles()
+    path = write_profile_archive(data, tmp_path / "profiles", chunk_rows=1000)
+
+    restored = read_profile_archive(path)
+    bounds = np.asarray(read_archive_header(path)["max_abs_error"])
+
+    assert path.endswith(".pvz")
+    assert list(restored.columns) == list(data.columns)
+    np.testing.assert_array_equal(restored.isna().to_numpy(), data.isna().to_numpy())
+    errors = np.nanmax(np.abs(restored.to_numpy() - data.to_numpy()), axis=0)
+    assert (errors <= bounds + 1e-12).all()
+    assert (bounds <= (data.max() - data.min()).to_numpy() / 131068 + 1e-12).all()
+
+
+def test_archive_partial_read_matches_full_read(tmp_path):
+    data = synthetic_profiles()
+    path = write_profile_archive(data, tmp_path / "profiles.pvz", chunk_rows=1000)
+
+    full = read_profile_archive(path)
+    columns = ["Load (kW)", "Turin2019 PV-MEAS"]
+    part = read_profile_archive(path, columns=columns, start=950, stop=3050)
+
+    pd.testing.assert_frame_equal(part, full.loc[950:3049, columns])
+
+
+def test_read_profiles_falls_back_to_archive(tmp_path):
+    data = synthetic_profiles()
+    csv_path = tmp_path / "Turin_meas_sim.csv"
+    data.assign(Time=pd.date_range("2019-01-01", periods=8760, freq="h").astype(str)).to_csv(csv_path, index=False)
+    data.to_csv(tmp_path / "numeric.csv", index=False)
+
+    written = archive_csv_profiles(tmp_path, remove_csv=True)
+
+    assert sorted(written) == sorted(str(tmp_path / name) for name in ["Turin_meas_sim.pvz", "numeric.pvz"])
+    assert csv_path.exists()  # Has a non-numeric column
+    assert not (tmp_path / "numeric.csv").exists()
+    restored = read_profiles(tmp_path / "numeric.csv", columns=["Turin2019 PV-MEAS"], max_rows=200)
+    np.testing.assert_allclose(restored["Turin2019 PV-MEAS"], data["Turin2019 PV-MEAS"].iloc[:200], atol=1e-5)
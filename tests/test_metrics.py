@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from simeasren import build_series_catalog, calculate_error_metrics_table
+from simeasren.pv_analysis.metrics import _measured_pairs
+
+
+def two_year_profiles(seed=0):
+    """Measured and simulated profiles of two years, the 2020 measurements being much lower."""
+    rng = np.random.default_rng(seed)
+    measured = rng.uniform(0, 1, (8760, 2)) * [1.0, 0.5]
+    return pd.DataFrame({
+        "Turin2019 PV-MEAS": measured[:, 0],
+        "Turin2019 PG3-SARAH3": measured[:, 0] + 0.01,
+        "Turin2020 PV-MEAS": measured[:, 1],
+        "Turin2020 PG3-SARAH3": measured[:, 1] + 0.02,
+        "Turin2021 RN-MERRA2": measured[:, 1],
+        "Utrecht2020 PG3-SARAH3": measured[:, 1],
+    })
+
+
+def test_measured_pairs_by_year():
+    catalog = build_series_catalog(two_year_profiles().columns)
+    sim_columns = ["Turin2019 PG3-SARAH3", "Turin2020 PG3-SARAH3", "Turin2021 RN-MERRA2", "Utrecht2020 PG3-SARAH3"]
+
+    assert _measured_pairs(catalog, sim_columns) == {
+        "Turin2019 PG3-SARAH3": "Turin2019 PV-MEAS",
+        "Turin2020 PG3-SARAH3": "Turin2020 PV-MEAS",
+        "Turin2021 RN-MERRA2": "Turin2019 PV-MEAS",  # No measurements that year: first of the location
+    }
+
+
+def test_error_metrics_table_uses_measurements_of_same_year():
+    table = calculate_error_metrics_table(two_year_profiles(), "Turin").set_index("Series")
+
+    assert table.loc["Turin2020 PG3-SARAH3", "Measured series"] == "Turin2020 PV-MEAS"
+    np.testing.assert_allclose(table.loc[["Turin2019 PG3-SARAH3", "Turin2020 PG3-SARAH3"], "Mean Difference (%)"], [1, 2])
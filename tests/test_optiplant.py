@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pulp
+import pytest
+
+import simeasren
+from simeasren import solve_optiplant
+
+COST_COLUMNS = [
+    "Total investment (MEUR)",
+    "Annualised investment (MEUR)",
+    "Fixed O&M (MEUR)",
+    "Variable O&M (MEUR)",
+    "Cost per unit (MEUR)",
+]
+
+
+def small_data_units():
+    """Ammonia plant fed by an electrolyser and fixed PV, without storage or grid."""
+    path = Path(simeasren.__file__).parent / "data" / "techno_economic_assessment" / "Techno_eco_data_NH3.csv"
+    data_units = pd.read_csv(path)
+    keep = ["H2 user (ammonia plant)", "Water supply", "Electrolyser AEC", "H2 pipeline to demand", "Solar PV fixed support"]
+    return data_units[data_units["Type of units"].isin(keep)].reset_index(drop=True)
+
+
+def synthetic_pv_profile(seed=0):
+    """One year of hourly capacity factors: daily sine with seasonal and day-to-day variations."""
+    hours = np.arange(8760)
+    rng = np.random.default_rng(seed)
+    daily = np.clip(np.sin(2 * np.pi * (hours % 24 - 6) / 24), 0, None)
+    seasonal = 0.8 + 0.2 * np.sin(2 * np.pi * (hours / 8760 - 0.2))
+    return daily * seasonal * np.repeat(rng.uniform(0.4, 1.0, 365), 24)
+
+
+@pytest.mark.skipif(not pulp.PULP_CBC_CMD(msg=False).available(), reason="cbc is not available")
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")  # LpVariable constructor of the PuLP model
+def test_sparse_model_matches_pulp():
+    data_units = small_data_units()
+    profile = synthetic_pv_profile()
+
+    fuel_cost_highs, results_highs, _ = solve_optiplant(data_units, profile, 0.0, "SCIPY_HIGHS")
+    fuel_cost_cbc, results_cbc, _ = solve_optiplant(data_units, profile, 0.0, "PULP_CBC_CMD")
+
+    assert fuel_cost_highs == pytest.approx(fuel_cost_cbc, rel=1e-6)
+    np.testing.assert_allclose(results_highs[COST_COLUMNS], results_cbc[COST_COLUMNS], rtol=1e-6, atol=1e-6)
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simeasren import calculate_error_metrics_table
+from simeasren.pv_analysis import MetricAccumulator
+
+METRICS = ["Hours", "Mean Difference (%)", "MAE (%)", "RMSE (%)"]
+
+
+def synthetic_profiles(seed=0):
+    """One year of a measured and two simulated profiles, with missing hours."""
+    rng = np.random.default_rng(seed)
+    hours = np.arange(8760)
+    measured = np.clip(np.sin(2 * np.pi * (hours % 24 - 6) / 24), 0, None) * rng.uniform(0.3, 1.0, 8760)
+    data = pd.DataFrame({
+        "Turin2019 PV-MEAS": measured,
+        "Turin2019 PG3-SARAH3": np.clip(measured + rng.normal(0, 0.05, 8760), 0, None),
+        "Turin2019 RN-MERRA2": np.clip(1.1 * measured + rng.normal(0, 0.1, 8760), 0, None),
+    })
+    data.iloc[100:110, 0] = np.nan
+    data.iloc[5000:5024, 2] = np.nan
+    return data
+
+
+def accumulate(data, sim_columns, rows):
+    accumulator = MetricAccumulator(sim_columns)
+    for block in np.array_split(np.arange(len(data))[rows], 7):
+        accumulator.update(data[sim_columns].to_numpy()[block], data[["Turin2019 PV-MEAS"]].to_numpy()[block])
+    return accumulator
+
+
+def test_accumulator_blocks_match_table():
+    data = synthetic_profiles()
+    sim_columns = ["Turin2019 PG3-SARAH3", "Turin2019 RN-MERRA2"]
+    table = calculate_error_metrics_table(data, "Turin").set_index("Series").loc[sim_columns]
+
+    result = accumulate(data, sim_columns, slice(None)).result()
+
+    np.testing.assert_allclose(result[METRICS].to_numpy(float), table[METRICS].to_numpy(float), rtol=1e-9)
+
+
+def test_accumulator_merge_matches_single_pass():
+    data = synthetic_profiles()
+    sim_columns = ["Turin2019 PG3-SARAH3", "Turin2019 RN-MERRA2"]
+
+    merged = accumulate(data, sim_columns, slice(None, 3000)).merge(accumulate(data, sim_columns, slice(3000, None)))
+    single = accumulate(data, sim_columns, slice(None))
+
+    pd.testing.assert_frame_equal(merged.result(), single.result(), rtol=1e-9)
+
+
+def test_accumulator_merge_rejects_other_pairs():
+    with pytest.raises(ValueError):
+        MetricAccumulator(["a"]).merge(MetricAccumulator(["b"]))